@@ -1,78 +1,188 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import pandas as pd
-import pickle
 import numpy as np
+import calendar
 import datetime
+import json
+import os
 import random
-import requests
+import threading
+from features import UnknownCategoryError
+from weather import forecast_cache
+from result_cache import ResultCache
+from recommend_grid import GRID_PATH, RecommendationGrid
+from model_bundle import BUNDLE_PATH, MANIFEST
+from model_registry import ModelRegistry
+import metrics
+from metrics import stage
+import profiling
+from predict_batcher import PREDICT_BATCHING, PredictionBatcher
+from cost_model import cost_model
+from climatology import MAX_HORIZON, Climatology
 
 app = Flask(__name__)
 CORS(app)
+metrics.instrument(app)
+profiling.instrument(app)
 
-# Load Model and Encoders
-try:
-    with open('agriculture_model_improved.pkl', 'rb') as f:
-        model = pickle.load(f)
-    with open('label_encoders_improved.pkl', 'rb') as f:
-        encoders = pickle.load(f)
-        scaler = encoders.get('scaler')
-    print("Model and encoders loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
-    encoders = None
-    scaler = None
+MODEL_ARTIFACTS = ['agriculture_model_improved.pkl', 'label_encoders_improved.pkl']
+MODEL_BUNDLE_PATH = os.environ.get('MODEL_BUNDLE_PATH', BUNDLE_PATH)
+# MODEL_ENGINE=flat scores batches up to FLAT_MAX_ROWS with the flattened tree engine and
+# larger ones with sklearn (same outputs); pickles only. Bundles always route this way.
+MODEL_ENGINE = os.environ.get('MODEL_ENGINE', 'sklearn')
+# Seconds between checks for a new artifact on disk; 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+
+def model_source():
+    # The memory-mapped bundle when one exists, otherwise the pickles
+    if os.path.exists(os.path.join(MODEL_BUNDLE_PATH, MANIFEST)):
+        return MODEL_BUNDLE_PATH
+    return MODEL_ARTIFACTS
 
-# Load Monthly Rainfall Averages
+def prepare_model_version(mv):
+    # Per-version lookup tables, built before the version can serve traffic
+    mv.crop_table = build_crop_table(mv.feature_builder)
+
+registry = ModelRegistry(engine=MODEL_ENGINE, prepare=prepare_model_version)
+
+def json_response(body):
+    return Response(body, mimetype='application/json')
+
+# Load Monthly Rainfall Averages (bundled climatology when available)
+rainfall_history = None
 try:
-    rainfall_df = pd.read_csv('rainfall_monthly_averages.csv')
-    rainfall_data = rainfall_df.set_index('District').to_dict('index')
+    if isinstance(model_source(), str):
+        from model_bundle import load_bundle
+        bundle = load_bundle(model_source())
+        rainfall_data = bundle.rainfall_data
+        rainfall_history = bundle.rainfall_history
+    else:
+        import pandas as pd
+        rainfall_df = pd.read_csv('rainfall_monthly_averages.csv')
+        rainfall_data = rainfall_df.set_index('District').to_dict('index')
     print("Rainfall data loaded successfully.")
 except Exception as e:
     print(f"Error loading rainfall data: {e}")
     rainfall_data = {}
 
-# Cost Map (Same as in augment_data.py)
-COST_MAP = {
-    'Rice': 40000, 'Banana': 100000, 'Maize': 30000, 'Linseed': 20000,
-    'Cowpea(Lobia)': 25000, 'Peas & beans (Pulses)': 35000, 'Rapeseed &Mustard': 25000,
-    'Sugarcane': 80000, 'Tobacco': 50000, 'Wheat': 35000, 'Jute': 45000,
-    'Mesta': 20000, 'Potato': 60000, 'Turmeric': 70000, 'Ginger': 80000,
-    'Arecanut': 90000, 'Black pepper': 100000, 'Cashewnut': 50000, 'Tapioca': 40000
-}
+# District x month normals plus the district x year x month bulletin cube behind /forecast
+# (precomputed in the bundle; parsed from the bulletins only for older bundles and pickles)
+try:
+    climatology = Climatology.from_rainfall_data(rainfall_data, rainfall_history)
+    print(f"Climatology loaded: {len(climatology)} districts, {len(climatology.years)} bulletin years.")
+except Exception as e:
+    print(f"Error loading rainfall history: {e}")
+    climatology = Climatology.from_rainfall_data(rainfall_data, bulletins=None)
 
+# Cost of cultivation (shared with training_workspace/augment_data.py)
 def get_estimated_cost(crop, area):
-    base = 30000
-    for key in COST_MAP:
-        if key.lower() in str(crop).lower():
-            base = COST_MAP[key]
-            break
-    return area * base
+    return cost_model.estimate(crop, area)
+
+# Per-hectare budget limits used by /recommend
+BUDGET_LIMITS = {
+    'Low': 20000,
+    'Medium': 50000,
+    'High': 1000000
+}
+
+# Slope Suitability
+SLOPE_SUITABILITY = {
+    'Flat': ['Rice', 'Wheat', 'Jute', 'Potato', 'Sugarcane'],
+    'Gentle': ['Maize', 'Soyabean', 'Pulses', 'Vegetables'],
+    'Steep': ['Tea', 'Coffee', 'Rubber', 'Arecanut', 'Black pepper', 'Cashewnut', 'Turmeric', 'Ginger']
+}
+
+RECOMMEND_TOP_K = 5
+
+def build_crop_table(feature_builder):
+    # Precompute everything /recommend needs per crop so a request is pure array math:
+    # encoded index, per-hectare base cost and a suitability mask for each restricted slope.
+    crops = np.array(feature_builder.vocabularies['crop'], dtype=object)
+    table = {
+        'crops': crops,
+        'crop_enc': np.arange(len(crops)),
+        'base_cost': cost_model.base_costs(crops),
+        'slope_mask': {}
+    }
+    for slope in ('Flat', 'Steep'):
+        table['slope_mask'][slope] = np.array([
+            any(c.lower() in crop.lower() for c in SLOPE_SUITABILITY[slope]) for crop in crops
+        ], dtype=bool)
+    return table
+
+# Load Model and Encoders (crop tables depend on build_crop_table above)
+try:
+    registry.reload(model_source())
+    print(f"Model {registry.active.version} loaded successfully (engine: {registry.active.engine}).")
+except Exception as e:
+    print(f"Error loading model: {e}")
+
+def start_model_watcher():
+    # Threads don't survive fork, so serve.py calls this again in each worker
+    if MODEL_WATCH_INTERVAL > 0:
+        registry.watch(model_source, MODEL_WATCH_INTERVAL)
+
+start_model_watcher()
+
+# Set by serve.py when a worker starts shutting down, so /ready fails while it drains
+draining = threading.Event()
+
+# Response caches for /predict and /recommend, dropped whenever the active model version changes
+def active_model_version():
+    return registry.active.version if registry.active else None
+
+predict_cache = ResultCache('predict', version_fn=active_model_version)
+
+# Concurrent single-row /predict calls share one model.predict (PREDICT_BATCHING=0 disables)
+predict_batcher = PredictionBatcher() if PREDICT_BATCHING else None
+recommend_cache = ResultCache('recommend', version_fn=active_model_version)
+
+def require_admin():
+    # Admin endpoints need X-Admin-Token matching ADMIN_TOKEN. Behind a reverse proxy every
+    # client looks like loopback, so tokenless loopback access needs ADMIN_ALLOW_LOOPBACK=1.
+    token = os.environ.get('ADMIN_TOKEN')
+    if token:
+        if request.headers.get('X-Admin-Token') != token:
+            return jsonify({"error": "Forbidden"}), 403
+    elif os.environ.get('ADMIN_ALLOW_LOOPBACK') != '1' or request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Forbidden"}), 403
+    return None
 
 @app.route('/', methods=['GET'])
 def home():
     return jsonify({
         "status": "online",
         "message": "Smart Agriculture Backend is Running",
-        "endpoints": ["/info", "/predict", "/forecast", "/recommend", "/advisory"]
+        "endpoints": ["/info", "/predict", "/predict/batch", "/forecast", "/forecast/batch", "/recommend", "/sweep", "/advisory", "/analyze", "/metrics", "/ready"]
     })
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Readiness probe: a version is only activated after its warmup batch has run
+    if draining.is_set():
+        return jsonify({"ready": False, "reason": "draining"}), 503
+    active = registry.active
+    if not active:
+        return jsonify({"ready": False, "reason": "model not loaded"}), 503
+    return jsonify({"ready": True, "model_version": active.version, "pid": os.getpid()})
+
 @app.route('/info', methods=['GET'])
 def get_info():
-    if not encoders:
+    active = registry.active
+    if not active:
         return jsonify({"error": "Model not loaded"}), 500
     
     return jsonify({
-        "districts": list(encoders['district'].classes_),
-        "seasons": list(encoders['season'].classes_),
-        "crops": list(encoders['crop'].classes_)
+        "districts": active.feature_builder.vocabularies['district'],
+        "seasons": active.feature_builder.vocabularies['season'],
+        "crops": active.feature_builder.vocabularies['crop']
     })
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    if not model or not encoders:
+    active = registry.active
+    if not active:
         return jsonify({"error": "Model not loaded"}), 500
     
     data = request.json
@@ -80,310 +190,755 @@ def predict():
     season = data.get('season')
     crop = data.get('crop')
     area = float(data.get('area'))
-    rainfall = float(data.get('rainfall')) 
+    rainfall = float(data.get('rainfall'))
     
     # Calculate Cost if not provided (User might not know exact cost)
     # But for prediction, we need it as feature.
     cost = data.get('cost')
+
+    # Bucketed values only form the key; the response is computed from the raw inputs
+    cache_key = (active.version, district, season, crop, predict_cache.quantize_area(area),
+                 predict_cache.quantize_rainfall(rainfall), str(cost) if cost else None)
+    cached = predict_cache.get(cache_key)
+    if cached is not None:
+        return json_response(cached)
+
     if not cost:
         cost = get_estimated_cost(crop, area)
     
     try:
-        district_enc = encoders['district'].transform([district])[0]
-        season_enc = encoders['season'].transform([season])[0]
-        crop_enc = encoders['crop'].transform([crop])[0]
-        
-        # Scale numerical features
-        numerical_features = np.array([[area, rainfall, cost]])
-        numerical_features_scaled = scaler.transform(numerical_features)
-        
-        # Combine features: District, Season, Crop, Area_Scaled, Rainfall_Scaled, Cost_Scaled
-        features = np.array([[district_enc, season_enc, crop_enc, 
-                              numerical_features_scaled[0][0], 
-                              numerical_features_scaled[0][1], 
-                              numerical_features_scaled[0][2]]])
-                              
-        prediction_log = model.predict(features)[0]
+        with stage('encode'):
+            district_enc = active.feature_builder.encode('district', district)
+            season_enc = active.feature_builder.encode('season', season)
+            crop_enc = active.feature_builder.encode('crop', crop)
+        if predict_batcher:
+            # Queue wait plus a share of one scale + predict over concurrent requests
+            with stage('predict'):
+                prediction_log = predict_batcher.predict(active, (district_enc, season_enc, crop_enc),
+                                                         (area, rainfall, float(cost)))
+        else:
+            with stage('scale'):
+                # District, Season, Crop, Area_Scaled, Rainfall_Scaled, Cost_Scaled
+                features = active.feature_builder.assemble(district_enc, season_enc, crop_enc,
+                                                           [[area, rainfall, cost]])
+            with stage('predict'):
+                prediction_log = active.model.predict(features)[0]
         prediction = np.expm1(prediction_log)
         
-        return jsonify({
-            "production": prediction,
-            "yield": prediction / area if area > 0 else 0,
-            "estimated_cost": cost
-        })
+        with stage('serialize'):
+            response = jsonify({
+                "production": prediction,
+                "yield": prediction / area if area > 0 else 0,
+                "estimated_cost": cost
+            })
+        predict_cache.put(cache_key, response.get_data())
+        return response
+    except UnknownCategoryError as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-@app.route('/forecast', methods=['POST'])
-def forecast():
-    data = request.json
-    district = data.get('district')
-    current_month_idx = data.get('month_idx', datetime.datetime.now().month - 1)
-    
-    if district not in rainfall_data:
-        return jsonify({"error": "District rainfall data not found"}), 404
-        
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    forecast_data = []
-    
-    for i in range(3):
-        idx = (current_month_idx + i) % 12
-        month_name = months[idx]
-        predicted_rainfall = rainfall_data[district].get(month_name, 0)
-        
-        erosion_risk = "Low"
-        if predicted_rainfall > 300:
-            erosion_risk = "High"
-        elif predicted_rainfall > 100:
-            erosion_risk = "Medium"
-            
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import pandas as pd
-import pickle
-import numpy as np
-import datetime
-import random
-import requests
+# Upper bound on rows accepted by /predict/batch in a single request
+MAX_BATCH_ROWS = 10000
 
-app = Flask(__name__)
-CORS(app)
+class MalformedLine:
+    """Stands in for an NDJSON line that did not decode, so only that row fails."""
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
 
-# Load Model and Encoders
-try:
-    with open('agriculture_model_improved.pkl', 'rb') as f:
-        model = pickle.load(f)
-    with open('label_encoders_improved.pkl', 'rb') as f:
-        encoders = pickle.load(f)
-        scaler = encoders.get('scaler')
-    print("Model and encoders loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
-    encoders = None
-    scaler = None
+def parse_batch_rows():
+    # Accepts a JSON list, {"rows": [...]}, or NDJSON (one JSON object per line)
+    content_type = request.content_type or ''
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        rows = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            line = line.strip()
+            if line:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    rows.append(MalformedLine(number, f"Invalid JSON: {e}"))
+        return rows
 
-# Load Monthly Rainfall Averages
-try:
-    rainfall_df = pd.read_csv('rainfall_monthly_averages.csv')
-    rainfall_data = rainfall_df.set_index('District').to_dict('index')
-    print("Rainfall data loaded successfully.")
-except Exception as e:
-    print(f"Error loading rainfall data: {e}")
-    rainfall_data = {}
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON list of rows, {\"rows\": [...]}, or NDJSON body")
+    return data
 
-# Cost Map (Same as in augment_data.py)
-COST_MAP = {
-    'Rice': 40000, 'Banana': 100000, 'Maize': 30000, 'Linseed': 20000,
-    'Cowpea(Lobia)': 25000, 'Peas & beans (Pulses)': 35000, 'Rapeseed &Mustard': 25000,
-    'Sugarcane': 80000, 'Tobacco': 50000, 'Wheat': 35000, 'Jute': 45000,
-    'Mesta': 20000, 'Potato': 60000, 'Turmeric': 70000, 'Ginger': 80000,
-    'Arecanut': 90000, 'Black pepper': 100000, 'Cashewnut': 50000, 'Tapioca': 40000
-}
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    active = registry.active
+    if not active:
+        return jsonify({"error": "Model not loaded"}), 500
 
-def get_estimated_cost(crop, area):
-    base = 30000
-    for key in COST_MAP:
-        if key.lower() in str(crop).lower():
-            base = COST_MAP[key]
-            break
-    return area * base
+    try:
+        rows = parse_batch_rows()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-@app.route('/', methods=['GET'])
-def home():
-    return jsonify({
-        "status": "online",
-        "message": "Smart Agriculture Backend is Running",
-        "endpoints": ["/info", "/predict", "/forecast", "/recommend", "/advisory"]
-    })
+    if len(rows) > MAX_BATCH_ROWS:
+        return jsonify({"error": f"Batch too large ({len(rows)} rows, max {MAX_BATCH_ROWS})"}), 413
 
+    n = len(rows)
+    errors = [None] * n
+    lines = {}  # row index -> NDJSON line number, for rows that did not decode
+    districts = [''] * n
+    seasons = [''] * n
+    crops = [''] * n
+    numerical = np.zeros((n, 3))
+    estimate_cost = np.zeros(n, dtype=bool)
 
-@app.route('/info', methods=['GET'])
-def get_info():
-    if not encoders:
-        return jsonify({"error": "Model not loaded"}), 500
-    
-    return jsonify({
-        "districts": list(encoders['district'].classes_),
-        "seasons": list(encoders['season'].classes_),
-        "crops": list(encoders['crop'].classes_)
-    })
+    # 1. Parse numeric fields row by row so a bad row only fails itself
+    for i, row in enumerate(rows):
+        if isinstance(row, MalformedLine):
+            errors[i] = row.error
+            lines[i] = row.line
+            continue
+        if not isinstance(row, dict):
+            errors[i] = "Row must be a JSON object"
+            continue
+        try:
+            area = float(row.get('area'))
+            rainfall = float(row.get('rainfall'))
+            cost = row.get('cost')
+            cost = float(cost) if cost else 0.0
+        except (TypeError, ValueError):
+            errors[i] = "area, rainfall and cost must be numeric"
+            continue
+        if not np.isfinite((area, rainfall, cost)).all():
+            errors[i] = "area, rainfall and cost must be finite"
+            continue
+        districts[i] = row.get('district')
+        seasons[i] = row.get('season')
+        crops[i] = row.get('crop')
+        numerical[i] = (area, rainfall, cost)
+        estimate_cost[i] = not row.get('cost')
 
-@app.route('/predict', methods=['POST'])
-def predict():
-    if not model or not encoders:
+    # Missing costs for the whole batch at once
+    if estimate_cost.any():
+        numerical[estimate_cost, 2] = cost_model.estimate_many(np.array(crops, dtype=object)[estimate_cost],
+                                                               numerical[estimate_cost, 0])
+
+    # 2. Encode categorical columns as whole arrays
+    with stage('encode'):
+        district_enc, district_ok = active.feature_builder.encode_many('district', districts)
+        season_enc, season_ok = active.feature_builder.encode_many('season', seasons)
+        crop_enc, crop_ok = active.feature_builder.encode_many('crop', crops)
+
+    for i in range(n):
+        if errors[i]:
+            continue
+        if not district_ok[i]:
+            errors[i] = f"Unknown district: {districts[i]}"
+        elif not season_ok[i]:
+            errors[i] = f"Unknown season: {seasons[i]}"
+        elif not crop_ok[i]:
+            errors[i] = f"Unknown crop: {crops[i]}"
+
+    valid = np.array([e is None for e in errors], dtype=bool)
+    predictions = np.zeros(n)
+
+    # 3. Scale and predict all valid rows in a single call
+    if valid.any():
+        with stage('scale'):
+            features = active.feature_builder.assemble(district_enc[valid], season_enc[valid], crop_enc[valid],
+                                                       numerical[valid])
+        with stage('predict'):
+            predictions[valid] = np.expm1(active.model.predict(features))
+
+    results = []
+    for i in range(n):
+        if i in lines:
+            results.append({"index": i, "line": lines[i], "error": errors[i]})
+            continue
+        if errors[i]:
+            results.append({"index": i, "error": errors[i]})
+            continue
+        area = numerical[i][0]
+        results.append({
+            "index": i,
+            "production": predictions[i],
+            "yield": predictions[i] / area if area > 0 else 0,
+            "estimated_cost": numerical[i][2]
+        })
+
+    with stage('serialize'):
+        return jsonify({
+            "results": results,
+            "count": n,
+            "errors": n - int(valid.sum())
+        })
+
+# /sweep: rainfall x area grids scored in one feature matrix
+SWEEP_MAX_CELLS = int(os.environ.get('SWEEP_MAX_CELLS', 100000))
+SWEEP_MAX_STEPS = 1000
+# Rows per model.predict call; chunks this large always take sklearn's predict
+SWEEP_PREDICT_ROWS = int(os.environ.get('SWEEP_PREDICT_ROWS', 8192))
+
+def parse_sweep_axis(spec, name):
+    # A list of values, or {"min", "max", "steps"} for evenly spaced values
+    if isinstance(spec, dict):
+        try:
+            lo, hi, steps = float(spec['min']), float(spec['max']), int(spec.get('steps', 10))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{name} needs numeric min, max and steps")
+        if not np.isfinite([lo, hi]).all():
+            raise ValueError(f"{name} values must be finite and non-negative")
+        if not 1 <= steps <= SWEEP_MAX_STEPS or hi < lo:
+            raise ValueError(f"{name} needs min <= max and 1 to {SWEEP_MAX_STEPS} steps")
+        values = np.linspace(lo, hi, steps)
+    elif isinstance(spec, list) and 1 <= len(spec) <= SWEEP_MAX_STEPS:
+        try:
+            values = np.array([float(v) for v in spec])
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} values must be numeric")
+    else:
+        raise ValueError(f"{name} must be a list of 1 to {SWEEP_MAX_STEPS} values or {{min, max, steps}}")
+    if not np.all(np.isfinite(values)) or np.any(values < 0):
+        raise ValueError(f"{name} values must be finite and non-negative")
+    return values
+
+def sweep_blocks(active, district_enc, season_enc, crop_enc, rainfall, area, costs, block_rows):
+    # (first rainfall row, production[rows, len(area)]) per block of rainfall rows
+    for start in range(0, len(rainfall), block_rows):
+        rain = rainfall[start:start + block_rows]
+        with stage('scale'):
+            numerical = np.column_stack([
+                np.tile(area, len(rain)), np.repeat(rain, len(area)), np.tile(costs, len(rain))
+            ])
+            features = active.feature_builder.assemble(district_enc, season_enc, crop_enc, numerical)
+        with stage('predict'):
+            production = np.concatenate([
+                active.model.predict(features[i:i + SWEEP_PREDICT_ROWS])
+                for i in range(0, len(features), SWEEP_PREDICT_ROWS)
+            ])
+        yield start, np.round(np.expm1(production), 3).reshape(len(rain), len(area))
+
+@app.route('/sweep', methods=['POST'])
+def sweep():
+    # Predicted production for one district/season/crop over a rainfall x area grid.
+    # production[i][j] is for rainfall[i] and area[j]; cost scales with area
+    # (cost_per_hectare, or the crop's estimated cost). "stream": true returns
+    # NDJSON: a header line, then blocks of block_rows rainfall rows.
+    active = registry.active
+    if not active:
         return jsonify({"error": "Model not loaded"}), 500
-    
-    data = request.json
+
+    data = request.get_json(silent=True) or {}
     district = data.get('district')
     season = data.get('season')
     crop = data.get('crop')
-    area = float(data.get('area'))
-    rainfall = float(data.get('rainfall')) 
-    
-    # Calculate Cost if not provided (User might not know exact cost)
-    # But for prediction, we need it as feature.
-    cost = data.get('cost')
-    if not cost:
-        cost = get_estimated_cost(crop, area)
-    
     try:
-        district_enc = encoders['district'].transform([district])[0]
-        season_enc = encoders['season'].transform([season])[0]
-        crop_enc = encoders['crop'].transform([crop])[0]
-        
-        # Scale numerical features
-        numerical_features = np.array([[area, rainfall, cost]])
-        numerical_features_scaled = scaler.transform(numerical_features)
-        
-        # Combine features: District, Season, Crop, Area_Scaled, Rainfall_Scaled, Cost_Scaled
-        features = np.array([[district_enc, season_enc, crop_enc, 
-                              numerical_features_scaled[0][0], 
-                              numerical_features_scaled[0][1], 
-                              numerical_features_scaled[0][2]]])
-                              
-        prediction_log = model.predict(features)[0]
-        prediction = np.expm1(prediction_log)
-        
-        return jsonify({
-            "production": prediction,
-            "yield": prediction / area if area > 0 else 0,
-            "estimated_cost": cost
-        })
-    except Exception as e:
+        rainfall = parse_sweep_axis(data.get('rainfall'), 'rainfall')
+        area = parse_sweep_axis(data.get('area'), 'area')
+        cost_per_hectare = data.get('cost_per_hectare')
+        if cost_per_hectare is not None:
+            cost_per_hectare = float(cost_per_hectare)
+            if not np.isfinite(cost_per_hectare):
+                raise ValueError("cost_per_hectare must be finite")
+        block_rows = int(data.get('block_rows', 64))
+    except (TypeError, ValueError) as e:
         return jsonify({"error": str(e)}), 400
+    if block_rows < 1:
+        return jsonify({"error": "block_rows must be positive"}), 400
+    cells = len(rainfall) * len(area)
+    if cells > SWEEP_MAX_CELLS:
+        return jsonify({"error": f"Grid too large ({cells} cells, max {SWEEP_MAX_CELLS})"}), 413
+
+    try:
+        with stage('encode'):
+            district_enc = active.feature_builder.encode('district', district)
+            season_enc = active.feature_builder.encode('season', season)
+            crop_enc = active.feature_builder.encode('crop', crop)
+    except UnknownCategoryError as e:
+        return jsonify(e.to_dict()), 400
+
+    if cost_per_hectare is None:
+        costs = cost_model.estimate_many([crop] * len(area), area)
+    else:
+        costs = area * cost_per_hectare
+
+    header = {
+        "district": district,
+        "season": season,
+        "crop": crop,
+        "model_version": active.version,
+        "rainfall": rainfall.tolist(),
+        "area": area.tolist(),
+        "estimated_cost": costs.tolist(),
+        "shape": [len(rainfall), len(area)]
+    }
+    blocks = sweep_blocks(active, district_enc, season_enc, crop_enc, rainfall, area, costs,
+                          block_rows if data.get('stream') else len(rainfall))
+
+    if data.get('stream'):
+        def generate():
+            yield json.dumps(header) + '\n'
+            for start, production in blocks:
+                yield json.dumps({"row": start, "production": production.tolist()}) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    _, production = next(blocks)
+    with stage('serialize'):
+        return jsonify({**header, "production": production.tolist()})
+
+def load_recommend_grid(path):
+    # Precomputed predictions from recommend_grid.py
+    if not os.path.exists(path):
+        return None
+    try:
+        grid = RecommendationGrid.load(path)
+    except Exception as e:
+        print(f"Error loading recommendation grid: {e}")
+        return None
+    if not grid.validated:
+        print(f"Recommendation grid {path} failed validation against live scoring; not using it")
+        return None
+    print(f"Recommendation grid loaded: {grid.log_production.shape}, error bound {grid.error_bound}")
+    return grid
+
+recommend_grid = load_recommend_grid(os.environ.get('RECOMMEND_GRID_PATH', GRID_PATH))
+
+def grid_for(active):
+    # The grid only serves the model version it was built from
+    if recommend_grid is None or recommend_grid.fingerprint != active.fingerprint:
+        return None
+    if recommend_grid.crops != active.feature_builder.vocabularies['crop']:
+        return None
+    return recommend_grid
+
+def select_candidates(crop_table, area, budget, slope):
+    # Budget and slope checks as masks over the crop table (Gentle is okay for most).
+    # Returns the indices of surviving crops and every crop's estimated cost.
+    limit = BUDGET_LIMITS.get(budget, 1000000) * area
+    costs = crop_table['base_cost'] * area
+    mask = costs <= limit
+    if slope in crop_table['slope_mask']:
+        mask &= crop_table['slope_mask'][slope]
+    return np.flatnonzero(mask), costs
+
+def candidate_features(active, district_enc, season_enc, area, rainfall, survivors, costs):
+    n = len(survivors)
+    numerical = np.column_stack([np.full(n, area), np.full(n, rainfall), costs[survivors]])
+    return active.feature_builder.assemble(district_enc, season_enc,
+                                           active.crop_table['crop_enc'][survivors], numerical)
+
+def rank_candidates(crop_table, survivors, costs, production, area):
+    # Rank by Yield (tons/hectare) descending, only sorting the top k
+    n = len(survivors)
+    if n == 0:
+        return []
+    yields = production / area if area > 0 else np.zeros(n)
+    k = min(RECOMMEND_TOP_K, n)
+    top = np.argpartition(-yields, k - 1)[:k]
+    top = top[np.argsort(-yields[top], kind='stable')]
+    return [{
+        "crop": crop_table['crops'][survivors[i]],
+        "production": production[i],
+        "yield": yields[i],
+        "cost": costs[survivors[i]]
+    } for i in top]
 
 @app.route('/recommend', methods=['POST'])
 def recommend():
+    active = registry.active
+    if not active:
+        return jsonify({"error": "Model not loaded"}), 500
+
     data = request.json
     district = data.get('district')
-    area = float(data.get('area'))
     budget = data.get('budget') # Low, Medium, High
     slope = data.get('slope') # Flat, Gentle, Steep
-    rainfall = float(data.get('rainfall', 0)) # Expected rainfall
     season = data.get('season', 'Kharif') # Default to Kharif if not provided
-    
-    # Budget Limits
-    budget_limit = {
-        'Low': 20000 * area,
-        'Medium': 50000 * area,
-        'High': 1000000 * area
-    }
-    limit = budget_limit.get(budget, 1000000 * area)
-    
-    # Slope Suitability
-    slope_suitability = {
-        'Flat': ['Rice', 'Wheat', 'Jute', 'Potato', 'Sugarcane'],
-        'Gentle': ['Maize', 'Soyabean', 'Pulses', 'Vegetables'],
-        'Steep': ['Tea', 'Coffee', 'Rubber', 'Arecanut', 'Black pepper', 'Cashewnut', 'Turmeric', 'Ginger']
-    }
-    
-    # Get all crops
-    all_crops = list(encoders['crop'].classes_)
-    candidates = []
-    
-    for crop in all_crops:
-        est_cost = get_estimated_cost(crop, area)
-        
-        # 1. Budget Check
-        if est_cost > limit:
-            continue
-            
-        # 2. Slope Check
-        is_suitable_slope = False
-        if slope == 'Steep':
-            if any(c.lower() in crop.lower() for c in slope_suitability['Steep']):
-                is_suitable_slope = True
-        elif slope == 'Flat':
-             if any(c.lower() in crop.lower() for c in slope_suitability['Flat']):
-                is_suitable_slope = True
+    try:
+        area = float(data.get('area'))
+        rainfall = float(data.get('rainfall', 0)) # Expected rainfall
+    except (TypeError, ValueError):
+        return jsonify({"error": "area and rainfall must be numeric"}), 400
+    if not (np.isfinite(area) and np.isfinite(rainfall)):
+        # Otherwise a NaN area drops every crop at the budget check and returns an empty ranking
+        return jsonify({"error": "area and rainfall must be finite"}), 400
+
+    cache_key = (active.version, district, season, budget, slope, recommend_cache.quantize_area(area),
+                 recommend_cache.quantize_rainfall(rainfall))
+    cached = recommend_cache.get(cache_key)
+    if cached is not None:
+        return json_response(cached)
+
+    survivors, costs = select_candidates(active.crop_table, area, budget, slope)
+
+    try:
+        with stage('encode'):
+            district_enc = active.feature_builder.encode('district', district)
+            season_enc = active.feature_builder.encode('season', season)
+    except UnknownCategoryError as e:
+        print(f"Skipping recommendation: {e}")
+        survivors = survivors[:0]
+
+    # ML Prediction for all surviving crops: a grid lookup when the grid can answer within its
+    # validated error bound, otherwise one live batch
+    production = np.zeros(0)
+    if len(survivors) > 0:
+        grid = grid_for(active)
+        log_production = None
+        if grid is not None and grid.covers(district, season, area, rainfall):
+            with stage('grid_lookup'):
+                log_production = grid.lookup(district, season, area, rainfall, survivors, RECOMMEND_TOP_K)
+        if log_production is not None:
+            production = np.expm1(log_production)
         else:
-            is_suitable_slope = True # Gentle is okay for most
-            
-        # 3. ML Prediction for Yield
-        if is_suitable_slope:
+            with stage('scale'):
+                features = candidate_features(active, district_enc, season_enc, area, rainfall, survivors, costs)
             try:
-                # Prepare features for prediction
-                district_enc = encoders['district'].transform([district])[0]
-                season_enc = encoders['season'].transform([season])[0]
-                crop_enc = encoders['crop'].transform([crop])[0]
-                
-                # Scale numerical features [Area, Rainfall, Cost]
-                numerical_features = np.array([[area, rainfall, est_cost]])
-                numerical_features_scaled = scaler.transform(numerical_features)
-                
-                features = np.array([[district_enc, season_enc, crop_enc, 
-                                      numerical_features_scaled[0][0], 
-                                      numerical_features_scaled[0][1], 
-                                      numerical_features_scaled[0][2]]])
-                                      
-                prediction_log = model.predict(features)[0]
-                prediction_production = np.expm1(prediction_log)
-                predicted_yield = prediction_production / area if area > 0 else 0
-                
-                candidates.append({
-                    "crop": crop,
-                    "production": prediction_production,
-                    "yield": predicted_yield,
-                    "cost": est_cost
-                })
-            except Exception as e:
-                print(f"Skipping {crop} due to error: {e}")
-                continue
-
-    # 4. Rank by Yield (or Production)
-    # Sort by Yield (tons/hectare) descending
-    candidates.sort(key=lambda x: x['yield'], reverse=True)
+                with stage('predict'):
+                    production = np.expm1(active.model.predict(features))
+            except ValueError as e:
+                # Non-finite area or rainfall, rejected by the model like sklearn rejects them
+                return jsonify({"error": str(e)}), 400
 
-    return jsonify({
-        "recommendations": candidates[:5], # Top 5
-        "best_crop": candidates[0] if candidates else None
-    })
+    candidates = rank_candidates(active.crop_table, survivors, costs, production, area)
+    with stage('serialize'):
+        response = jsonify({
+            "recommendations": candidates,
+            "best_crop": candidates[0] if candidates else None
+        })
+    recommend_cache.put(cache_key, response.get_data())
+    return response
+
+def get_rainfall_outlook(district, current_month_idx, months_ahead=3):
+    # Monthly rainfall normals and erosion risk for the coming months, or None
+    if district not in climatology:
+        return None
+    return climatology.outlook_records(climatology.row_indices([district]), current_month_idx, months_ahead)[0]
+
+def parse_outlook_options(data):
+    # (month_idx, months, percentiles, year) for /forecast, /forecast/batch and /analyze; ValueError if invalid
+    month_idx = data.get('month_idx', datetime.datetime.now().month - 1)
+    months = data.get('months', 3)
+    percentiles = data.get('percentiles') or []
+    year = data.get('year')
+    if isinstance(month_idx, bool) or not isinstance(month_idx, int):
+        raise ValueError("month_idx must be an integer (0 = Jan)")
+    if isinstance(months, bool) or not isinstance(months, int) or not 1 <= months <= MAX_HORIZON:
+        raise ValueError(f"months must be an integer from 1 to {MAX_HORIZON}")
+    if (not isinstance(percentiles, list) or len(percentiles) > 9 or
+            not all(isinstance(q, (int, float)) and not isinstance(q, bool) and 0 <= q <= 100 for q in percentiles)):
+        raise ValueError("percentiles must be a list of up to 9 numbers from 0 to 100")
+    if year is not None and (isinstance(year, bool) or not isinstance(year, int)):
+        raise ValueError("year must be an integer")
+    if (percentiles or year is not None) and not climatology.has_history:
+        raise LookupError("Per-year rainfall history is not available")
+    return month_idx, months, percentiles, year
 
 @app.route('/forecast', methods=['POST'])
 def forecast():
+    # Normals and erosion risk for the next `months` months (default 3); optional
+    # historical `percentiles` and a bulletin `year`'s anomaly against the normal
     data = request.json
     district = data.get('district')
-    current_month_idx = data.get('month_idx', datetime.datetime.now().month - 1)
-    
-    if district not in rainfall_data:
+    try:
+        month_idx, months, percentiles, year = parse_outlook_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 503
+
+    if district not in climatology:
         return jsonify({"error": "District rainfall data not found"}), 404
-        
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    forecast_data = []
-    
-    for i in range(3):
-        idx = (current_month_idx + i) % 12
-        month_name = months[idx]
-        predicted_rainfall = rainfall_data[district].get(month_name, 0)
-        
-        erosion_risk = "Low"
-        if predicted_rainfall > 300:
-            erosion_risk = "High"
-        elif predicted_rainfall > 100:
-            erosion_risk = "Medium"
-            
-        forecast_data.append({
-            "month": month_name,
-            "rainfall": predicted_rainfall,
-            "erosion_risk": erosion_risk
-        })
-        
+    try:
+        forecast_data = climatology.outlook_records(climatology.row_indices([district]), month_idx, months,
+                                                    percentiles, year)[0]
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
     return jsonify({
         "forecast": forecast_data,
         "advisory": [] # This will be populated by the /advisory endpoint
     })
 
-def get_weather_forecast(lat, lon):
+@app.route('/forecast/batch', methods=['POST'])
+def forecast_batch():
+    # /forecast for many districts at once (all of them by default), e.g. for dashboards
+    data = request.get_json(silent=True) or {}
+    districts = data.get('districts')
     try:
-        # Open-Meteo API (Free, no key)
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=temperature_2m_max,precipitation_sum,wind_speed_10m_max&timezone=auto"
-        response = requests.get(url)
-        data = response.json()
-        return data
-    except Exception as e:
-        print(f"Error fetching weather: {e}")
+        month_idx, months, percentiles, year = parse_outlook_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 503
+
+    if districts is None:
+        districts = climatology.districts
+    elif not isinstance(districts, list):
+        return jsonify({"error": "districts must be a list"}), 400
+    unknown = [d for d in districts if d not in climatology]
+    if unknown:
+        return jsonify({"error": "District rainfall data not found", "districts": unknown}), 404
+
+    try:
+        records = climatology.outlook_records(climatology.row_indices(districts), month_idx, months,
+                                              percentiles, year)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+    with stage('serialize'):
+        return jsonify({
+            "month_idx": month_idx % 12,
+            "months": months,
+            "forecasts": dict(zip(districts, records))
+        })
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    # One round trip for the analysis form: rainfall outlook, recommendations and the
+    # chosen crop's prediction, sharing one encoding and one model.predict call.
+    active = registry.active
+    if not active:
+        return jsonify({"error": "Model not loaded"}), 500
+
+    data = request.json
+    district = data.get('district')
+    season = data.get('season', 'Kharif')
+    crop = data.get('crop')
+    budget = data.get('budget')
+    slope = data.get('slope')
+    try:
+        current_month_idx = parse_outlook_options(data)[0]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 503
+
+    try:
+        area = float(data.get('area'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "area must be numeric"}), 400
+
+    # 1. Rainfall outlook; its first month stands in for rainfall when none is given
+    forecast_data = get_rainfall_outlook(district, current_month_idx) or []
+    rainfall = data.get('rainfall')
+    if not rainfall and forecast_data:
+        rainfall = forecast_data[0]['rainfall']
+    try:
+        rainfall = float(rainfall or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "rainfall must be numeric"}), 400
+
+    cost = data.get('cost')
+    if not cost:
+        cost = get_estimated_cost(crop, area)
+    try:
+        cost = float(cost)
+    except (TypeError, ValueError):
+        return jsonify({"error": "cost must be numeric"}), 400
+
+    try:
+        with stage('encode'):
+            district_enc = active.feature_builder.encode('district', district)
+            season_enc = active.feature_builder.encode('season', season)
+            crop_enc = active.feature_builder.encode('crop', crop)
+    except UnknownCategoryError as e:
+        return jsonify(e.to_dict()), 400
+
+    # 2. Candidate crops plus the chosen crop, scored in a single batch (chosen crop last)
+    survivors, costs = select_candidates(active.crop_table, area, budget, slope)
+    with stage('scale'):
+        features = np.vstack([
+            candidate_features(active, district_enc, season_enc, area, rainfall, survivors, costs),
+            active.feature_builder.assemble(district_enc, season_enc, crop_enc, [[area, rainfall, cost]])
+        ])
+    try:
+        with stage('predict'):
+            production = np.expm1(active.model.predict(features))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    candidates = rank_candidates(active.crop_table, survivors, costs, production[:-1], area)
+    prediction = production[-1]
+
+    with stage('serialize'):
+        return jsonify({
+            "forecast": forecast_data,
+            "rainfall": rainfall,
+            "recommendation": {
+                "recommendations": candidates,
+                "best_crop": candidates[0] if candidates else None
+            },
+            "prediction": {
+                "production": prediction,
+                "yield": prediction / area if area > 0 else 0,
+                "estimated_cost": cost
+            }
+        })
+
+@app.route('/admin/model', methods=['GET'])
+def model_status():
+    denied = require_admin()
+    if denied:
+        return denied
+    return jsonify(registry.snapshot())
+
+@app.route('/admin/model/reload', methods=['POST'])
+def model_reload():
+    # Load + warm up a new artifact and swap it in. Body (optional): {"path": bundle_dir} or
+    # {"model": pkl, "encoders": pkl}; defaults to the configured source. ?wait=1 blocks until done.
+    denied = require_admin()
+    if denied:
+        return denied
+
+    data = request.get_json(silent=True) or {}
+    if data.get('path'):
+        source = data['path']
+    elif data.get('model') and data.get('encoders'):
+        source = [data['model'], data['encoders']]
+    else:
+        source = model_source()
+
+    if request.args.get('wait'):
+        try:
+            registry.reload(source)
+        except Exception as e:
+            return jsonify({"error": str(e), **registry.snapshot()}), 409
+        return jsonify(registry.snapshot())
+
+    if registry.loading:
+        return jsonify({"error": "A model reload is already in progress"}), 409
+    registry.reload_async(source)
+    return jsonify({"status": "loading", "source": source}), 202
+
+@app.route('/admin/model/activate', methods=['POST'])
+def model_activate():
+    # Roll back (or forward) to an already loaded version: {"version": "..."}
+    denied = require_admin()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        registry.activate(data.get('version'))
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 404
+    return jsonify(registry.snapshot())
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    # Profiles captured via a signed X-Profile header or PROFILE_SAMPLE_RATE, newest first
+    denied = require_admin()
+    if denied:
+        return denied
+    return jsonify({
+        "profiles": profiling.ring.list(),
+        "ring_size": profiling.ring.size,
+        "sample_rate": profiling.PROFILE_SAMPLE_RATE
+    })
+
+@app.route('/admin/profiles/<name>', methods=['GET'])
+def get_profile(name):
+    # Raw pstats file (load with pstats/snakeviz), or ?format=text for a cumulative-time summary
+    denied = require_admin()
+    if denied:
+        return denied
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'ncalls'):
+            return jsonify({"error": "sort must be cumulative, tottime or ncalls"}), 400
+        summary = profiling.ring.summary(name, sort=sort)
+        if summary is None:
+            return jsonify({"error": "Profile not found"}), 404
+        return Response(summary, mimetype='text/plain')
+
+    path = profiling.ring.path(name)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=name)
+
+# Time budget for /advisory's upstream weather call before falling back to climatology
+ADVISORY_DEADLINE = float(os.environ.get('ADVISORY_DEADLINE', 2.0))
+
+# Approximate district headquarters (the rainfall bulletin stations), used to map
+# a location to a district when serving climatology instead of a live forecast
+DISTRICT_LOCATIONS = {
+    'EAST GARO HILLS': (25.50, 90.62),
+    'EAST JAINTIA HILLS': (25.36, 92.37),
+    'EAST KHASI HILLS': (25.57, 91.88),
+    'NORTH GARO HILLS': (25.90, 90.61),
+    'RI BHOI': (25.90, 91.88),
+    'SOUTH GARO HILLS': (25.20, 90.64),
+    'SOUTH WEST GARO HILLS': (25.46, 89.94),
+    'SOUTH WEST KHASI HILLS': (25.36, 91.46),
+    'WEST GARO HILLS': (25.51, 90.22),
+    'WEST JAINTIA HILLS': (25.45, 92.20),
+    'WEST KHASI HILLS': (25.52, 91.27)
+}
+
+def get_weather_forecast(lat, lon, timeout=None):
+    # Served from the grid-snapped forecast cache; only misses hit Open-Meteo.
+    # Returns None if the upstream fails, is too slow, or the breaker is open.
+    return forecast_cache.get(lat, lon, timeout=timeout)
+
+def parse_location(lat, lon):
+    # (lat, lon) as floats in range, before they reach the forecast cache key; ValueError if invalid
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError("lat and lon must be numeric")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat must be within -90..90 and lon within -180..180")
+    return lat, lon
+
+def nearest_district(lat, lon):
+    candidates = [d for d in DISTRICT_LOCATIONS if d in climatology]
+    if not candidates:
         return None
+    return min(candidates, key=lambda d: (DISTRICT_LOCATIONS[d][0] - lat) ** 2 +
+                                         (DISTRICT_LOCATIONS[d][1] - lon) ** 2)
+
+def get_climatology_forecast(district, days=7):
+    # Open-Meteo shaped daily forecast from the district's monthly rainfall normals
+    today = datetime.date.today()
+    dates, rains = [], []
+    for i in range(days):
+        day = today + datetime.timedelta(days=i)
+        monthly = climatology.normal(district, day.month - 1)
+        dates.append(day.isoformat())
+        rains.append(round(monthly / calendar.monthrange(day.year, day.month)[1], 1))
+    return {
+        "daily": {
+            "time": dates,
+            "temperature_2m_max": [None] * days,
+            "precipitation_sum": rains,
+            "wind_speed_10m_max": [None] * days
+        }
+    }
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        "predict": predict_cache.snapshot(),
+        "recommend": recommend_cache.snapshot(),
+        "recommend_grid": recommend_grid.snapshot() if recommend_grid else None,
+        "model_version": active_model_version(),
+        "weather": forecast_cache.snapshot()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus text exposition of request counts, latencies and per-stage timings
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/batcher/stats', methods=['GET'])
+def batcher_stats():
+    if not predict_batcher:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **predict_batcher.snapshot()})
+
+@app.route('/weather/stats', methods=['GET'])
+def weather_stats():
+    return jsonify(forecast_cache.snapshot())
 
 @app.route('/advisory', methods=['POST'])
 def advisory():
@@ -395,10 +950,22 @@ def advisory():
     
     if not lat or not lon:
         return jsonify({"error": "Location required"}), 400
-        
-    weather = get_weather_forecast(lat, lon)
+    try:
+        lat, lon = parse_location(lat, lon)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with stage('upstream_fetch'):
+        weather = get_weather_forecast(lat, lon, timeout=ADVISORY_DEADLINE)
+    degraded_district = None
     if not weather:
-        return jsonify({"error": "Could not fetch weather data"}), 500
+        # Upstream unavailable: degrade to climatology rather than failing the request
+        degraded_district = data.get('district')
+        if degraded_district not in climatology:
+            degraded_district = nearest_district(lat, lon)
+        if not degraded_district:
+            return jsonify({"error": "Could not fetch weather data"}), 500
+        weather = get_climatology_forecast(degraded_district)
         
     daily = weather.get('daily', {})
     dates = daily.get('time', [])
@@ -419,14 +986,15 @@ def advisory():
         forecast_list.append(day_data)
         
         # Rule Engine for Alerts
-        if rains[i] > 50:
+        if rains[i] is not None and rains[i] > 50:
             alerts.append(f"⚠️ Heavy rain ({rains[i]}mm) predicted on {dates[i]}. Ensure drainage.")
-        if winds[i] > 30:
+        if winds[i] is not None and winds[i] > 30:
             alerts.append(f"⚠️ High wind ({winds[i]}km/h) predicted on {dates[i]}. Support tall crops.")
-        if temps[i] > 35:
+        if temps[i] is not None and temps[i] > 35:
             alerts.append(f"⚠️ High heat ({temps[i]}°C) on {dates[i]}. Irrigate to cool soil.")
             
     # Crop Specific Logic (Mock)
+    rains = [r for r in rains if r is not None]
     crop_advice = ""
     if crop:
         if "Rice" in crop:
@@ -438,12 +1006,19 @@ def advisory():
             if any(r > 50 for r in rains):
                 crop_advice = "Maize is sensitive to waterlogging. Clear drainage channels immediately!"
     
-    return jsonify({
+    response = {
         "forecast": forecast_list,
         "alerts": alerts,
-        "crop_advice": crop_advice
-    })
+        "crop_advice": crop_advice,
+        "degraded": degraded_district is not None
+    }
+    if degraded_district:
+        response["source"] = "climatology"
+        response["district"] = degraded_district
+    with stage('serialize'):
+        return jsonify(response)
 
 
 if __name__ == '__main__':
+    # Development server; use serve.py in production
     app.run(debug=True, port=5000)
\ No newline at end of file
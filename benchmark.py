@@ -0,0 +1,213 @@
+"""Inference micro-benchmarks with a JSON baseline and regression gate.
+
+Inputs are rows sampled (seeded) from the training data, so encoders, the
+model and the handlers see realistic districts, crops, areas and rainfall.
+Result caches and the recommendation grid are disabled so the handler cases
+measure live scoring.
+
+    python benchmark.py --save benchmark_baseline.json      # record a baseline
+    python benchmark.py --compare benchmark_baseline.json   # exit 1 on regression
+    python benchmark.py --filter handler --min-time 2
+
+A case regresses when any gated percentile (--gate, default p50,p95) is more
+than --threshold (default 0.20, i.e. 20%) slower than in the baseline.
+"""
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+
+import numpy as np
+
+DATA_PATH = 'training_workspace/final_training_data_with_cost.csv'
+BASELINE_PATH = 'benchmark_baseline.json'
+BATCH_SIZE = 256
+BUDGETS = ['Low', 'Medium', 'High']
+SLOPES = ['Flat', 'Gentle', 'Steep']
+
+
+def load_samples(path=DATA_PATH, n=512, seed=0):
+    import pandas as pd
+
+    df = pd.read_csv(path).sample(n=n, replace=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+    # Training areas are whole-district totals; the app is used per farm, so rescale to 0.1-50 ha
+    farm_area = np.round(rng.uniform(0.1, 50, n), 2)
+    return [{
+        "district": row.District_Name,
+        "season": row.Season,
+        "crop": row.Crop,
+        "area": float(area),
+        "rainfall": float(row.Rainfall),
+        "budget": BUDGETS[i % 3],
+        "slope": SLOPES[(i // 3) % 3],
+        "month_idx": int(rng.integers(12))
+    } for i, (row, area) in enumerate(zip(df.itertuples(), farm_area))]
+
+
+def time_case(fn, inputs, min_time=1.0, min_calls=50, warmup=10):
+    """Call fn(x) cycling through inputs; returns per-call latencies in seconds."""
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    i = 0
+    while len(latencies) < min_calls or time.perf_counter() < deadline:
+        x = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    return np.array(latencies)
+
+
+def summarize(latencies, rows_per_call=1):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "calls": int(len(latencies)),
+        "rows_per_call": rows_per_call,
+        "p50_ms": round(p50 * 1000, 4),
+        "p95_ms": round(p95 * 1000, 4),
+        "p99_ms": round(p99 * 1000, 4),
+        "mean_ms": round(float(latencies.mean()) * 1000, 4),
+        "throughput_rows_per_s": round(rows_per_call * len(latencies) / float(latencies.sum()), 1)
+    }
+
+
+def build_cases(samples):
+    """(name, fn, inputs, rows_per_call) for every benchmark."""
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    os.environ['RECOMMEND_GRID_PATH'] = ''
+    import app
+
+    with open('agriculture_model_improved.pkl', 'rb') as f:
+        sk_model = pickle.load(f)
+    with open('label_encoders_improved.pkl', 'rb') as f:
+        encoders = pickle.load(f)
+
+    active = app.registry.active
+    builder = active.feature_builder
+    X = np.vstack([builder.build_row(s['district'], s['season'], s['crop'], s['area'], s['rainfall'],
+                                     app.get_estimated_cost(s['crop'], s['area'])) for s in samples])
+    rows = [X[i:i + 1] for i in range(len(X))]
+    batches = [X[np.arange(i, i + BATCH_SIZE) % len(X)] for i in range(0, len(X), BATCH_SIZE // 4)]
+    numerical = [np.array([[s['area'], s['rainfall'], app.get_estimated_cost(s['crop'], s['area'])]])
+                 for s in samples]
+
+    def encoder_transform(s):
+        encoders['district'].transform([s['district']])
+        encoders['season'].transform([s['season']])
+        encoders['crop'].transform([s['crop']])
+
+    client = app.app.test_client()
+
+    def post(endpoint):
+        def call(payload):
+            response = client.post(endpoint, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.get_data(as_text=True)}")
+        return call
+
+    cases = [
+        ("sklearn_predict_single", sk_model.predict, rows, 1),
+        (f"sklearn_predict_batch_{BATCH_SIZE}", sk_model.predict, batches, BATCH_SIZE),
+        (f"{active.engine}_predict_single", active.model.predict, rows, 1),
+        (f"{active.engine}_predict_batch_{BATCH_SIZE}", active.model.predict, batches, BATCH_SIZE),
+        ("label_encoder_transform", encoder_transform, samples, 1),
+        ("standard_scaler_transform", encoders['scaler'].transform, numerical, 1),
+        ("feature_builder_build_row",
+         lambda s: builder.build_row(s['district'], s['season'], s['crop'], s['area'], s['rainfall'], 1.0),
+         samples, 1),
+        ("get_estimated_cost", lambda s: app.get_estimated_cost(s['crop'], s['area']), samples, 1),
+        ("handler_predict", post('/predict'), samples, 1),
+        ("handler_recommend", post('/recommend'), samples, 1),
+        ("handler_forecast", post('/forecast'), samples, 1),
+        ("handler_analyze", post('/analyze'), samples, 1),
+        ("handler_sweep_20x20", post('/sweep'), [
+            {"district": s['district'], "season": s['season'], "crop": s['crop'],
+             "rainfall": {"min": 0.5 * s['rainfall'], "max": 1.5 * s['rainfall'], "steps": 20},
+             "area": {"min": 0.1, "max": 2 * s['area'], "steps": 20}} for s in samples
+        ], 400),
+    ]
+    return cases
+
+
+def run(filter_text=None, min_time=1.0):
+    samples = load_samples()
+    results = {}
+    for name, fn, inputs, rows_per_call in build_cases(samples):
+        if filter_text and filter_text not in name:
+            continue
+        results[name] = summarize(time_case(fn, inputs, min_time=min_time), rows_per_call)
+        r = results[name]
+        print(f"{name:34s} p50 {r['p50_ms']:9.4f} ms  p95 {r['p95_ms']:9.4f} ms  "
+              f"p99 {r['p99_ms']:9.4f} ms  {r['throughput_rows_per_s']:12.1f} rows/s")
+    return results
+
+
+def environment():
+    import sklearn
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(results, baseline, threshold, gates):
+    """Returns a list of human-readable regressions."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            print(f"{name}: not in baseline, skipped")
+            continue
+        for gate in gates:
+            key = f"{gate}_ms"
+            before, after = previous[key], current[key]
+            change = (after - before) / before if before > 0 else 0.0
+            marker = "REGRESSION" if change > threshold else "ok"
+            print(f"{name:34s} {gate}: {before:9.4f} -> {after:9.4f} ms ({change:+.1%}) {marker}")
+            if change > threshold:
+                regressions.append(f"{name} {gate} {change:+.1%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the inference path")
+    parser.add_argument('--save', metavar='PATH', help="Write results as a new baseline")
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=BASELINE_PATH,
+                        help=f"Compare against a baseline (default {BASELINE_PATH})")
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BENCHMARK_THRESHOLD', 0.20)),
+                        help="Allowed relative slowdown before failing (default 0.20)")
+    parser.add_argument('--gate', default='p50,p95', help="Percentiles that gate (p50, p95, p99)")
+    parser.add_argument('--filter', help="Only run cases whose name contains this text")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds to run each case")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.min_time)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.gate.split(','))
+        if regressions:
+            print(f"{len(regressions)} regression(s) past {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No regressions past {args.threshold:.0%}")
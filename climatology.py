@@ -0,0 +1,152 @@
+"""Rainfall climatology as arrays, for /forecast and the climatology fallbacks.
+
+Built once at load time:
+
+    normals   (district, month)          monthly normals (bundle / rainfall_monthly_averages.csv)
+    risk      (district, month)          erosion-risk band index into RISK_LABELS
+    cube      (district, year, month)    station-mean rainfall per bulletin year, NaN where missing
+
+The cube is built from the district rainfall bulletins at train time and
+shipped in the model bundle (rainfall_years/rainfall_cube). Older bundles
+and the pickle fallback parse RAINFALL_BULLETINS at load time instead,
+with rainfall_bulletins.py. Without either, normals and risk still work,
+but percentile and anomaly queries do not.
+
+Queries take arrays of district rows and are vectorized across
+districts, horizons and percentiles. A dashboard showing every district
+costs one set of gathers.
+"""
+import os
+
+import numpy as np
+
+from rainfall_bulletins import build_cube
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Monthly rainfall (mm) above which erosion risk is Medium / High
+EROSION_BANDS = (100.0, 300.0)
+RISK_LABELS = ('Low', 'Medium', 'High')
+
+RAINFALL_BULLETINS = os.environ.get('RAINFALL_BULLETINS', os.path.join('training_workspace', 'rainfall_raw.txt'))
+MAX_HORIZON = 36
+
+
+class Climatology:
+    def __init__(self, districts, normals, years=None, cube=None):
+        self.districts = list(districts)
+        self.rows = {d: i for i, d in enumerate(self.districts)}
+        self.normals = np.asarray(normals, dtype=np.float64).reshape(len(self.districts), 12)
+        # Band index per (district, month): > 100 mm Medium, > 300 mm High
+        self.risk = np.digitize(self.normals, EROSION_BANDS, right=True)
+        self.years = years if years is not None else np.array([], dtype=np.int64)
+        self.year_index = {int(y): j for j, y in enumerate(self.years)}
+        self.cube = cube
+        if cube is not None:
+            # Years sorted per (district, month), NaNs last, for interpolated percentiles by gathers
+            self.sorted_cube = np.sort(cube, axis=1)
+            self.counts = np.sum(~np.isnan(cube), axis=1)
+
+    @classmethod
+    def from_rainfall_data(cls, rainfall_data, history=None, bulletins=RAINFALL_BULLETINS):
+        """From the {district: {month: mm}} normals, plus the per-year cube.
+
+        `history` is a precomputed (years, cube) in rainfall_data's district
+        order (ModelBundle.rainfall_history); without it the cube is parsed
+        from `bulletins` when those exist.
+        """
+        districts = list(rainfall_data)
+        normals = [[rainfall_data[d].get(m, 0) for m in MONTHS] for d in districts]
+        if history is not None:
+            return cls(districts, normals, *history)
+        paths = [p for p in bulletins.split(',') if p and os.path.exists(p)] if bulletins else []
+        if not paths:
+            return cls(districts, normals)
+        years, cube = build_cube(paths, districts)
+        return cls(districts, normals, years, cube)
+
+    def __contains__(self, district):
+        return district in self.rows
+
+    def __len__(self):
+        return len(self.districts)
+
+    @property
+    def has_history(self):
+        return self.cube is not None and len(self.years) > 0
+
+    def normal(self, district, month_idx):
+        return float(self.normals[self.rows[district], month_idx % 12])
+
+    def row_indices(self, districts=None):
+        if districts is None:
+            return np.arange(len(self.districts))
+        return np.array([self.rows[d] for d in districts], dtype=np.intp)
+
+    def percentiles(self, rows, cols, q):
+        """(Q, R, H) percentiles over bulletin years, interpolated like np.nanpercentile."""
+        n = self.counts[rows][:, cols]  # (R, H)
+        q = np.asarray(q, dtype=np.float64).reshape(-1, 1, 1)
+        pos = q / 100 * np.maximum(n - 1, 0)  # (Q, R, H)
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+        frac = pos - lo
+        ordered = self.sorted_cube[rows][:, :, cols]  # (R, Y, H)
+        r = np.arange(len(rows)).reshape(1, -1, 1)
+        h = np.arange(len(cols)).reshape(1, 1, -1)
+        low, high = ordered[r, lo, h], ordered[r, hi, h]
+        values = low + (high - low) * frac
+        return np.where(n > 0, values, np.nan)
+
+    def outlook(self, rows, month_idx, months=3, percentiles=(), year=None):
+        """Arrays for `months` months from month_idx, for each district row.
+
+        Returns month_cols (H,), normals/risk (R, H), percentiles (Q, R, H) and,
+        with `year`, observed/anomaly/percent_of_normal (R, H).
+        """
+        cols = (month_idx + np.arange(months)) % 12
+        result = {
+            'month_cols': cols,
+            'normal': self.normals[rows][:, cols],
+            'risk': self.risk[rows][:, cols],
+        }
+        if percentiles or year is not None:
+            if not self.has_history:
+                raise LookupError("Per-year rainfall history is not loaded")
+        if percentiles:
+            result['percentiles'] = self.percentiles(rows, cols, percentiles)
+        if year is not None:
+            if year not in self.year_index:
+                raise LookupError(f"No rainfall bulletin for {year}")
+            observed = self.cube[rows, self.year_index[year]][:, cols]
+            result['observed'] = observed
+            result['anomaly'] = observed - result['normal']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result['percent_of_normal'] = np.where(result['normal'] > 0,
+                                                       observed / result['normal'] * 100, np.nan)
+        return result
+
+    def outlook_records(self, rows, month_idx, months=3, percentiles=(), year=None):
+        """outlook() as one list of per-month dicts per district row (JSON-ready, NaN -> None)."""
+        result = self.outlook(rows, month_idx, months, percentiles, year)
+        names = [MONTHS[c] for c in result['month_cols']]
+        extra = {}
+        if percentiles:
+            extra.update({f"p{q:g}": result['percentiles'][k] for k, q in enumerate(percentiles)})
+        if year is not None:
+            extra.update({k: result[k] for k in ('observed', 'anomaly', 'percent_of_normal')})
+        # One tolist() per array instead of a float() per cell
+        normal = result['normal'].tolist()
+        risk = result['risk'].tolist()
+        extra = {k: np.where(np.isnan(v), None, np.round(v, 2)).tolist() for k, v in extra.items()}
+
+        records = []
+        for r in range(len(rows)):
+            months_out = []
+            for h, name in enumerate(names):
+                item = {"month": name, "rainfall": normal[r][h], "erosion_risk": RISK_LABELS[risk[r][h]]}
+                for key, values in extra.items():
+                    item[key] = values[r][h]
+                months_out.append(item)
+            records.append(months_out)
+        return records
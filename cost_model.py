@@ -0,0 +1,68 @@
+"""Cost of cultivation, shared by serving (app.py) and training (augment_data.py).
+
+A crop's per-hectare base cost comes from the first COST_MAP key found
+(case-insensitively) inside its name, else DEFAULT_BASE_COST. Each distinct
+crop name is resolved once; costs for whole arrays of (crop, area) are then
+one lookup per distinct name plus a vectorized multiply.
+
+Training data adds a seeded +/-10% variance per row. `with_variance`
+reproduces augment_data.py's original np.random.seed(42) + per-row
+np.random.uniform(0.9, 1.1) sequence exactly.
+"""
+import numpy as np
+
+# Approximate Cost of Cultivation per Hectare (in INR)
+# These are estimates for demonstration purposes
+COST_MAP = {
+    'Rice': 40000, 'Banana': 100000, 'Maize': 30000, 'Linseed': 20000,
+    'Cowpea(Lobia)': 25000, 'Peas & beans (Pulses)': 35000, 'Rapeseed &Mustard': 25000,
+    'Sugarcane': 80000, 'Tobacco': 50000, 'Wheat': 35000, 'Jute': 45000,
+    'Mesta': 20000, 'Potato': 60000, 'Turmeric': 70000, 'Ginger': 80000,
+    'Arecanut': 90000, 'Black pepper': 100000, 'Cashewnut': 50000, 'Tapioca': 40000
+}
+DEFAULT_BASE_COST = 30000
+
+# Training-data variance: cost = area * base * U(0.9, 1.1), seeded for reproducibility
+VARIANCE_RANGE = (0.9, 1.1)
+VARIANCE_SEED = 42
+
+
+def resolve_base_cost(crop):
+    crop = str(crop).lower()
+    for key, cost in COST_MAP.items():
+        if key.lower() in crop:
+            return cost
+    return DEFAULT_BASE_COST
+
+
+class CostModel:
+    def __init__(self, crops=()):
+        # Crop name -> per-hectare base cost; names outside the vocabulary are added on first use
+        self.base = {crop: resolve_base_cost(crop) for crop in crops}
+
+    def base_cost(self, crop):
+        cost = self.base.get(crop)
+        if cost is None:
+            cost = resolve_base_cost(crop)
+            if len(self.base) < 4096:  # user-supplied names; don't grow without bound
+                self.base[crop] = cost
+        return cost
+
+    def base_costs(self, crops):
+        # Resolve each distinct name once, then broadcast back to the rows
+        names, inverse = np.unique(np.asarray(crops, dtype=object).astype(str), return_inverse=True)
+        return np.array([self.base_cost(name) for name in names], dtype=np.float64)[inverse]
+
+    def estimate(self, crop, area):
+        return area * self.base_cost(crop)
+
+    def estimate_many(self, crops, areas):
+        return np.asarray(areas, dtype=np.float64) * self.base_costs(crops)
+
+    def with_variance(self, crops, areas, seed=VARIANCE_SEED):
+        """Training-data costs: estimate_many times a seeded U(0.9, 1.1) per row."""
+        variance = np.random.RandomState(seed).uniform(*VARIANCE_RANGE, size=len(areas))
+        return self.estimate_many(crops, areas) * variance
+
+
+cost_model = CostModel(COST_MAP)
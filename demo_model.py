@@ -1,6 +1,8 @@
 import pickle
 import pandas as pd
 import numpy as np
+from features import FeatureBuilder
+from cost_model import cost_model
 
 def demo_model():
     # Load Model and Encoders
@@ -9,7 +11,7 @@ def demo_model():
             model = pickle.load(f)
         with open('label_encoders_improved.pkl', 'rb') as f:
             encoders = pickle.load(f)
-            scaler = encoders.get('scaler')
+        feature_builder = FeatureBuilder.from_encoders(encoders)
         print("Model loaded successfully.")
     except Exception as e:
         print(f"Error loading model: {e}")
@@ -19,11 +21,6 @@ def demo_model():
     # District, Season, Crop, Area, Rainfall
     # Note: Cost is needed for the model but not in this simple list. We'll estimate it.
     
-    # Cost Map (Simplified for demo)
-    COST_MAP = {
-        'Rice': 40000, 'Banana': 100000, 'Maize': 30000
-    }
-    
     test_cases = [
         {
             'District': 'EAST KHASI HILLS',
@@ -54,22 +51,11 @@ def demo_model():
 
     for case in test_cases:
         try:
-            district_enc = encoders['district'].transform([case['District']])[0]
-            season_enc = encoders['season'].transform([case['Season']])[0]
-            crop_enc = encoders['crop'].transform([case['Crop']])[0]
-            
             # Estimate Cost
-            base_cost = COST_MAP.get(case['Crop'], 30000)
-            cost = case['Area'] * base_cost
-            
-            # Scale numerical features
-            numerical_features = np.array([[case['Area'], case['Rainfall'], cost]])
-            numerical_features_scaled = scaler.transform(numerical_features)
+            cost = cost_model.estimate(case['Crop'], case['Area'])
             
-            features = np.array([[district_enc, season_enc, crop_enc, 
-                                  numerical_features_scaled[0][0], 
-                                  numerical_features_scaled[0][1], 
-                                  numerical_features_scaled[0][2]]])
+            features = feature_builder.build_row(case['District'], case['Season'], case['Crop'],
+                                                 case['Area'], case['Rainfall'], cost)
                                   
             prediction_log = model.predict(features)[0]
             prediction = np.expm1(prediction_log)
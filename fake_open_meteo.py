@@ -0,0 +1,105 @@
+"""Local stand-in for the Open-Meteo forecast API.
+
+Serves deterministic Open-Meteo-shaped daily forecasts with tunable latency
+and error rate, so the weather path can be exercised without the real API:
+
+    python fake_open_meteo.py --port 8765 --latency 0.2 --error-rate 0.1
+    OPEN_METEO_URL=http://127.0.0.1:8765/v1/forecast python app.py
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_forecast(lat, lon, days=7):
+    # Same lat/lon always gives the same forecast
+    rng = random.Random(f"{lat:.4f},{lon:.4f}")
+    today = datetime.date.today()
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "timezone": "Asia/Kolkata",
+        "daily": {
+            "time": [(today + datetime.timedelta(days=i)).isoformat() for i in range(days)],
+            "temperature_2m_max": [round(rng.uniform(18, 38), 1) for _ in range(days)],
+            "precipitation_sum": [round(rng.uniform(0, 80), 1) for _ in range(days)],
+            "wind_speed_10m_max": [round(rng.uniform(2, 40), 1) for _ in range(days)]
+        }
+    }
+
+
+class FakeOpenMeteoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        config = self.server.config
+        with self.server.lock:
+            self.server.request_count += 1
+
+        url = urlparse(self.path)
+        if url.path != '/v1/forecast':
+            self._send(404, {"error": True, "reason": "Not found"})
+            return
+
+        if config['latency'] > 0:
+            time.sleep(config['latency'] * random.uniform(1 - config['jitter'], 1 + config['jitter']))
+
+        if random.random() < config['error_rate']:
+            self._send(503, {"error": True, "reason": "Injected upstream error"})
+            return
+
+        params = parse_qs(url.query)
+        try:
+            lat = float(params['latitude'][0])
+            lon = float(params['longitude'][0])
+        except (KeyError, ValueError):
+            self._send(400, {"error": True, "reason": "latitude and longitude required"})
+            return
+        self._send(200, make_forecast(lat, lon))
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, latency=0.0, error_rate=0.0, jitter=0.0):
+    """Start the stub in a background thread; returns the server.
+
+    server.url is the forecast URL to use as OPEN_METEO_URL, server.config can
+    be changed while running, and server.request_count counts upstream calls.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeOpenMeteoHandler)
+    server.daemon_threads = True
+    server.config = {'latency': latency, 'error_rate': error_rate, 'jitter': jitter}
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Open-Meteo stand-in")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Relative latency jitter (0-1)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.error_rate, args.jitter)
+    print(f"Fake Open-Meteo listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
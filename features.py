@@ -0,0 +1,89 @@
+import numpy as np
+
+# Column order the model was trained on (see train_improved_model.py)
+CATEGORICAL_COLUMNS = ['district', 'season', 'crop']
+NUMERICAL_COLUMNS = ['area', 'rainfall', 'cost']
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a district/season/crop is not in the encoder vocabulary."""
+
+    def __init__(self, column, value):
+        super().__init__(f"Unknown {column}: {value}")
+        self.column = column
+        self.value = value
+
+    def to_dict(self):
+        return {"error": str(self), "field": self.column, "value": self.value}
+
+
+class FeatureBuilder:
+    """Turns raw inputs into the 6-column model matrix.
+
+    Holds plain dict lookup tables for the categorical encoders and the
+    scaler's mean/scale as arrays, so building features costs a few dict
+    lookups and one vectorized subtract/divide instead of three validated
+    LabelEncoder.transform calls plus a StandardScaler.transform.
+    """
+
+    def __init__(self, vocabularies, mean, scale):
+        self.vocabularies = {col: list(vocab) for col, vocab in vocabularies.items()}
+        self.tables = {col: {label: i for i, label in enumerate(vocab)}
+                       for col, vocab in self.vocabularies.items()}
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_encoders(cls, encoders):
+        scaler = encoders['scaler']
+        n = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n)
+        vocabularies = {col: [str(c) for c in encoders[col].classes_] for col in CATEGORICAL_COLUMNS}
+        return cls(vocabularies, mean, scale)
+
+    def encode(self, column, value):
+        try:
+            return self.tables[column][value]
+        except (KeyError, TypeError):
+            raise UnknownCategoryError(column, value)
+
+    def encode_many(self, column, values):
+        # Returns (codes, valid_mask); unknown labels get code 0 and valid=False
+        table = self.tables[column]
+        codes = np.array([table.get(v, -1) if isinstance(v, str) else -1 for v in values], dtype=np.intp)
+        valid = codes >= 0
+        return np.where(valid, codes, 0), valid
+
+    def scale_numerical(self, numerical):
+        numerical = np.asarray(numerical, dtype=np.float64)
+        return (numerical - self.mean) / self.scale
+
+    def assemble(self, district_enc, season_enc, crop_enc, numerical):
+        # District, Season, Crop, Area_Scaled, Rainfall_Scaled, Cost_Scaled
+        numerical = np.atleast_2d(numerical)
+        n = numerical.shape[0]
+        features = np.empty((n, 6))
+        features[:, 0] = district_enc
+        features[:, 1] = season_enc
+        features[:, 2] = crop_enc
+        features[:, 3:] = self.scale_numerical(numerical)
+        return features
+
+    def build_row(self, district, season, crop, area, rainfall, cost):
+        return self.assemble(
+            self.encode('district', district),
+            self.encode('season', season),
+            self.encode('crop', crop),
+            [[area, rainfall, cost]]
+        )
+
+    def build_batch(self, districts, seasons, crops, area, rainfall, cost):
+        # Columnar batch; raises UnknownCategoryError for the first unknown label
+        codes = []
+        for column, values in zip(CATEGORICAL_COLUMNS, (districts, seasons, crops)):
+            enc, valid = self.encode_many(column, values)
+            if not valid.all():
+                raise UnknownCategoryError(column, values[int(np.argmin(valid))])
+            codes.append(enc)
+        return self.assemble(*codes, np.column_stack([area, rainfall, cost]))
@@ -116,40 +116,26 @@ function MainTool({ language, setLanguage }) {
             // 3. Generate AI Advice
             const advice = generateAIAdvice(formData.crop, formData.district, formData.sowing_date);
 
-            // 4. Existing Backend Calls
-            const forecastRes = await axios.post(`${API_URL}/forecast`, { district: formData.district });
-
-            let rainfallVal = formData.rainfall;
-            if (!rainfallVal && forecastRes.data.forecast.length > 0) {
-                rainfallVal = forecastRes.data.forecast[0].rainfall;
-            }
-
+            // 4. Backend Analysis (forecast, recommendation and prediction in one round trip)
             // Convert Acres to Hectares for Backend
             // 1 Acre = 0.404686 Hectares
             const areaInHectares = Number(formData.area) * 0.404686;
 
-            // 5. Get ML Recommendation
-            const recommendRes = await axios.post(`${API_URL}/recommend`, {
-                ...formData,
-                area: areaInHectares,
-                rainfall: Number(rainfallVal || 0)
-            });
-
-            const predictRes = await axios.post(`${API_URL}/predict`, {
+            const analyzeRes = await axios.post(`${API_URL}/analyze`, {
                 ...formData,
                 area: areaInHectares, // Send Hectares to model
-                rainfall: Number(rainfallVal || 0)
+                rainfall: formData.rainfall ? Number(formData.rainfall) : undefined // Backend falls back to the forecast
             });
 
             // Navigate to Results Page with all data
             setTimeout(() => {
                 navigate('/results', {
                     state: {
-                        prediction: predictRes.data,
+                        prediction: analyzeRes.data.prediction,
                         erosionRisk: risk,
                         longForecast: weatherData,
                         aiAdvice: advice,
-                        recommendation: recommendRes.data, // Pass recommendation
+                        recommendation: analyzeRes.data.recommendation, // Pass recommendation
                         formData: formData,
                         inputAreaAcres: formData.area // Pass original input for display
                     }
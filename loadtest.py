@@ -0,0 +1,262 @@
+"""Open-loop HTTP load generator for the backend.
+
+Sessions arrive as a Poisson process at --rate per second, whatever the
+server's response times (open loop, so a slow server builds a backlog
+instead of quietly lowering the offered load). Each session replays the
+frontend's call sequence:
+
+    maintool   GET /info, then POST /analyze                (MainTool.jsx today)
+    split      GET /info, POST /forecast, /recommend, /predict
+               (the sequence MainTool.jsx sent before /analyze existed)
+
+plus POST /advisory for --advisory-share of sessions. Inputs are sampled
+from the training data (see benchmark.load_samples).
+
+By default the harness starts a local fake Open-Meteo (fake_open_meteo.py)
+and the app on a free port, pointed at it:
+
+    python loadtest.py --rate 20 --duration 30
+    python loadtest.py --sweep 10,20,40,80 --duration 15 --upstream-latency 0.3 --upstream-error-rate 0.05
+    python loadtest.py --workers 4 --sweep 20,40,80,160          # the production server (serve.py)
+    python loadtest.py --url http://127.0.0.1:5000 --rate 50     # an already running server
+
+Reports per-endpoint latency percentiles, throughput and error rate. With
+--sweep it also reports the saturation point: the highest offered rate the
+server kept up with (>= 95% of offered throughput, < 1% errors).
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmark import load_samples
+from fake_open_meteo import start_server
+
+SCENARIOS = {
+    'maintool': ['info', 'analyze'],
+    'split': ['info', 'forecast', 'recommend', 'predict']
+}
+
+# Around Shillong, the frontend's default location
+DEFAULT_LAT, DEFAULT_LON = 25.4670, 91.3662
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_app(port, open_meteo_url, workers=None, threads=None):
+    """Run the app on port; returns the process.
+
+    With `workers`, runs the production server (serve.py), otherwise the
+    threaded development server.
+    """
+    env = dict(os.environ, OPEN_METEO_URL=open_meteo_url, PYTHONWARNINGS='ignore')
+    if workers:
+        env.update(WEB_HOST='127.0.0.1', WEB_PORT=str(port), WEB_WORKERS=str(workers))
+        if threads:
+            env['WEB_THREADS'] = str(threads)
+        command = [sys.executable, 'serve.py']
+    else:
+        command = [sys.executable, '-c', f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("App exited during startup")
+        try:
+            if requests.get(f"{url}/ready", timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App did not become ready within 60s")
+
+
+class LoadGenerator:
+    def __init__(self, url, scenario='maintool', advisory_share=0.3, seed=0, timeout=10, max_workers=512):
+        self.url = url.rstrip('/')
+        self.steps = SCENARIOS[scenario]
+        self.advisory_share = advisory_share
+        self.samples = load_samples(seed=seed)
+        self.rng = random.Random(seed)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def session(self):
+        # One keep-alive connection pool per worker thread, like one browser per user
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def request(self, endpoint, payload):
+        method, path = ('GET', '/info') if endpoint == 'info' else ('POST', f'/{endpoint}')
+        start = time.perf_counter()
+        try:
+            response = self.session().request(method, self.url + path, json=payload, timeout=self.timeout)
+            ok = response.status_code < 400
+            status = response.status_code
+        except requests.RequestException:
+            ok, status = False, 'error'
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.records.append((endpoint, elapsed, ok, status, time.perf_counter()))
+        return ok
+
+    def run_session(self, sample, advisory, lat, lon):
+        for step in self.steps:
+            if not self.request(step, None if step == 'info' else sample):
+                return
+        if advisory:
+            self.request('advisory', {"lat": lat, "lon": lon, "crop": sample['crop'], "district": sample['district']})
+
+    def run(self, rate, duration):
+        """Offer `rate` sessions/s for `duration` seconds; returns the report."""
+        self.records = []
+        lags = []
+        n_sessions = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            start = time.perf_counter()
+            next_at = start
+            while True:
+                next_at += self.rng.expovariate(rate)
+                if next_at - start >= duration:
+                    break
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                lags.append(max(0.0, -delay))
+                sample = self.samples[n_sessions % len(self.samples)]
+                advisory = self.rng.random() < self.advisory_share
+                lat = DEFAULT_LAT + self.rng.uniform(-0.5, 0.5)
+                lon = DEFAULT_LON + self.rng.uniform(-1.0, 1.0)
+                pool.submit(self.run_session, sample, advisory, lat, lon)
+                n_sessions += 1
+            offered_end = time.perf_counter()
+        wall = time.perf_counter() - start
+        return self.report(rate, duration, n_sessions, start, wall, offered_end - start, np.array(lags))
+
+    def report(self, rate, duration, n_sessions, start, wall, offered, lags):
+        endpoints = {}
+        for endpoint in sorted({r[0] for r in self.records}):
+            rows = [r for r in self.records if r[0] == endpoint]
+            latencies = np.array([r[1] for r in rows])
+            errors = sum(1 for r in rows if not r[2])
+            statuses = {}
+            for r in rows:
+                statuses[str(r[3])] = statuses.get(str(r[3]), 0) + 1
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            endpoints[endpoint] = {
+                "requests": len(rows),
+                "errors": errors,
+                "error_rate": round(errors / len(rows), 4),
+                "statuses": statuses,
+                "p50_ms": round(p50 * 1000, 2),
+                "p95_ms": round(p95 * 1000, 2),
+                "p99_ms": round(p99 * 1000, 2),
+                "max_ms": round(float(latencies.max()) * 1000, 2),
+                "throughput_rps": round(len(rows) / wall, 2)
+            }
+        total = len(self.records)
+        errors = sum(1 for r in self.records if not r[2])
+        # Requests completed inside the offered window, i.e. what the server kept up with
+        in_window = sum(1 for r in self.records if r[4] <= start + offered)
+        return {
+            "offered_sessions_per_s": rate,
+            "duration_s": duration,
+            "sessions": n_sessions,
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "offered_rps": round(total / offered, 2) if offered else 0.0,
+            "achieved_rps": round(in_window / offered, 2) if offered else 0.0,
+            "drain_s": round(wall - offered, 2),
+            "generator_lag_p99_ms": round(float(np.percentile(lags, 99)) * 1000, 2) if len(lags) else 0.0,
+            "endpoints": endpoints
+        }
+
+
+def print_report(report):
+    print(f"\nOffered {report['offered_sessions_per_s']} sessions/s for {report['duration_s']}s: "
+          f"{report['requests']} requests, {report['offered_rps']} req/s offered, "
+          f"{report['achieved_rps']} req/s achieved, {report['error_rate']:.2%} errors, "
+          f"drained in {report['drain_s']}s (generator lag p99 {report['generator_lag_p99_ms']} ms)")
+    print(f"{'endpoint':12s} {'reqs':>7s} {'err%':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'rps':>8s}")
+    for name, e in report['endpoints'].items():
+        print(f"{name:12s} {e['requests']:7d} {e['error_rate']:7.2%} {e['p50_ms']:9.2f} "
+              f"{e['p95_ms']:9.2f} {e['p99_ms']:9.2f} {e['throughput_rps']:8.2f}")
+
+
+def saturation(reports):
+    # Highest offered rate that was served at >= 95% of offered throughput with < 1% errors
+    kept_up = [r for r in reports if r['achieved_rps'] >= 0.95 * r['offered_rps'] and r['error_rate'] < 0.01]
+    if not kept_up:
+        return None
+    best = max(kept_up, key=lambda r: r['offered_sessions_per_s'])
+    return {"sessions_per_s": best['offered_sessions_per_s'], "requests_per_s": best['achieved_rps']}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-loop load test for the backend")
+    parser.add_argument('--url', help="Target an already running server instead of spawning one")
+    parser.add_argument('--workers', type=int, help="Spawn serve.py with this many workers (default: dev server)")
+    parser.add_argument('--threads', type=int, help="Threads per serve.py worker")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='maintool')
+    parser.add_argument('--rate', type=float, default=10, help="Session arrivals per second")
+    parser.add_argument('--sweep', help="Comma-separated rates to run in turn, e.g. 10,20,40,80")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds per rate")
+    parser.add_argument('--advisory-share', type=float, default=0.3, help="Fraction of sessions calling /advisory")
+    parser.add_argument('--upstream-latency', type=float, default=0.2, help="Fake Open-Meteo latency (s)")
+    parser.add_argument('--upstream-jitter', type=float, default=0.5)
+    parser.add_argument('--upstream-error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the reports as JSON")
+    args = parser.parse_args()
+
+    process = None
+    upstream = None
+    url = args.url
+    if not url:
+        upstream = start_server(latency=args.upstream_latency, error_rate=args.upstream_error_rate,
+                                jitter=args.upstream_jitter)
+        process, url = spawn_app(free_port(), upstream.url, args.workers, args.threads)
+        print(f"App on {url}, fake Open-Meteo on {upstream.url}")
+
+    try:
+        generator = LoadGenerator(url, args.scenario, args.advisory_share, args.seed, args.timeout)
+        rates = [float(r) for r in args.sweep.split(',')] if args.sweep else [args.rate]
+        reports = []
+        for rate in rates:
+            report = generator.run(rate, args.duration)
+            if upstream is not None:
+                report['upstream_requests'] = upstream.request_count
+            print_report(report)
+            reports.append(report)
+
+        result = {"scenario": args.scenario, "url": url, "reports": reports}
+        if len(reports) > 1:
+            result['saturation'] = saturation(reports)
+            print(f"\nSaturation: {result['saturation']}")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
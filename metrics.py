@@ -0,0 +1,334 @@
+"""In-process request/stage metrics, exposed in Prometheus text format.
+
+Everything is plain counters and fixed-bucket histograms behind a lock, so
+recording a sample costs a couple of perf_counter calls and a bisect and can
+stay on in production:
+
+    agri_http_requests_total{endpoint,method,status}
+    agri_http_request_errors_total{endpoint,kind}        kind: client | server | exception
+    agri_http_requests_in_flight{endpoint}
+    agri_http_request_duration_seconds{endpoint}
+    agri_stage_duration_seconds{endpoint,stage}          encode, scale, predict, grid_lookup,
+                                                         upstream_fetch, serialize
+    agri_upstream_fetch_duration_seconds{upstream,outcome}
+    agri_predict_batch_rows, agri_predict_batch_queue_wait_seconds   (predict_batcher.py)
+
+Handlers time their stages with `with stage('predict'): ...`; the endpoint
+label comes from the current Flask request ("background" outside one).
+
+Multi-worker servers (serve.py) call enable_multiprocess(directory) before
+forking. Each process then writes its own samples to
+metrics-<pid>.json there, every METRICS_FLUSH_SECONDS and on each scrape.
+/metrics sums the files of all processes, so a scrape sees the whole server
+whichever worker answers it, up to one flush interval behind. Counters and
+histograms of exited workers keep counting toward the totals; their gauges
+are dropped.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+# Seconds; spans a cached response (~0.1 ms) up to a slow upstream call
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    @staticmethod
+    def combine(total, values):
+        for labels, value in values.items():
+            total[labels] = total.get(labels, 0) + value
+
+    def samples(self, values=None):
+        items = sorted((self.snapshot() if values is None else values).items())
+        for labels, value in items:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {labels: [list(e[0]), e[1], e[2]] for labels, e in self.values.items()}
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    @staticmethod
+    def combine(total, values):
+        for labels, (counts, value_sum, count) in values.items():
+            entry = total.get(labels)
+            if entry is None:
+                total[labels] = [list(counts), value_sum, count]
+            else:
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += value_sum
+                entry[2] += count
+
+    def samples(self, values=None):
+        items = sorted((self.snapshot() if values is None else values).items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {count}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+    def render(self, values=None):
+        """Exposition text of this process's samples, or of `values` ({name: {labels: value}})."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples(None if values is None else values.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.add(Counter(
+    'agri_http_requests_total', 'HTTP requests handled.', ('endpoint', 'method', 'status')))
+ERRORS = registry.add(Counter(
+    'agri_http_request_errors_total', 'HTTP requests that ended in a 4xx, 5xx or unhandled exception.',
+    ('endpoint', 'kind')))
+IN_FLIGHT = registry.add(Gauge(
+    'agri_http_requests_in_flight', 'HTTP requests currently being handled.', ('endpoint',)))
+REQUEST_SECONDS = registry.add(Histogram(
+    'agri_http_request_duration_seconds', 'Wall time per HTTP request.', ('endpoint',)))
+STAGE_SECONDS = registry.add(Histogram(
+    'agri_stage_duration_seconds', 'Wall time per request stage.', ('endpoint', 'stage')))
+UPSTREAM_SECONDS = registry.add(Histogram(
+    'agri_upstream_fetch_duration_seconds', 'Wall time per upstream API call.', ('upstream', 'outcome')))
+BATCH_ROWS = registry.add(Histogram(
+    'agri_predict_batch_rows', 'Rows per micro-batched /predict model call.', (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)))
+BATCH_QUEUE_SECONDS = registry.add(Histogram(
+    'agri_predict_batch_queue_wait_seconds', 'Time a /predict row waited for its micro-batch.'))
+
+
+def current_endpoint():
+    if has_request_context():
+        return g.get('metrics_endpoint', 'unmatched')
+    return 'background'
+
+
+class stage:
+    """Context manager timing one stage of the current request."""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, (current_endpoint(), self.name))
+        return False
+
+
+def instrument(app):
+    """Count, time and track in-flight requests for every route of a Flask app."""
+
+    @app.before_request
+    def _start_request():
+        # Route pattern, not the raw path, keeps label cardinality bounded
+        g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.metrics_start = time.perf_counter()
+        IN_FLIGHT.inc((g.metrics_endpoint,))
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        if 'metrics_start' not in g:
+            return
+        endpoint = g.metrics_endpoint
+        status = g.get('metrics_status', 500)
+        IN_FLIGHT.dec((endpoint,))
+        REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, (endpoint,))
+        REQUESTS.inc((endpoint, request.method, str(status)))
+        if exc is not None:
+            ERRORS.inc((endpoint, 'exception'))
+        elif status >= 500:
+            ERRORS.inc((endpoint, 'server'))
+        elif status >= 400:
+            ERRORS.inc((endpoint, 'client'))
+
+
+# --- Multi-worker aggregation ---
+
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1.0))
+
+multiprocess_dir = None
+_flusher_pid = None
+
+
+def enable_multiprocess(directory):
+    """Share samples through per-process files in `directory`; call once, before forking."""
+    global multiprocess_dir
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        os.remove(path)  # a previous run's counts
+    multiprocess_dir = directory
+    flush()
+
+
+def flush():
+    # Atomic replace, so a scrape never reads a half-written file
+    state = {name: [[list(labels), value] for labels, value in values.items()]
+             for name, values in registry.snapshot().items()}
+    path = os.path.join(multiprocess_dir, f'metrics-{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def start_flusher(interval=METRICS_FLUSH_SECONDS):
+    """In a forked worker: drop the samples inherited from the master and flush periodically."""
+    global _flusher_pid
+    if multiprocess_dir is None or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    registry.reset()
+
+    def loop():
+        while True:
+            flush()
+            time.sleep(interval)
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect(directory):
+    """Sum of every process's samples in `directory`, as {name: {labels: value}}."""
+    totals = {metric.name: {} for metric in registry.metrics}
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        alive = _alive(pid)
+        for metric in registry.metrics:
+            if metric.kind == 'gauge' and not alive:
+                continue
+            values = {tuple(labels): value for labels, value in state.get(metric.name, [])}
+            metric.combine(totals[metric.name], values)
+    return totals
+
+
+def render():
+    if multiprocess_dir is None:
+        return registry.render()
+    flush()
+    return registry.render(collect(multiprocess_dir))
@@ -0,0 +1,259 @@
+"""Single versioned, memory-mappable bundle of everything serving needs.
+
+A bundle is a directory of plain .npy arrays plus manifest.json:
+
+    model_bundle/
+        manifest.json      version, array dtypes/shapes/sha256, vocabularies,
+                           model scalars, bundle checksum
+        tree_*.npy         flattened GradientBoosting ensemble (see fast_model.py);
+                           tree_category/tree_cat_left only for categorical splits,
+                           tree_missing_left only for models that route NaN
+        scaler_mean.npy, scaler_scale.npy
+        rainfall_monthly.npy
+        rainfall_years.npy, rainfall_cube.npy
+                           per-year climatology (district, year, month) from the
+                           rainfall bulletins; only when the build had them
+        estimator          the sklearn estimator, for batches too large for the flat engine:
+                           by default a reference (relative path + sha256) to the model
+                           pickle written next to the bundle, otherwise estimator.pkl
+
+Arrays are opened with np.load(mmap_mode='r'), so loading does no
+deserialization and forked workers share the same page-cache pages. The
+estimator is only unpickled when the first large batch needs it (serve.py
+does it before forking); bundles without one serve every batch with the
+flat engine.
+
+    python model_bundle.py build     # from the pickles + rainfall CSV (+ bulletins) in this directory
+    python model_bundle.py verify    # re-hash every array against the manifest
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+from fast_model import FlatTreeEnsemble, RoutedEnsemble
+from features import CATEGORICAL_COLUMNS, FeatureBuilder
+from rainfall_bulletins import build_cube
+
+BUNDLE_PATH = 'model_bundle'
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 2
+# Format 1 bundles (no categorical splits, float32 inputs) still load
+READABLE_FORMATS = (1, 2)
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+TREE_ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots', 'children']
+ESTIMATOR = 'estimator.pkl'
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_bundle(path, model, encoders, rainfall_df, version=None, lineage=None, bulletins=(),
+                 estimator_path=None):
+    """Write model + encoders + rainfall climatology as a bundle directory.
+
+    `bulletins` (rainfall bulletin files) are parsed into the per-year
+    climatology cube here, so serving never has to. `estimator_path` is an
+    existing pickle of `model` to reference instead of copying it into the
+    bundle. `lineage` (a list of update records, oldest first) is stored in
+    the manifest as is.
+    """
+    flat = model if isinstance(model, FlatTreeEnsemble) else FlatTreeEnsemble.from_sklearn(model)
+    builder = FeatureBuilder.from_encoders(encoders)
+    rainfall_df = rainfall_df.set_index('District')
+
+    arrays = {f'tree_{name}': getattr(flat, name) for name in TREE_ARRAYS}
+    if flat.category is not None:
+        arrays['tree_category'] = flat.category
+        arrays['tree_cat_left'] = flat.cat_left
+    if flat.missing_left is not None:
+        arrays['tree_missing_left'] = flat.missing_left
+    arrays['scaler_mean'] = builder.mean
+    arrays['scaler_scale'] = builder.scale
+    arrays['rainfall_monthly'] = rainfall_df[MONTHS].to_numpy(dtype=np.float64)
+    bulletins = [p for p in bulletins if os.path.exists(p)]
+    if bulletins:
+        arrays['rainfall_years'], arrays['rainfall_cube'] = build_cube(bulletins, [str(d) for d in rainfall_df.index])
+
+    os.makedirs(path, exist_ok=True)
+    entries = {}
+    for name, array in arrays.items():
+        file_path = os.path.join(path, f'{name}.npy')
+        np.save(file_path, np.ascontiguousarray(array))
+        entries[name] = {
+            'file': f'{name}.npy',
+            'dtype': str(array.dtype),
+            'shape': list(array.shape),
+            'sha256': _sha256(file_path)
+        }
+
+    estimator = None
+    if estimator_path:
+        estimator = {'file': os.path.relpath(estimator_path, path), 'sha256': _sha256(estimator_path)}
+    elif not isinstance(model, FlatTreeEnsemble):
+        with open(os.path.join(path, ESTIMATOR), 'wb') as f:
+            pickle.dump(model, f)
+        estimator = {'file': ESTIMATOR, 'sha256': _sha256(os.path.join(path, ESTIMATOR))}
+
+    checksum = hashlib.sha256(''.join(entries[k]['sha256'] for k in sorted(entries)).encode()).hexdigest()
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version or f"{created_at:%Y%m%d%H%M%S}-{checksum[:8]}",
+        'created_at': created_at.isoformat(),
+        'model': {
+            'max_depth': int(flat.max_depth),
+            'init_value': flat.init_value,
+            'learning_rate': flat.learning_rate,
+            'n_features': int(flat.n_features_in_),
+            'n_trees': int(len(flat.roots)),
+            'input_dtype': str(flat.input_dtype)
+        },
+        'vocabularies': builder.vocabularies,
+        'rainfall_districts': [str(d) for d in rainfall_df.index],
+        'rainfall_bulletins': [os.path.basename(p) for p in bulletins],
+        'months': MONTHS,
+        'arrays': entries,
+        'checksum': checksum
+    }
+    if estimator:
+        manifest['estimator'] = estimator
+    if lineage:
+        manifest['lineage'] = lineage
+    # Manifest last, so a half-written bundle is never picked up
+    tmp_path = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+    return manifest
+
+
+class ModelBundle:
+    def __init__(self, path, manifest, arrays):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.arrays = arrays
+
+        meta = manifest['model']
+        # Plain ndarray views of the mapped files: the same shared pages, without
+        # np.memmap's per-indexing overhead in the traversal loop
+        tree = {name: np.asarray(array) for name, array in arrays.items() if name.startswith('tree_')}
+        self.model = FlatTreeEnsemble(
+            feature=tree['tree_feature'],
+            threshold=tree['tree_threshold'],
+            left=tree['tree_left'],
+            right=tree['tree_right'],
+            value=tree['tree_value'],
+            roots=tree['tree_roots'],
+            max_depth=meta['max_depth'],
+            init_value=meta['init_value'],
+            learning_rate=meta['learning_rate'],
+            n_features=meta['n_features'],
+            children=tree['tree_children'],
+            category=tree.get('tree_category'),
+            cat_left=tree.get('tree_cat_left'),
+            missing_left=tree.get('tree_missing_left'),
+            input_dtype=meta.get('input_dtype', 'float32')
+        )
+        if 'estimator' in manifest:
+            self.model = RoutedEnsemble(self.model, load_estimator=self.load_estimator)
+        self.feature_builder = FeatureBuilder(
+            {col: manifest['vocabularies'][col] for col in CATEGORICAL_COLUMNS},
+            arrays['scaler_mean'],
+            arrays['scaler_scale']
+        )
+
+    def load_estimator(self):
+        with open(os.path.join(self.path, self.manifest['estimator']['file']), 'rb') as f:
+            return pickle.load(f)
+
+    @property
+    def rainfall_data(self):
+        # Same {district: {month: mm}} shape app.py builds from the CSV
+        monthly = self.arrays['rainfall_monthly']
+        return {
+            district: {month: float(v) for month, v in zip(self.manifest['months'], monthly[i])}
+            for i, district in enumerate(self.manifest['rainfall_districts'])
+        }
+
+    @property
+    def rainfall_history(self):
+        # (years, cube) in rainfall_districts order, or None if built without bulletins
+        if 'rainfall_cube' not in self.arrays:
+            return None
+        return np.asarray(self.arrays['rainfall_years']), np.asarray(self.arrays['rainfall_cube'])
+
+    def verify(self):
+        """Re-hash every array file; returns the list of names that do not match."""
+        bad = []
+        entries = dict(self.manifest['arrays'])
+        if 'estimator' in self.manifest:
+            entries['estimator'] = self.manifest['estimator']
+        for name, entry in entries.items():
+            if _sha256(os.path.join(self.path, entry['file'])) != entry['sha256']:
+                bad.append(name)
+        return bad
+
+
+def load_bundle(path=BUNDLE_PATH, verify=False):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') not in READABLE_FORMATS:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format_version')} in {path}")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        array = np.load(os.path.join(path, entry['file']), mmap_mode='r', allow_pickle=False)
+        if str(array.dtype) != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ValueError(f"Bundle array {name} does not match the manifest")
+        arrays[name] = array
+
+    if 'estimator' in manifest and not os.path.exists(os.path.join(path, manifest['estimator']['file'])):
+        # Fail now rather than on the first large batch
+        raise ValueError(f"Bundle {path} references a missing estimator: {manifest['estimator']['file']}")
+
+    bundle = ModelBundle(path, manifest, arrays)
+    if verify:
+        bad = bundle.verify()
+        if bad:
+            raise ValueError(f"Checksum mismatch in bundle {path}: {', '.join(bad)}")
+    return bundle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or verify a model bundle")
+    parser.add_argument('command', choices=['build', 'verify'])
+    parser.add_argument('--path', default=BUNDLE_PATH)
+    parser.add_argument('--model', default='agriculture_model_improved.pkl')
+    parser.add_argument('--encoders', default='label_encoders_improved.pkl')
+    parser.add_argument('--rainfall', default='rainfall_monthly_averages.csv')
+    parser.add_argument('--bulletins', nargs='*', default=[os.path.join('training_workspace', 'rainfall_raw.txt')],
+                        help="Rainfall bulletins for the per-year climatology cube")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        import pandas as pd
+
+        with open(args.model, 'rb') as f:
+            model = pickle.load(f)
+        with open(args.encoders, 'rb') as f:
+            encoders = pickle.load(f)
+        manifest = write_bundle(args.path, model, encoders, pd.read_csv(args.rainfall), bulletins=args.bulletins,
+                                estimator_path=args.model)
+        print(f"Wrote bundle {manifest['version']} to {args.path}")
+    else:
+        bundle = load_bundle(args.path)
+        bad = bundle.verify()
+        print(f"Bundle {bundle.version}: {'OK' if not bad else 'checksum mismatch in ' + ', '.join(bad)}")
+        raise SystemExit(1 if bad else 0)
@@ -0,0 +1,211 @@
+"""Versioned model registry with off-request-path warmup and atomic swaps.
+
+Request handlers read `registry.active` once and use that ModelVersion for the
+whole request, so swapping in a new version never affects in-flight requests:
+they finish on the version they started with.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from fast_model import FlatTreeEnsemble, RoutedEnsemble, accepts_missing
+from features import FeatureBuilder
+from model_bundle import MANIFEST, load_bundle
+from recommend_grid import artifact_fingerprint
+from result_cache import ArtifactWatcher
+
+# Loaded versions kept in memory (active one included) for quick rollback
+MAX_VERSIONS = int(os.environ.get('MODEL_MAX_VERSIONS', 3))
+
+
+class ModelVersion:
+    def __init__(self, version, source, model, feature_builder, engine, fingerprint, bundle=None):
+        self.version = version
+        self.source = source
+        self.model = model
+        self.feature_builder = feature_builder
+        self.engine = engine
+        self.fingerprint = fingerprint
+        self.bundle = bundle
+        self.loaded_at = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "engine": self.engine,
+            "fingerprint": self.fingerprint[:12],
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds
+        }
+
+
+def source_files(source):
+    # Files whose contents define a version: the bundle manifest, or the two pickles
+    if isinstance(source, str):
+        return [os.path.join(source, MANIFEST)]
+    return list(source)
+
+
+def load_model_version(source, engine='sklearn'):
+    """Load a bundle directory, or a (model_pkl, encoders_pkl) pair."""
+    files = source_files(source)
+    fingerprint = artifact_fingerprint(files)
+
+    if isinstance(source, str):
+        bundle = load_bundle(source)
+        return ModelVersion(bundle.version, source, bundle.model, bundle.feature_builder,
+                            'bundle', fingerprint, bundle=bundle)
+
+    model_path, encoders_path = source
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    with open(encoders_path, 'rb') as f:
+        encoders = pickle.load(f)
+    if engine == 'flat':
+        model = RoutedEnsemble(FlatTreeEnsemble.from_sklearn(model), model)
+    return ModelVersion(f"pkl-{fingerprint[:12]}", list(source), model,
+                        FeatureBuilder.from_encoders(encoders), engine, fingerprint)
+
+
+def smoke_batch(feature_builder):
+    # One row per crop for the first district/season at typical area/rainfall
+    n = len(feature_builder.vocabularies['crop'])
+    numerical = np.column_stack([np.full(n, 10.0), np.full(n, 1500.0), np.full(n, 10.0 * 30000)])
+    return feature_builder.assemble(0, 0, np.arange(n), numerical)
+
+
+def check_input_validation(mv, batch):
+    # Handlers rely on the model raising ValueError (-> 400) for NaN/inf rows, as sklearn does;
+    # an engine that scores them instead must never serve
+    if accepts_missing(mv.model):
+        return
+    for value in (np.nan, np.inf):
+        row = batch[:1].copy()
+        row[0, -1] = value
+        try:
+            mv.model.predict(row)
+        except ValueError:
+            continue
+        raise ValueError(f"Model {mv.version} scored a non-finite input instead of rejecting it")
+
+
+class ModelRegistry:
+    def __init__(self, engine='sklearn', prepare=None, max_versions=MAX_VERSIONS):
+        self.engine = engine
+        self.prepare = prepare  # optional hook run on each new version before warmup
+        self.max_versions = max_versions
+        self.versions = OrderedDict()
+        self.active = None
+        self.lock = threading.Lock()
+        self.loading = False
+        self.last_error = None
+        self.watcher = None
+
+    def load(self, source):
+        """Load, prepare and warm up a version without activating it."""
+        start = time.perf_counter()
+        mv = load_model_version(source, self.engine)
+        if self.prepare:
+            self.prepare(mv)
+        mv.load_seconds = round(time.perf_counter() - start, 4)
+
+        start = time.perf_counter()
+        batch = smoke_batch(mv.feature_builder)
+        predictions = mv.model.predict(batch)
+        if predictions.shape != (len(mv.feature_builder.vocabularies['crop']),) or not np.all(np.isfinite(predictions)):
+            raise ValueError(f"Model {mv.version} failed its smoke batch")
+        check_input_validation(mv, batch)
+        mv.warmup_seconds = round(time.perf_counter() - start, 4)
+        mv.loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+        with self.lock:
+            self.versions[mv.version] = mv
+            self.versions.move_to_end(mv.version)
+            # Never evict the active version
+            for version in list(self.versions):
+                if len(self.versions) <= self.max_versions:
+                    break
+                if self.active is None or version != self.active.version:
+                    del self.versions[version]
+        return mv
+
+    def activate(self, version):
+        with self.lock:
+            mv = self.versions.get(version)
+            if mv is None:
+                raise KeyError(f"Unknown model version: {version}")
+            self.active = mv  # single reference swap; in-flight requests keep the old one
+        print(f"Model version {version} is now active.")
+        return mv
+
+    def reload(self, source):
+        """Load + warm up + activate. Raises on failure, leaving the active version in place."""
+        with self.lock:
+            if self.loading:
+                raise RuntimeError("A model reload is already in progress")
+            self.loading = True
+        try:
+            mv = self.load(source)
+            self.activate(mv.version)
+            self.last_error = None
+            return mv
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            with self.lock:
+                self.loading = False
+
+    def reload_async(self, source):
+        thread = threading.Thread(target=self._reload_quietly, args=(source,), daemon=True)
+        thread.start()
+        return thread
+
+    def _reload_quietly(self, source):
+        try:
+            self.reload(source)
+        except Exception as e:
+            print(f"Error reloading model: {e}")
+
+    def watch(self, source_fn, interval):
+        """Poll the active source's files and reload when they change.
+
+        A bundle's manifest is replaced atomically after every array is
+        written, so one changed poll is enough. A pickle pair is written in
+        place, one file after the other, so it only reloads once both files
+        show the same (mtime, size) on two polls in a row.
+        """
+        def loop():
+            watcher = ArtifactWatcher(source_files(source_fn()), interval=0)
+            seen = previous = watcher.version()
+            while True:
+                time.sleep(interval)
+                source = source_fn()
+                watcher.paths = source_files(source)
+                current = watcher.version()
+                stable = isinstance(source, str) or current == previous
+                previous = current
+                if current != seen and all(current) and stable:
+                    seen = current
+                    self._reload_quietly(source)
+
+        self.watcher = threading.Thread(target=loop, daemon=True)
+        self.watcher.start()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "active": self.active.describe() if self.active else None,
+                "versions": [mv.describe() for mv in self.versions.values()],
+                "loading": self.loading,
+                "last_error": self.last_error,
+                "watching": self.watcher is not None
+            }
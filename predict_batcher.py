@@ -0,0 +1,180 @@
+"""Micro-batching for concurrent single-row predictions.
+
+Handlers encode their own row (dict lookups, and unknown labels must fail
+that request alone), then hand the codes and raw numbers to the batcher and
+wait. A dispatcher thread drains the queue and runs one vectorized
+scale + model.predict per model version, then wakes every waiter with its
+own result.
+
+The wait is adaptive: when nothing is queued or predicting and there has
+been no recent concurrency, the request predicts inline in its own thread,
+so an idle server pays nothing extra. Requests that arrive while a batch is
+predicting queue up and form the next batch, and once batches of more than
+one row have been seen the dispatcher lingers up to PREDICT_BATCH_WINDOW_MS
+(or until PREDICT_BATCH_MAX_SIZE rows) to let concurrent requests join.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import BATCH_QUEUE_SECONDS, BATCH_ROWS, STAGE_SECONDS
+
+PREDICT_BATCHING = os.environ.get('PREDICT_BATCHING', '1') != '0'
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get('PREDICT_BATCH_MAX_SIZE', 256))
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 2.0))
+# Seconds a handler waits for its batch before giving up
+PREDICT_BATCH_TIMEOUT = float(os.environ.get('PREDICT_BATCH_TIMEOUT', 10.0))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class _Pending:
+    __slots__ = ('active', 'codes', 'numerical', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, active, codes, numerical):
+        self.active = active
+        self.codes = codes
+        self.numerical = numerical
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionBatcher:
+    def __init__(self, max_batch=PREDICT_BATCH_MAX_SIZE, window=PREDICT_BATCH_WINDOW_MS / 1000.0,
+                 timeout=PREDICT_BATCH_TIMEOUT):
+        self.max_batch = max_batch
+        self.window = window
+        self.timeout = timeout
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.pid = None
+        self.avg_batch = 1.0  # EWMA of batch size; > 1 means requests are overlapping
+        self.running = 0  # batches currently predicting
+        self.waits = deque(maxlen=2048)  # recent queue waits (seconds) for percentiles
+        self.stats = {'requests': 0, 'batches': 0, 'inline': 0, 'max_batch': 0, 'timeouts': 0, 'errors': 0}
+        self.size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def predict(self, active, codes, numerical):
+        """Log-prediction for one encoded row (district, season, crop) + (area, rainfall, cost)."""
+        item = _Pending(active, codes, numerical)
+        with self.cond:
+            inline = not self.queue and self.running == 0 and self.avg_batch <= 1.5
+            if inline:
+                self.running += 1
+                self.stats['inline'] += 1
+            else:
+                self._ensure_thread()
+                self.queue.append(item)
+                self.cond.notify()
+        if inline:
+            self._dispatch([item])
+        elif not item.done.wait(self.timeout):
+            with self.cond:
+                self.stats['timeouts'] += 1
+            raise TimeoutError("Prediction batch timed out")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _ensure_thread(self):
+        # Caller holds self.cond. Threads don't survive fork, so each worker starts its own.
+        if self.thread is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                if self.avg_batch > 1.5 and len(self.queue) < self.max_batch:
+                    # Concurrency seen recently: give overlapping requests a moment to join
+                    deadline = time.perf_counter() + self.window
+                    while len(self.queue) < self.max_batch:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self.cond.wait(remaining)
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), self.max_batch))]
+                self.running += 1
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        waits = [started - item.enqueued_at for item in batch]
+
+        # Usually one group; more only while a model reload swaps versions mid-batch
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item.active), []).append(item)
+
+        for items in groups.values():
+            try:
+                self._predict(items)
+            except Exception as e:
+                if len(items) == 1:
+                    items[0].error = e
+                else:
+                    # One bad row must not fail the requests it was batched with: retry them one by one
+                    for item in items:
+                        try:
+                            self._predict([item])
+                        except Exception as row_error:
+                            item.error = row_error
+                with self.cond:
+                    self.stats['errors'] += sum(item.error is not None for item in items)
+            for item in items:
+                item.done.set()
+
+        n = len(batch)
+        BATCH_ROWS.observe(n)
+        for wait in waits:
+            BATCH_QUEUE_SECONDS.observe(wait)
+        with self.cond:
+            self.running -= 1
+            self.avg_batch = 0.8 * self.avg_batch + 0.2 * n
+            self.stats['requests'] += n
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], n)
+            self.size_counts[np.searchsorted(BATCH_SIZE_BUCKETS, n)] += 1
+            self.waits.extend(waits)
+
+    def _predict(self, items):
+        active = items[0].active
+        start = time.perf_counter()
+        codes = np.array([item.codes for item in items])
+        features = active.feature_builder.assemble(codes[:, 0], codes[:, 1], codes[:, 2],
+                                                   [item.numerical for item in items])
+        STAGE_SECONDS.observe(time.perf_counter() - start, ('predict_batcher', 'scale'))
+        start = time.perf_counter()
+        predictions = active.model.predict(features)
+        STAGE_SECONDS.observe(time.perf_counter() - start, ('predict_batcher', 'predict'))
+        for item, value in zip(items, predictions):
+            item.result = float(value)
+
+    def snapshot(self):
+        with self.cond:
+            stats = dict(self.stats)
+            waits = np.array(self.waits)
+            sizes = list(self.size_counts)
+            stats['queued'] = len(self.queue)
+            stats['avg_recent_batch'] = round(self.avg_batch, 2)
+        stats['mean_batch'] = round(stats['requests'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['batch_size_counts'] = {
+            f"<={bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, sizes) if count
+        }
+        if sizes[-1]:
+            stats['batch_size_counts'][f">{BATCH_SIZE_BUCKETS[-1]}"] = sizes[-1]
+        if len(waits):
+            p50, p95, p99 = np.percentile(waits, [50, 95, 99]) * 1000
+            stats['queue_wait_ms'] = {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+        stats['max_batch_size'] = self.max_batch
+        stats['window_ms'] = self.window * 1000
+        return stats
@@ -0,0 +1,161 @@
+"""Opt-in per-request profiling.
+
+A request is profiled with cProfile when it carries a valid signed
+X-Profile header, or when it is picked by PROFILE_SAMPLE_RATE. Each profile
+is written as a pstats file into PROFILE_DIR, which keeps only the newest
+PROFILE_RING_SIZE files. Requests that are not picked pay for one header
+lookup (plus one random() when sampling is on).
+
+The header value is "<unix time>.<hex hmac>", where the HMAC-SHA256 is keyed
+with PROFILE_SECRET over "<unix time>:<METHOD>:<path>". To sign one:
+
+    PROFILE_SECRET=... python profiling.py sign POST /recommend
+"""
+import cProfile
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+
+from flask import g, request
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_RING_SIZE = int(os.environ.get('PROFILE_RING_SIZE', 50))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SECRET = os.environ.get('PROFILE_SECRET', '')
+# Signed headers older than this (seconds) are rejected, so a leaked one stops working
+PROFILE_SIGNATURE_TTL = 300
+
+HEADER = 'X-Profile'
+
+
+def sign(method, path, timestamp=None, secret=PROFILE_SECRET):
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    message = f"{timestamp}:{method.upper()}:{path}".encode()
+    return f"{timestamp}.{hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()}"
+
+
+def valid_signature(value, method, path, secret=PROFILE_SECRET, now=None):
+    if not secret or not value or '.' not in value:
+        return False
+    timestamp, _ = value.split('.', 1)
+    try:
+        age = (time.time() if now is None else now) - int(timestamp)
+    except ValueError:
+        return False
+    if abs(age) > PROFILE_SIGNATURE_TTL:
+        return False
+    return hmac.compare_digest(value, sign(method, path, timestamp, secret))
+
+
+class ProfileRing:
+    """Bounded directory of .prof files, oldest deleted first."""
+
+    def __init__(self, directory=PROFILE_DIR, size=PROFILE_RING_SIZE):
+        self.directory = directory
+        self.size = size
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def save(self, profiler, endpoint, seconds):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            self.counter += 1
+            slug = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self.counter:04d}-{slug}-{seconds * 1000:.0f}ms.prof"
+            profiler.dump_stats(os.path.join(self.directory, name))
+            for old in self.list()[self.size:]:
+                try:
+                    os.remove(os.path.join(self.directory, old['name']))
+                except OSError:
+                    pass
+        return name
+
+    def list(self):
+        # Newest first
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith('.prof')]
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append({"name": name, "bytes": st.st_size, "mtime": st.st_mtime})
+        entries.sort(key=lambda e: (e['mtime'], e['name']), reverse=True)
+        return entries
+
+    def path(self, name):
+        # Only names currently in the ring are served, so no path tricks
+        if name not in {e['name'] for e in self.list()}:
+            return None
+        return os.path.join(self.directory, name)
+
+    def summary(self, name, limit=40, sort='cumulative'):
+        path = self.path(name)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+ring = ProfileRing()
+# cProfile can only run one profiler at a time; concurrent picks are skipped
+_active = threading.Lock()
+
+
+def wanted():
+    header = request.headers.get(HEADER)
+    if header is not None:
+        return valid_signature(header, request.method, request.path, PROFILE_SECRET)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def instrument(app):
+    @app.before_request
+    def _start_profile():
+        if not wanted() or not _active.acquire(blocking=False):
+            return
+        g.profiler = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profiler.enable()
+
+    @app.after_request
+    def _stop_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        _active.release()
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        try:
+            response.headers['X-Profile-Id'] = ring.save(profiler, endpoint,
+                                                         time.perf_counter() - g.profile_start)
+        except OSError as e:
+            print(f"Error saving profile: {e}")
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request did not run (e.g. the client went away); don't leave the profiler on
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _active.release()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] != 'sign':
+        raise SystemExit("usage: python profiling.py sign METHOD PATH")
+    if not PROFILE_SECRET:
+        raise SystemExit("PROFILE_SECRET is not set")
+    print(f"{HEADER}: {sign(sys.argv[2], sys.argv[3])}")
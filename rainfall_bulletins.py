@@ -0,0 +1,82 @@
+"""District rainfall bulletin parser (rainfall_raw.txt and friends).
+
+Plain Python and numpy, so serving can read bulletins without the
+training stack. training_workspace/process_rainfall.py builds its tables
+on iter_records(); build_cube() is the per-year climatology cube that
+model bundles ship precomputed (see model_bundle.py).
+"""
+import re
+
+import numpy as np
+
+# Bulletin grammar: "--- Year 2016 ---" headers, a bare district name line,
+# a "Stations<TAB>Jan..." header, then tab-separated station rows
+YEAR_RE = re.compile(r'--- Year (\d{4}) ---')
+DISTRICT_ALIASES = {'RI BHOI DISTRICT': 'RI BHOI'}
+
+
+def normalize_district(name):
+    name = name.upper().strip()
+    return DISTRICT_ALIASES.get(name, name)
+
+
+def iter_records(file_path):
+    """Yield (year, district, station, total, [12 monthly values]) per station row."""
+    current_year = None
+    current_district = None
+
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            # Check for Year
+            year_match = YEAR_RE.search(line)
+            if year_match:
+                current_year = int(year_match.group(1))
+                continue
+
+            if '\t' not in line:
+                # District names are the bare, non-numeric lines
+                if "Stations" not in line and not line[0].isdigit():
+                    current_district = line
+                continue
+            if "Stations" in line:
+                continue
+
+            # We expect: Station(0), Jan(1), Feb(2), ..., Dec(12), Total(13), RainyDays(14)
+            parts = line.split('\t')
+            if len(parts) < 13 or current_year is None or current_district is None:
+                # Station rows before the first year and district headers belong to nothing
+                continue
+            try:
+                monthly = [float(val) if val else 0.0 for val in parts[1:13]]
+                total = float(parts[13]) if len(parts) > 13 and parts[13] else sum(monthly)
+            except ValueError:
+                continue
+            yield current_year, current_district, parts[0], total, monthly
+
+
+def build_cube(paths, districts):
+    """(years, cube) of station-mean monthly rainfall for the given district order.
+
+    cube is (district, year, month), NaN where a district has no stations that year.
+    """
+    rows = {d: i for i, d in enumerate(districts)}
+    sums, counts = {}, {}
+    for path in paths:
+        for year, district, _, _, monthly in iter_records(path):
+            i = rows.get(normalize_district(district))
+            if i is None:
+                continue
+            key = (i, year)
+            sums[key] = sums.get(key, 0.0) + np.asarray(monthly)
+            counts[key] = counts.get(key, 0) + 1
+
+    years = np.array(sorted({year for _, year in sums}), dtype=np.int64)
+    cube = np.full((len(districts), len(years), 12), np.nan)
+    year_index = {year: j for j, year in enumerate(years)}
+    for (i, year), total in sums.items():
+        cube[i, year_index[year]] = total / counts[(i, year)]
+    return years, cube
@@ -0,0 +1,322 @@
+"""Materialized /recommend predictions over a district x season x rainfall x area grid.
+
+Budget and slope only filter crops (cost is area x per-hectare base cost), so
+the grid stores the model's log-production for every crop at each
+(district, season, rainfall, area) point. /recommend then applies the same
+budget/slope masks and ranking as live scoring.
+
+The boosting model is a step function of area and rainfall, so
+interpolating between grid points is not a faithful answer. Instead the
+build reads the model's split points and marks, per crop, the cells
+(between neighbouring rainfall and area points) that no split runs
+through: the model is constant there, so the grid point's value is
+exact. lookup() returns None, meaning score live, for inputs outside the
+axes, when any requested crop's cell has a split in it, and when two of
+the top crops are within twice the error bound (float32 storage could
+swap their ranks). The build also scores held-out points live and
+refuses to write the grid if an answered point is off by more than the
+bound or ranks crops differently.
+
+Build after retraining:
+
+    python recommend_grid.py --output recommendation_grid.npz
+"""
+import argparse
+import hashlib
+import json
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from fast_model import FlatTreeEnsemble
+
+GRID_PATH = 'recommendation_grid.npz'
+
+# Realistic farm inputs: annual rainfall in 50 mm steps, 0.1-200 ha (the form takes 0.25-500 acres)
+DEFAULT_RAINFALL_AXIS = np.arange(0, 6001, 50, dtype=np.float64)
+DEFAULT_AREA_AXIS = np.geomspace(0.1, 200, 48)
+
+# Largest |grid - live| log-production error the grid may answer with (float32 storage is ~1e-6)
+ERROR_BOUND = 1e-4
+VALIDATION_POINTS = 2000
+TOP_K = 5
+
+
+def artifact_fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def split_points(model, feature):
+    # Sorted thresholds the model compares `feature` (scaled) against
+    flat = getattr(model, 'flat', model)  # RoutedEnsemble
+    if not isinstance(flat, FlatTreeEnsemble):
+        flat = FlatTreeEnsemble.from_sklearn(flat)
+    internal = flat.left != np.arange(len(flat.left))
+    return np.unique(flat.threshold[internal & (flat.feature == feature)]), flat.input_dtype
+
+
+def step_free_cells(model, feature_builder, base_cost, rainfall_axis, area_axis):
+    """(rainfall_flat[R-1], area_flat[A-1, crop]): cells no split of the model runs through.
+
+    Both cell edges are mapped to the interval of split points they fall in,
+    using the same scaling and input dtype as predict; equal intervals at both
+    edges mean every value in between takes the same branches.
+    """
+    def intervals(feature, raw):
+        thresholds, dtype = split_points(model, 3 + feature)
+        scaled = ((raw - feature_builder.mean[feature]) / feature_builder.scale[feature]).astype(dtype)
+        return np.searchsorted(thresholds, scaled, side='left')
+
+    rain = intervals(1, rainfall_axis)
+    rainfall_flat = rain[:-1] == rain[1:]
+    area = intervals(0, area_axis)[:, None]
+    cost = intervals(2, area_axis[:, None] * base_cost[None, :])
+    area_flat = (area[:-1] == area[1:]) & (cost[:-1] == cost[1:])
+    return rainfall_flat, area_flat
+
+
+class RecommendationGrid:
+    def __init__(self, log_production, districts, seasons, crops, rainfall_axis, area_axis, fingerprint,
+                 rainfall_flat, area_flat, error_bound=ERROR_BOUND, validation=None):
+        self.log_production = log_production  # (district, season, rainfall, area, crop)
+        self.districts = list(districts)
+        self.seasons = list(seasons)
+        self.district_index = {d: i for i, d in enumerate(districts)}
+        self.season_index = {s: i for i, s in enumerate(seasons)}
+        self.crops = list(crops)
+        self.rainfall_axis = rainfall_axis
+        self.area_axis = area_axis
+        self.fingerprint = fingerprint
+        self.rainfall_flat = rainfall_flat  # (rainfall cell,) no rainfall split inside
+        self.area_flat = area_flat  # (area cell, crop) no area or cost split inside
+        self.error_bound = error_bound
+        self.validation = validation  # validate_grid() report, None until validated
+        self.stats = {'lookups': 0, 'out_of_grid': 0, 'uncertain': 0, 'close_ranks': 0}
+        self.lock = threading.Lock()  # request threads update stats concurrently
+
+    @classmethod
+    def load(cls, path=GRID_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            if 'validation' not in data:
+                raise ValueError(f"{path} has no validation record; rebuild it with recommend_grid.py")
+            return cls(
+                log_production=data['log_production'],
+                districts=[str(d) for d in data['districts']],
+                seasons=[str(s) for s in data['seasons']],
+                crops=[str(c) for c in data['crops']],
+                rainfall_axis=data['rainfall_axis'],
+                area_axis=data['area_axis'],
+                fingerprint=str(data['fingerprint']),
+                rainfall_flat=data['rainfall_flat'],
+                area_flat=data['area_flat'],
+                error_bound=float(data['error_bound']),
+                validation=json.loads(str(data['validation']))
+            )
+
+    @property
+    def validated(self):
+        return self.validation is not None and self.validation['passed']
+
+    def covers(self, district, season, area, rainfall):
+        inside = (district in self.district_index and season in self.season_index and
+                  self.area_axis[0] <= area <= self.area_axis[-1] and
+                  self.rainfall_axis[0] <= rainfall <= self.rainfall_axis[-1])
+        if not inside:
+            self._count('out_of_grid')
+        return inside
+
+    def lookup(self, district, season, area, rainfall, crops=None, top_k=TOP_K):
+        """Log-production for `crops` (indices, default all), or None to score live.
+
+        None when a split of the model runs through any requested crop's cell, or
+        when two of the top_k + 1 values are within twice the error bound.
+        """
+        self._count('lookups')
+        cell = self.log_production[self.district_index[district], self.season_index[season]]
+        i = self._cell(self.rainfall_axis, rainfall)
+        j = self._cell(self.area_axis, area)
+        crops = np.arange(len(self.crops)) if crops is None else crops
+        if not (self.rainfall_flat[i] and self.area_flat[j, crops].all()):
+            self._count('uncertain')
+            return None
+
+        # Constant over the cell, so its lower corner is the model's value anywhere in it
+        values = cell[i, j, crops].astype(np.float64)
+        top = np.sort(values)[::-1][:top_k + 1]
+        if len(top) > 1 and np.min(top[:-1] - top[1:]) < 2 * self.error_bound:
+            self._count('close_ranks')
+            return None
+        return values
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    @staticmethod
+    def _cell(axis, x):
+        return int(np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2))
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'shape': list(self.log_production.shape),
+            'memory_bytes': int(self.log_production.nbytes),
+            'step_free_cells': float(self.rainfall_flat.mean() * self.area_flat.mean()),
+            'fingerprint': self.fingerprint[:12],
+            'error_bound': self.error_bound,
+            'validation': self.validation
+        }
+
+
+def build_grid(model, feature_builder, base_cost, rainfall_axis=DEFAULT_RAINFALL_AXIS,
+               area_axis=DEFAULT_AREA_AXIS):
+    # One batched predict per (district, season): every crop x rainfall x area point
+    districts = feature_builder.vocabularies['district']
+    seasons = feature_builder.vocabularies['season']
+    n_crops = len(feature_builder.vocabularies['crop'])
+
+    rain, area, crop = np.meshgrid(rainfall_axis, area_axis, np.arange(n_crops), indexing='ij')
+    rain, area, crop = rain.ravel(), area.ravel(), crop.ravel()
+    numerical = np.column_stack([area, rain, area * base_cost[crop]])
+
+    out = np.empty((len(districts), len(seasons), len(rainfall_axis), len(area_axis), n_crops),
+                   dtype=np.float32)
+    for d in range(len(districts)):
+        for s in range(len(seasons)):
+            features = feature_builder.assemble(d, s, crop, numerical)
+            out[d, s] = model.predict(features).reshape(out.shape[2:])
+    return out
+
+
+def validate_grid(grid, model, feature_builder, base_cost, n_points=VALIDATION_POINTS, seed=0, top_k=TOP_K,
+                  candidates=None):
+    """Score random held-out points live and compare with what the grid would answer.
+
+    Points are uniform in rainfall and log area over the axes, across every
+    district and season. `candidates(area, rng)` picks the crop indices a
+    request would score (default: all crops). Passes when at least one point
+    is answered, none is off by more than the error bound and none ranks the
+    top_k crops differently from live.
+    """
+    rng = np.random.default_rng(seed)
+    answered, errors, best_changed, top_changed = 0, [], 0, 0
+    for _ in range(n_points):
+        d = int(rng.integers(len(grid.districts)))
+        s = int(rng.integers(len(grid.seasons)))
+        area = float(np.exp(rng.uniform(np.log(grid.area_axis[0]), np.log(grid.area_axis[-1]))))
+        rainfall = float(rng.uniform(grid.rainfall_axis[0], grid.rainfall_axis[-1]))
+        crops = candidates(area, rng) if candidates else np.arange(len(grid.crops))
+        if len(crops) == 0:
+            continue
+
+        values = grid.lookup(grid.districts[d], grid.seasons[s], area, rainfall, crops, top_k)
+        if values is None:
+            continue
+        n = len(crops)
+        numerical = np.column_stack([np.full(n, area), np.full(n, rainfall), area * base_cost[crops]])
+        live = model.predict(feature_builder.assemble(d, s, crops, numerical))
+        answered += 1
+        errors.append(float(np.max(np.abs(values - live))))
+        grid_order = np.argsort(-values, kind='stable')[:top_k]
+        live_order = np.argsort(-live, kind='stable')[:top_k]
+        best_changed += int(grid_order[0] != live_order[0])
+        top_changed += int(not np.array_equal(grid_order, live_order))
+
+    max_error = max(errors, default=0.0)
+    grid.reset_stats()
+    return {
+        'points': n_points,
+        'answered': answered,
+        'max_log_error': max_error,
+        'median_log_error': float(np.median(errors)) if errors else 0.0,
+        'best_changed': best_changed,
+        'top_k_changed': top_changed,
+        'passed': answered > 0 and max_error <= grid.error_bound and top_changed == 0
+    }
+
+
+def save_grid(path, grid):
+    np.savez(
+        path,
+        log_production=grid.log_production,
+        districts=np.array(grid.districts),
+        seasons=np.array(grid.seasons),
+        crops=np.array(grid.crops),
+        rainfall_axis=grid.rainfall_axis,
+        area_axis=grid.area_axis,
+        fingerprint=np.array(grid.fingerprint),
+        rainfall_flat=grid.rainfall_flat,
+        area_flat=grid.area_flat,
+        error_bound=np.array(grid.error_bound),
+        validation=np.array(json.dumps(grid.validation))
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute and validate the /recommend grid")
+    parser.add_argument('--output', default=GRID_PATH)
+    parser.add_argument('--model', default='agriculture_model_improved.pkl',
+                        help="sklearn estimator to build with (vectorized predict over millions of rows)")
+    parser.add_argument('--rainfall-max', type=float, default=DEFAULT_RAINFALL_AXIS[-1])
+    parser.add_argument('--rainfall-step', type=float, default=50)
+    parser.add_argument('--area-min', type=float, default=DEFAULT_AREA_AXIS[0])
+    parser.add_argument('--area-max', type=float, default=DEFAULT_AREA_AXIS[-1])
+    parser.add_argument('--area-points', type=int, default=len(DEFAULT_AREA_AXIS))
+    parser.add_argument('--max-error', type=float, default=ERROR_BOUND,
+                        help="Largest log-production error the grid may answer with")
+    parser.add_argument('--validation-points', type=int, default=VALIDATION_POINTS)
+    args = parser.parse_args()
+
+    # The serving process's features and crop costs so the grid matches live scoring
+    import app
+
+    rainfall_axis = np.arange(0, args.rainfall_max + args.rainfall_step / 2, args.rainfall_step)
+    area_axis = np.geomspace(args.area_min, args.area_max, args.area_points)
+
+    active = app.registry.active
+    if active is None:
+        raise SystemExit("No model loaded")
+    with open(args.model, 'rb') as f:
+        estimator = pickle.load(f)
+
+    start = time.perf_counter()
+    base_cost = active.crop_table['base_cost']
+    log_production = build_grid(estimator, active.feature_builder, base_cost, rainfall_axis, area_axis)
+    rainfall_flat, area_flat = step_free_cells(estimator, active.feature_builder, base_cost, rainfall_axis, area_axis)
+    vocab = active.feature_builder.vocabularies
+    grid = RecommendationGrid(log_production, vocab['district'], vocab['season'], vocab['crop'],
+                              rainfall_axis, area_axis, active.fingerprint, rainfall_flat, area_flat,
+                              error_bound=args.max_error)
+    print(f"Built grid {log_production.shape} ({log_production.nbytes / 1e6:.1f} MB) in "
+          f"{time.perf_counter() - start:.1f}s; {rainfall_flat.mean():.0%} of rainfall cells and "
+          f"{area_flat.mean():.0%} of (area cell, crop) pairs are step-free")
+
+    # Held-out points against the live serving model (not the estimator the grid was built with),
+    # scoring the crops a request with a random budget and slope would
+    def candidates(area, rng):
+        budget = rng.choice(list(app.BUDGET_LIMITS))
+        slope = rng.choice(list(app.SLOPE_SUITABILITY))
+        return app.select_candidates(active.crop_table, area, budget, slope)[0]
+
+    grid.validation = validate_grid(grid, active.model, active.feature_builder, base_cost,
+                                    args.validation_points, candidates=candidates)
+    report = grid.validation
+    print(f"Validation: {report['answered']}/{report['points']} points answered from the grid, "
+          f"max log error {report['max_log_error']:.4f} (bound {args.max_error}), "
+          f"best crop changed {report['best_changed']}, top {TOP_K} changed {report['top_k_changed']}")
+    if not report['passed']:
+        raise SystemExit("Grid not written: it does not reproduce live scoring within the bound")
+    save_grid(args.output, grid)
+    print(f"Wrote {args.output}")
@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 4096))
+# Quantization steps for the numeric inputs (hectares, mm) in cache keys. 0 (the default) keys on
+# exact values. Handlers always compute from the raw inputs, so with a step > 0 a hit returns the
+# response first computed for a nearby input in the same bucket.
+AREA_BUCKET = float(os.environ.get('RESULT_CACHE_AREA_BUCKET', 0))
+RAINFALL_BUCKET = float(os.environ.get('RESULT_CACHE_RAINFALL_BUCKET', 0))
+
+
+def quantize(value, step):
+    if step <= 0:
+        return value
+    return round(round(value / step) * step, 6)
+
+
+class ArtifactWatcher:
+    """Cheap change detector for the model artifacts.
+
+    version() returns (mtime_ns, size) for every watched file, re-checking
+    the filesystem at most once per `interval` seconds.
+    """
+
+    def __init__(self, paths, interval=5.0):
+        self.paths = list(paths)
+        self.interval = interval
+        self.checked_at = 0.0
+        self.current = None
+        self.lock = threading.Lock()
+
+    def version(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.current is None or now - self.checked_at >= self.interval:
+                self.current = tuple(self._stat(p) for p in self.paths)
+                self.checked_at = now
+            return self.current
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+
+class ResultCache:
+    """Size-bounded LRU of serialized responses keyed on bucketed inputs.
+
+    Values are the JSON response bodies, so a hit skips both the model and
+    jsonify. The whole cache is dropped when `version_fn()` changes, i.e.
+    when a new model artifact is deployed.
+    """
+
+    def __init__(self, name, max_entries=RESULT_CACHE_SIZE, area_bucket=AREA_BUCKET,
+                 rainfall_bucket=RAINFALL_BUCKET, version_fn=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.area_bucket = area_bucket
+        self.rainfall_bucket = rainfall_bucket
+        self.version_fn = version_fn
+        self.version = version_fn() if version_fn else None
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def quantize_area(self, area):
+        return quantize(area, self.area_bucket)
+
+    def quantize_rainfall(self, rainfall):
+        return quantize(rainfall, self.rainfall_bucket)
+
+    def _check_version(self):
+        # Caller holds self.lock
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self.version:
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+            self.stats['invalidations'] += 1
+
+    def get(self, key):
+        with self.lock:
+            self._check_version()
+            value = self.entries.get(key)
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self._entry_size(key, old)
+            self.entries[key] = value
+            self.bytes += self._entry_size(key, value)
+            while len(self.entries) > self.max_entries:
+                old_key, old_value = self.entries.popitem(last=False)
+                self.bytes -= self._entry_size(old_key, old_value)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    @staticmethod
+    def _entry_size(key, value):
+        return sys.getsizeof(key) + sum(sys.getsizeof(k) for k in key) + sys.getsizeof(value)
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self.entries)
+            stats['memory_bytes'] = self.bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['area_bucket'] = self.area_bucket
+        stats['rainfall_bucket'] = self.rainfall_bucket
+        return stats
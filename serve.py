@@ -0,0 +1,247 @@
+"""Production entry point: pre-forking multi-worker server.
+
+The app (model, encoders, crop tables, rainfall data) is imported once in
+the master and warmed up before any worker is forked, so workers share
+those pages copy-on-write and are ready as soon as they start. With the
+memory-mapped model bundle the trees are shared through the page cache
+even across restarts.
+
+Uses gunicorn when it is installed; otherwise falls back to a small
+built-in pre-fork server on werkzeug with the same settings.
+
+    python serve.py
+    WEB_WORKERS=8 WEB_THREADS=4 WEB_PORT=8000 python serve.py
+
+Settings (environment):
+    WEB_HOST / WEB_PORT        listen address (0.0.0.0:5000)
+    WEB_WORKERS                worker processes (one per core)
+    WEB_THREADS                request threads per worker (4)
+    WEB_TIMEOUT                seconds before a stuck request/worker is given up on (30)
+    WEB_GRACEFUL_TIMEOUT       seconds a stopping worker gets to drain in-flight requests (30)
+    WEB_DRAIN_DELAY            seconds a stopping worker keeps serving with /ready failing,
+                               so load balancers stop routing to it first (0)
+    WEB_BACKLOG                listen backlog (2048)
+    WEB_METRICS_DIR            where workers share /metrics samples (a fresh temp directory);
+                               see metrics.py
+
+SIGTERM or SIGINT stop gracefully: workers stop accepting, finish in-flight
+requests (up to WEB_GRACEFUL_TIMEOUT) and exit. /ready only passes once the
+model has loaded and warmed up, and fails while a worker drains.
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+HOST = os.environ.get('WEB_HOST', '0.0.0.0')
+PORT = int(os.environ.get('WEB_PORT', 5000))
+WORKERS = int(os.environ.get('WEB_WORKERS', 0)) or os.cpu_count() or 1
+THREADS = int(os.environ.get('WEB_THREADS', 4))
+TIMEOUT = float(os.environ.get('WEB_TIMEOUT', 30))
+GRACEFUL_TIMEOUT = float(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+DRAIN_DELAY = float(os.environ.get('WEB_DRAIN_DELAY', 0))
+BACKLOG = int(os.environ.get('WEB_BACKLOG', 2048))
+METRICS_DIR = os.environ.get('WEB_METRICS_DIR')
+
+
+def load_app():
+    """Import and warm up the app in this (master) process."""
+    import app as backend
+
+    if backend.registry.active is None:
+        raise SystemExit("Model failed to load; refusing to start workers")
+    model = backend.registry.active.model
+    if hasattr(model, 'warm'):
+        # Unpickle the large-batch estimator here, once, rather than in every worker
+        model.warm()
+    # Keep the preloaded objects out of the GC's generations so collections in the
+    # workers don't touch (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+    # Each worker counts in its own memory; /metrics sums them through this directory
+    metrics.enable_multiprocess(METRICS_DIR or tempfile.mkdtemp(prefix='agri-metrics-'))
+    return backend
+
+
+def post_fork(backend):
+    backend.registry.watcher = None
+    backend.start_model_watcher()
+    metrics.start_flusher()
+
+
+def begin_drain(backend, stop):
+    # /ready fails first, then the listener closes after WEB_DRAIN_DELAY
+    backend.draining.set()
+
+    def delayed():
+        time.sleep(DRAIN_DELAY)
+        stop()
+    threading.Thread(target=delayed, daemon=True).start()
+
+
+def gunicorn_options(backend):
+    def post_worker_init(worker):
+        # The worker has installed its own signal handlers by now. Wrap its SIGTERM one
+        # so /ready fails first and it only stops accepting after WEB_DRAIN_DELAY.
+        stop = worker.handle_exit
+
+        def on_term(signum, frame):
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            begin_drain(backend, lambda: stop(signum, frame))
+
+        signal.signal(signal.SIGTERM, on_term)
+
+    return {
+        'bind': f"{HOST}:{PORT}",
+        'workers': WORKERS,
+        'threads': THREADS,
+        'worker_class': 'gthread' if THREADS > 1 else 'sync',
+        'timeout': TIMEOUT,
+        'graceful_timeout': GRACEFUL_TIMEOUT + DRAIN_DELAY,
+        'backlog': BACKLOG,
+        'preload_app': True,
+        'post_fork': lambda server, worker: post_fork(backend),
+        'post_worker_init': post_worker_init,
+        # SIGINT/SIGQUIT: immediate shutdown, but still fail /ready for whatever is left
+        'worker_int': lambda worker: backend.draining.set()
+    }
+
+
+def run_gunicorn(backend):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options(backend).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return backend.app
+
+    Server().run()
+
+
+def run_prefork(backend):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        # One request per connection keeps a pool thread from idling on keep-alive
+        protocol_version = 'HTTP/1.0'
+        timeout = TIMEOUT  # socket read/write timeout per connection
+
+        def log_request(self, code='-', size='-'):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """werkzeug server handing requests to a bounded thread pool."""
+        multithread = True
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=THREADS)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def drain(self, timeout):
+            # Called after serve_forever returns: wait for in-flight requests
+            done = threading.Event()
+            threading.Thread(target=lambda: (self.pool.shutdown(wait=True), done.set()), daemon=True).start()
+            return done.wait(timeout)
+
+    listener = socket.socket(socket.AF_INET6 if ':' in HOST else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((HOST, PORT))
+    listener.listen(BACKLOG)
+    listener.set_inheritable(True)
+
+    def worker():
+        post_fork(backend)
+        server = PooledWSGIServer(HOST, PORT, backend.app, handler=RequestHandler, fd=listener.fileno())
+
+        def on_term(signum, frame):
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            begin_drain(backend, server.shutdown)
+
+        signal.signal(signal.SIGTERM, on_term)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # the master turns Ctrl-C into SIGTERM
+        server.serve_forever(poll_interval=0.2)
+        drained = server.drain(GRACEFUL_TIMEOUT)
+        os._exit(0 if drained else 1)
+
+    children = set()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker()
+            finally:
+                os._exit(1)
+        children.add(pid)
+
+    stopping = threading.Event()
+
+    def on_stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+
+    for _ in range(WORKERS):
+        spawn()
+    print(f"Serving on {HOST}:{PORT} with {WORKERS} workers x {THREADS} threads "
+          f"(model {backend.registry.active.version})")
+
+    while not stopping.is_set():
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid:
+            children.discard(pid)
+            print(f"Worker {pid} exited with status {status}; restarting")
+            spawn()
+        stopping.wait(0.5)
+
+    # Graceful stop: let every worker drain, then force whatever is left
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + DRAIN_DELAY + GRACEFUL_TIMEOUT + 1
+    while children and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            children.discard(pid)
+        else:
+            time.sleep(0.1)
+    for pid in children:
+        print(f"Worker {pid} did not drain in time; killing")
+        os.kill(pid, signal.SIGKILL)
+    listener.close()
+    print("Server stopped.")
+
+
+if __name__ == "__main__":
+    backend = load_app()
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_prefork(backend)
+    else:
+        run_gunicorn(backend)
+    sys.exit(0)
@@ -0,0 +1,27 @@
+import os
+import sys
+import warnings
+
+import pytest
+
+# app.py loads its artifacts relative to the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+warnings.filterwarnings('ignore')
+
+
+def pytest_configure(config):
+    # The reference implementation feeds plain arrays to estimators fitted on DataFrames
+    config.addinivalue_line('filterwarnings', 'ignore:X does not have valid feature names:UserWarning')
+
+
+@pytest.fixture(scope='session')
+def backend():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
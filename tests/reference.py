@@ -0,0 +1,103 @@
+"""The original (pre-optimization) /predict and /recommend logic, as a reference for parity tests."""
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from cost_model import COST_MAP
+
+with open('agriculture_model_improved.pkl', 'rb') as f:
+    model = pickle.load(f)
+with open('label_encoders_improved.pkl', 'rb') as f:
+    encoders = pickle.load(f)
+scaler = encoders['scaler']
+
+SLOPE_SUITABILITY = {
+    'Flat': ['Rice', 'Wheat', 'Jute', 'Potato', 'Sugarcane'],
+    'Steep': ['Tea', 'Coffee', 'Rubber', 'Arecanut', 'Black pepper', 'Cashewnut', 'Turmeric', 'Ginger']
+}
+BUDGET_LIMITS = {'Low': 20000, 'Medium': 50000, 'High': 1000000}
+
+
+def estimated_cost(crop, area):
+    base = 30000
+    for key in COST_MAP:
+        if key.lower() in str(crop).lower():
+            base = COST_MAP[key]
+            break
+    return area * base
+
+
+def predict_log(district, season, crop, area, rainfall, cost):
+    scaled = scaler.transform(np.array([[area, rainfall, cost]]))
+    features = np.array([[encoders['district'].transform([district])[0],
+                          encoders['season'].transform([season])[0],
+                          encoders['crop'].transform([crop])[0],
+                          scaled[0][0], scaled[0][1], scaled[0][2]]])
+    return model.predict(features)[0]
+
+
+def predict(farm):
+    area, rainfall = float(farm['area']), float(farm['rainfall'])
+    cost = farm.get('cost') or estimated_cost(farm['crop'], area)
+    production = np.expm1(predict_log(farm['district'], farm['season'], farm['crop'], area, rainfall, cost))
+    return {"production": production, "yield": production / area if area > 0 else 0, "estimated_cost": cost}
+
+
+def recommend(farm):
+    area, rainfall = float(farm['area']), float(farm.get('rainfall', 0))
+    season = farm.get('season', 'Kharif')
+    limit = BUDGET_LIMITS.get(farm.get('budget'), 1000000) * area
+    candidates = []
+    for crop in encoders['crop'].classes_:
+        cost = estimated_cost(crop, area)
+        if cost > limit:
+            continue
+        slope = farm.get('slope')
+        if slope in SLOPE_SUITABILITY and not any(c.lower() in crop.lower() for c in SLOPE_SUITABILITY[slope]):
+            continue
+        production = np.expm1(predict_log(farm['district'], season, crop, area, rainfall, cost))
+        candidates.append({"crop": crop, "production": production,
+                           "yield": production / area if area > 0 else 0, "cost": cost})
+    candidates.sort(key=lambda x: x['yield'], reverse=True)
+    return {"recommendations": candidates[:5], "best_crop": candidates[0] if candidates else None}
+
+
+def sample_farms(n, seed=0):
+    # Real district/season/crop combinations with off-grid area and rainfall
+    df = pd.read_csv('training_workspace/final_training_data_with_cost.csv')
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.choice(len(df), n, replace=False)]
+    return [{
+        "district": row.District_Name, "season": row.Season, "crop": row.Crop,
+        "area": round(float(row.Area) * rng.uniform(0.5, 1.5), 3),
+        "rainfall": round(float(row.Rainfall) * rng.uniform(0.8, 1.2), 2),
+        "budget": str(rng.choice(['Low', 'Medium', 'High'])),
+        "slope": str(rng.choice(['Flat', 'Gentle', 'Steep']))
+    } for row in rows.itertuples()]
+
+
+def add_cost(df):
+    # augment_data.py's original loop, with its own copy of the cost map
+    cost_map = {
+        'Rice': 40000, 'Banana': 100000, 'Maize': 30000, 'Linseed': 20000, 'Cowpea(Lobia)': 25000,
+        'Peas & beans (Pulses)': 35000, 'Rapeseed &Mustard': 25000, 'Sugarcane': 80000, 'Tobacco': 50000,
+        'Wheat': 35000, 'Jute': 45000, 'Mesta': 20000, 'Potato': 60000, 'Turmeric': 70000, 'Ginger': 80000,
+        'Arecanut': 90000, 'Black pepper': 100000, 'Cashewnut': 50000, 'Tapioca': 40000
+    }
+
+    def get_cost(crop):
+        for key in cost_map:
+            if key.lower() in str(crop).lower():
+                return cost_map[key]
+        return 30000
+
+    np.random.seed(42)
+    costs = []
+    for index, row in df.iterrows():
+        base = get_cost(row['Crop'])
+        area = row['Area']
+        variance = np.random.uniform(0.9, 1.1)
+        costs.append(area * base * variance)
+    df['Cost'] = costs
+    return df
@@ -0,0 +1,83 @@
+import threading
+import types
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+
+LOOPBACK = {'REMOTE_ADDR': '127.0.0.1'}
+
+
+@pytest.fixture(autouse=True)
+def admin_env(monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    monkeypatch.delenv('ADMIN_ALLOW_LOOPBACK', raising=False)
+
+
+def test_loopback_needs_token_by_default(client):
+    # Behind a reverse proxy every request arrives from loopback
+    assert client.get('/admin/model', environ_base=LOOPBACK).status_code == 403
+
+
+def test_loopback_allowed_when_enabled(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_ALLOW_LOOPBACK', '1')
+    assert client.get('/admin/model', environ_base=LOOPBACK).status_code == 200
+    assert client.get('/admin/model', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 403
+
+
+def test_token_required_when_set(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    monkeypatch.setenv('ADMIN_ALLOW_LOOPBACK', '1')
+    assert client.get('/admin/model', environ_base=LOOPBACK).status_code == 403
+    response = client.get('/admin/model', headers={'X-Admin-Token': 'secret'}, environ_base=LOOPBACK)
+    assert response.status_code == 200
+
+
+class SteppedWatch:
+    """Runs ModelRegistry.watch with the poll sleep under the test's control.
+
+    Each poll() lets the watch loop run one iteration; afterwards the (daemon)
+    thread stays parked in sleep().
+    """
+
+    def __init__(self, monkeypatch, source):
+        self.go = threading.Semaphore(0)
+        self.polled = threading.Semaphore(0)
+        self.reloads = []
+        monkeypatch.setattr(model_registry, 'time', types.SimpleNamespace(sleep=self.sleep))
+        registry = ModelRegistry()
+        registry._reload_quietly = self.reloads.append
+        registry.watch(lambda: source, interval=1)
+        assert self.polled.acquire(timeout=5)
+
+    def sleep(self, _):
+        self.polled.release()
+        self.go.acquire()
+
+    def poll(self):
+        self.go.release()
+        assert self.polled.acquire(timeout=5)
+        return len(self.reloads)
+
+
+def test_pickle_pair_reloads_only_once_both_files_are_stable(monkeypatch, tmp_path):
+    model, encoders = tmp_path / 'model.pkl', tmp_path / 'encoders.pkl'
+    model.write_bytes(b'old model')
+    encoders.write_bytes(b'old encoders')
+    watch = SteppedWatch(monkeypatch, [str(model), str(encoders)])
+    model.write_bytes(b'new model, half written')
+    assert watch.poll() == 0
+    model.write_bytes(b'new model, complete')
+    encoders.write_bytes(b'new encoders')
+    assert watch.poll() == 0
+    assert watch.poll() == 1
+    assert watch.poll() == 1
+
+
+def test_bundle_reloads_on_manifest_replace(monkeypatch, tmp_path):
+    manifest = tmp_path / model_registry.MANIFEST
+    manifest.write_text('{"version": "a"}')
+    watch = SteppedWatch(monkeypatch, str(tmp_path))
+    manifest.write_text('{"version": "bb"}')
+    assert watch.poll() == 1
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('lat, lon', [
+    ("abc", 91.88),
+    (25.57, "abc"),
+    ([25.57], 91.88),
+    (95, 91.88),
+    (25.57, 181),
+    ("nan", 91.88),
+])
+def test_invalid_location_is_rejected(client, lat, lon):
+    response = client.post('/advisory', json={"lat": lat, "lon": lon})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_missing_location(client):
+    response = client.post('/advisory', json={"crop": "Rice"})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Location required"}
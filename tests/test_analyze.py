@@ -0,0 +1,36 @@
+import pytest
+
+FARM = {"district": "EAST KHASI HILLS", "season": "Kharif", "crop": "Rice", "area": 10,
+        "rainfall": 2500, "budget": "Medium", "slope": "Gentle", "month_idx": 5}
+
+
+def test_analyze_matches_predict(client):
+    analysis = client.post('/analyze', json=FARM).get_json()
+    prediction = client.post('/predict', json=FARM).get_json()
+    assert analysis["prediction"] == pytest.approx(prediction)
+
+
+@pytest.mark.parametrize('field, value', [("cost", "abc"), ("cost", [1]), ("area", "abc"), ("rainfall", "abc")])
+def test_non_numeric_input_is_rejected(client, field, value):
+    response = client.post('/analyze', json={**FARM, field: value})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": f"{field} must be numeric"}
+
+
+@pytest.mark.parametrize('value', ["5", 5.5, None, True, [5]])
+def test_bad_month_idx_is_rejected(client, value):
+    response = client.post('/analyze', json={**FARM, "month_idx": value})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "month_idx must be an integer (0 = Jan)"}
+
+
+def test_month_idx_wraps_like_forecast(client):
+    analysis = client.post('/analyze', json={**FARM, "month_idx": 17}).get_json()
+    forecast = client.post('/forecast', json={"district": FARM["district"], "month_idx": 17}).get_json()
+    assert analysis["forecast"] == forecast["forecast"]
+
+
+def test_explicit_cost_is_used(client):
+    response = client.post('/analyze', json={**FARM, "cost": "500000"})
+    assert response.status_code == 200
+    assert response.get_json()["prediction"]["estimated_cost"] == 500000.0
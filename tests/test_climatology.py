@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from climatology import RAINFALL_BULLETINS, Climatology
+from model_bundle import load_bundle
+
+
+def test_bundle_ships_the_bulletin_cube():
+    bundle = load_bundle()
+    rainfall_data = bundle.rainfall_data
+    shipped = Climatology.from_rainfall_data(rainfall_data, bundle.rainfall_history)
+    parsed = Climatology.from_rainfall_data(rainfall_data, bulletins=RAINFALL_BULLETINS)
+    assert shipped.has_history
+    np.testing.assert_array_equal(shipped.years, parsed.years)
+    np.testing.assert_array_equal(shipped.cube, parsed.cube)
+
+
+def test_serving_import_skips_pandas_and_training_code():
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, app; print(sorted(m for m in sys.modules "
+                               "if m.split('.')[0] in ('pandas', 'sklearn', 'training_workspace', 'process_rainfall')))"],
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    assert loaded == '[]'
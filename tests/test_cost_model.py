@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+WORKSPACE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training_workspace')
+sys.path.insert(0, WORKSPACE)
+from augment_data import add_cost  # noqa: E402
+
+from cost_model import CostModel, cost_model  # noqa: E402
+import reference  # noqa: E402
+
+
+def test_add_cost_reproduces_the_baseline_on_the_training_data():
+    df = pd.read_csv(os.path.join(WORKSPACE, 'final_training_data.csv'))
+    expected = reference.add_cost(df.copy())
+    actual = add_cost(df.copy())
+    np.testing.assert_array_equal(actual['Cost'].to_numpy(), expected['Cost'].to_numpy())
+    pd.testing.assert_frame_equal(actual, expected)
+    # ...and so the committed augmented file
+    committed = pd.read_csv(os.path.join(WORKSPACE, 'final_training_data_with_cost.csv'))
+    np.testing.assert_allclose(actual['Cost'].to_numpy(), committed['Cost'].to_numpy(), rtol=1e-15)
+
+
+def test_add_cost_handles_odd_crop_names():
+    # Substring matches, case, unknown names, non-strings and repeats, in a shuffled order
+    crops = ['rice', 'Black pepper (whole)', 'Dry chillies', None, 42, 'Peas & beans (Pulses)', 'RICE',
+             'Sugarcane', 'Tea', 'rice', 'Cowpea(Lobia)', 'Potato']
+    df = pd.DataFrame({'Crop': crops * 5, 'Area': np.linspace(0, 30, 60)})
+    np.testing.assert_array_equal(add_cost(df.copy())['Cost'].to_numpy(),
+                                  reference.add_cost(df.copy())['Cost'].to_numpy())
+
+
+@pytest.mark.parametrize('crop', ['Rice', 'Arecanut', 'Unknown crop', 'black PEPPER'])
+def test_estimates_match_the_baseline(crop):
+    assert cost_model.estimate(crop, 2.5) == reference.estimated_cost(crop, 2.5)
+    assert CostModel().estimate_many([crop] * 3, [0, 1.5, 7])[1] == reference.estimated_cost(crop, 1.5)
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fast_model import FlatTreeEnsemble, RoutedEnsemble
+from model_bundle import load_bundle
+from model_registry import ModelRegistry
+import reference
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(0)
+    n = 300
+    return np.column_stack([
+        rng.integers(0, 10, n), rng.integers(0, 5, n), rng.integers(0, 20, n),
+        rng.normal(size=(n, 3))
+    ])
+
+
+class Recorder:
+    def __init__(self, model):
+        self.model = model
+        self.n_features_in_ = model.n_features_in_
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return self.model.predict(X)
+
+
+def test_routed_ensemble_splits_on_batch_size(rows):
+    flat = Recorder(FlatTreeEnsemble.from_sklearn(reference.model))
+    estimator = Recorder(reference.model)
+    routed = RoutedEnsemble(flat, estimator, max_flat_rows=96)
+
+    for n in (1, 28, 96, 97, 300):
+        np.testing.assert_array_equal(routed.predict(rows[:n]), reference.model.predict(rows[:n]))
+    assert flat.calls == [1, 28, 96]
+    assert estimator.calls == [97, 300]
+
+
+def test_bundle_routes_large_batches_to_estimator(rows):
+    bundle = load_bundle()
+    assert isinstance(bundle.model, RoutedEnsemble)
+    assert bundle.verify() == []
+    np.testing.assert_array_equal(bundle.model.predict(rows[:5]), reference.model.predict(rows[:5]))
+    assert bundle.model._estimator is None  # not unpickled until a large batch needs it
+    np.testing.assert_array_equal(bundle.model.predict(rows), reference.model.predict(rows))
+    assert bundle.model._estimator is not None
+
+
+@pytest.mark.parametrize('value, message', [
+    (np.nan, "Input X contains NaN"),
+    (np.inf, "Input X contains infinity"),
+    (-np.inf, "Input X contains infinity"),
+    (1e300, "Input X contains infinity"),  # overflows float32, as in sklearn
+])
+def test_flat_engine_rejects_non_finite_inputs_like_sklearn(rows, value, message):
+    flat = FlatTreeEnsemble.from_sklearn(reference.model)
+    X = rows[:4].copy()
+    X[2, 4] = value
+    with pytest.raises(ValueError, match=message):
+        reference.model.predict(X)
+    with pytest.raises(ValueError, match=message):
+        flat.predict(X)
+
+
+FARM = {"district": "EAST KHASI HILLS", "season": "Kharif", "crop": "Rice", "area": 2.5, "rainfall": 2400}
+
+
+@pytest.mark.parametrize('endpoint', ['/predict', '/recommend', '/analyze'])
+@pytest.mark.parametrize('field, value', [('area', 'nan'), ('rainfall', 'nan'), ('rainfall', 'inf'),
+                                          ('rainfall', '-inf')])
+def test_non_finite_inputs_return_400(client, endpoint, field, value):
+    response = client.post(endpoint, json={**FARM, field: value})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_flat_engine_matches_sklearn_on_the_training_data():
+    df = pd.read_csv('training_workspace/final_training_data_with_cost.csv')
+    encoders = reference.encoders
+    X = np.column_stack([
+        encoders['district'].transform(df['District_Name']),
+        encoders['season'].transform(df['Season']),
+        encoders['crop'].transform(df['Crop']),
+        encoders['scaler'].transform(df[['Area', 'Rainfall', 'Cost']].to_numpy())
+    ])
+    assert len(X) == 927
+    flat = FlatTreeEnsemble.from_sklearn(reference.model)
+    np.testing.assert_array_equal(flat.predict(X), reference.model.predict(X))
+    np.testing.assert_array_equal(np.expm1(flat.predict(X)), np.expm1(reference.model.predict(X)))
+    # The memory-mapped copy that serves requests
+    np.testing.assert_array_equal(load_bundle().model.flat.predict(X), reference.model.predict(X))
+
+
+class Unvalidated:
+    """A flat engine that scores whatever it is given, like the one before input checks."""
+    def __init__(self, model):
+        self.model = model
+        self.n_features_in_ = model.n_features_in_
+
+    def predict(self, X):
+        return self.model.predict(np.nan_to_num(np.asarray(X, dtype=float)))
+
+
+def test_registry_refuses_a_bundle_that_scores_non_finite_inputs():
+    def swap(mv):
+        mv.model.flat = Unvalidated(mv.model.flat)
+
+    with pytest.raises(ValueError, match="non-finite input"):
+        ModelRegistry(prepare=swap).load('model_bundle')
+    # The shipped bundle passes the same gate
+    assert ModelRegistry().load('model_bundle').bundle is not None
+
+
+def test_bundle_estimator_references_the_model_pickle():
+    bundle = load_bundle()
+    assert bundle.manifest['estimator']['file'] == '../agriculture_model_improved.pkl'
+    assert bundle.load_estimator().n_estimators == reference.model.n_estimators
@@ -0,0 +1,102 @@
+import os
+import re
+
+import pytest
+
+import metrics
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+FARM = {"district": "EAST KHASI HILLS", "season": "Kharif", "crop": "Rice", "area": 2.5, "rainfall": 2400}
+
+
+def parse(text):
+    """{(name, frozenset(labels)): value}, checking the exposition format along the way."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('counter', 'gauge', 'histogram')
+            types[name] = kind
+            continue
+        match = SAMPLE_RE.match(line)
+        assert match, f"Unparseable line: {line!r}"
+        name, labels, value = match.groups()
+        family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+        assert family in types, f"Sample before its TYPE line: {line!r}"
+        pairs = LABEL_RE.findall(labels or '')
+        assert ','.join(f'{k}="{v}"' for k, v in pairs) == (labels or '')
+        samples[(name, frozenset(pairs))] = float(value)
+    return samples, types
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    return parse(response.get_data(as_text=True))[0]
+
+
+def test_exposition_parses_and_counts_predict(client):
+    before = scrape(client)
+    assert client.post('/predict', json=FARM).status_code == 200
+    after = scrape(client)
+
+    requests = ('agri_http_requests_total',
+                frozenset({('endpoint', '/predict'), ('method', 'POST'), ('status', '200')}))
+    duration = ('agri_http_request_duration_seconds_count', frozenset({('endpoint', '/predict')}))
+    assert after[requests] == before.get(requests, 0) + 1
+    assert after[duration] == before.get(duration, 0) + 1
+
+    # Buckets are cumulative and end at the count
+    buckets = sorted((float(dict(pairs)['le']), value) for (name, pairs), value in after.items()
+                     if name == 'agri_http_request_duration_seconds_bucket' and dict(pairs)['endpoint'] == '/predict')
+    assert [value for _, value in buckets] == sorted(value for _, value in buckets)
+    assert buckets[-1] == (float('inf'), after[duration])
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'multiprocess_dir', None)
+    metrics.enable_multiprocess(str(tmp_path))
+    return tmp_path
+
+
+def test_scrapes_sum_every_worker(shared_dir, client):
+    labels = ('/worker-test', 'POST', '200')
+    key = ('agri_http_requests_total', frozenset(zip(('endpoint', 'method', 'status'), labels)))
+    in_flight = ('agri_http_requests_in_flight', frozenset({('endpoint', '/worker-test')}))
+    ready_r, ready_w = os.pipe()
+    done_r, done_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # A worker: starts from zero, counts 3 requests, one still in flight
+        try:
+            metrics.registry.reset()
+            for _ in range(3):
+                metrics.REQUESTS.inc(labels)
+            metrics.IN_FLIGHT.inc(('/worker-test',))
+            metrics.flush()
+            os.write(ready_w, b'x')
+            os.read(done_r, 1)
+        finally:
+            os._exit(0)
+
+    os.read(ready_r, 1)
+    metrics.REQUESTS.inc(labels, 2)
+    samples = scrape(client)
+    assert samples[key] == 5
+    assert samples[in_flight] == 1
+    assert len(list(shared_dir.glob('metrics-*.json'))) == 2
+
+    # The worker exits: its counts stay, its gauges go
+    os.write(done_w, b'x')
+    os.waitpid(pid, 0)
+    samples = scrape(client)
+    assert samples[key] == 5
+    assert samples.get(in_flight, 0) == 0
+    for fd in (ready_r, ready_w, done_r, done_w):
+        os.close(fd)
@@ -0,0 +1,50 @@
+import os
+import pickle
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training_workspace'))
+import pipeline  # noqa: E402
+import train_improved_model  # noqa: E402
+
+
+@pytest.fixture
+def train_pipeline(tmp_path, monkeypatch):
+    # Only the train stage, fed from the committed CSVs, with the committed model in place of a fit
+    with open('agriculture_model_improved.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open('label_encoders_improved.pkl', 'rb') as f:
+        encoders = pickle.load(f)
+    monkeypatch.setattr(train_improved_model, 'fit_model', lambda df: (model, encoders))
+
+    def load_tables(sources):
+        return {'training_data': pd.read_csv('training_workspace/final_training_data_with_cost.csv'),
+                'rainfall_monthly': pd.read_csv('rainfall_monthly_averages.csv')}
+
+    tables = pipeline.Stage('tables', load_tables, ['columnar.py'], outputs=['training_data', 'rainfall_monthly'])
+    artifacts = tmp_path / 'out' / 'models'
+    train = pipeline.build_stages(str(artifacts))[-1]
+    return pipeline.Pipeline([tables, train], cache_dir=str(tmp_path / 'cache')), artifacts
+
+
+def train_status(p):
+    return p.run()[-1]['status']
+
+
+def test_train_creates_the_artifacts_directory(train_pipeline):
+    p, artifacts = train_pipeline
+    assert train_status(p) == 'ran'
+    for name in pipeline.ARTIFACT_FILES:
+        assert (artifacts / name).exists()
+
+
+@pytest.mark.parametrize('missing', pipeline.ARTIFACT_FILES)
+def test_train_reruns_when_an_artifact_is_missing(train_pipeline, missing):
+    p, artifacts = train_pipeline
+    assert train_status(p) == 'ran'
+    assert train_status(p) == 'skipped'
+    os.remove(artifacts / missing)
+    assert train_status(p) == 'ran (output unchanged)'
+    assert (artifacts / missing).exists()
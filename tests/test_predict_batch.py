@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import reference
+
+FARMS = reference.sample_farms(20, seed=1)
+ROWS = [{key: farm[key] for key in ("district", "season", "crop", "area", "rainfall")} for farm in FARMS]
+ROWS[3]["cost"] = 250000
+
+
+def post_ndjson(client, lines):
+    return client.post('/predict/batch', data="\n".join(lines), content_type='application/x-ndjson')
+
+
+@pytest.mark.parametrize('body', ['list', 'rows', 'ndjson'])
+def test_batch_matches_single_predictions(client, body):
+    if body == 'list':
+        response = client.post('/predict/batch', json=ROWS)
+    elif body == 'rows':
+        response = client.post('/predict/batch', json={"rows": ROWS})
+    else:
+        response = post_ndjson(client, [json.dumps(row) for row in ROWS])
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["count"], data["errors"]) == (len(ROWS), 0)
+    for i, (row, result) in enumerate(zip(ROWS, data["results"])):
+        single = client.post('/predict', json=row).get_json()
+        assert result == pytest.approx({"index": i, **single})
+
+
+def test_one_malformed_ndjson_line_fails_only_itself(client):
+    lines = [json.dumps(row) for row in ROWS[:4]]
+    lines.insert(2, '{"district": "EAST KHASI HILLS", "area": ')
+    lines.insert(1, '')  # blank lines are skipped but still counted
+    response = post_ndjson(client, lines)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["count"], data["errors"]) == (5, 1)
+    bad = data["results"][2]
+    assert bad["index"] == 2 and bad["line"] == 4
+    assert bad["error"].startswith("Invalid JSON")
+    good = [result for result in data["results"] if "error" not in result]
+    expected = [client.post('/predict', json=row).get_json() for row in ROWS[:4]]
+    assert [result["production"] for result in good] == pytest.approx([e["production"] for e in expected])
+
+
+@pytest.mark.parametrize('field, value', [('area', 'nan'), ('rainfall', 'inf'), ('rainfall', '-inf'),
+                                          ('cost', 'nan'), ('area', '1e999')])
+def test_non_finite_values_fail_their_row(client, field, value):
+    rows = [ROWS[0], {**ROWS[1], field: value}, ROWS[2]]
+    data = client.post('/predict/batch', json=rows).get_json()
+    assert data["errors"] == 1
+    assert data["results"][1] == {"index": 1, "error": "area, rainfall and cost must be finite"}
+    for i in (0, 2):
+        assert data["results"][i]["production"] == pytest.approx(
+            client.post('/predict', json=rows[i]).get_json()["production"])
+
+
+def test_bad_rows_among_good_ones(client):
+    rows = [ROWS[0], "not an object", {**ROWS[1], "crop": "Durian"}, {**ROWS[2], "area": "abc"}, ROWS[3]]
+    data = client.post('/predict/batch', json=rows).get_json()
+    assert data["errors"] == 3
+    assert [result.get("error") for result in data["results"]] == [
+        None, "Row must be a JSON object", "Unknown crop: Durian", "area, rainfall and cost must be numeric", None]
@@ -0,0 +1,94 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from predict_batcher import PredictionBatcher
+import reference
+
+
+class Recorder:
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return self.model.predict(X)
+
+
+@pytest.fixture
+def active(backend):
+    live = backend.registry.active
+    return SimpleNamespace(feature_builder=live.feature_builder, model=Recorder(live.model))
+
+
+def encode(active, farm):
+    return tuple(active.feature_builder.encode(field, farm[field]) for field in ('district', 'season', 'crop'))
+
+
+def submit_concurrently(batcher, active, rows):
+    # rows: (codes, numerical); returns each caller's result or exception
+    barrier = threading.Barrier(len(rows))
+    outcomes = [None] * len(rows)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            outcomes[i] = batcher.predict(active, *rows[i])
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def coalescing_batcher():
+    batcher = PredictionBatcher(max_batch=64, window=0.05, timeout=5)
+    batcher.avg_batch = 32.0  # as if concurrency had been seen: queue and linger instead of predicting inline
+    return batcher
+
+
+def test_each_caller_gets_its_own_row(active):
+    farms = reference.sample_farms(40, seed=3)
+    rows = [(encode(active, farm), (farm["area"], farm["rainfall"],
+                                    reference.estimated_cost(farm["crop"], farm["area"]))) for farm in farms]
+    batcher = coalescing_batcher()
+    outcomes = submit_concurrently(batcher, active, rows)
+
+    expected = [reference.predict_log(farm["district"], farm["season"], farm["crop"], farm["area"],
+                                      farm["rainfall"], row[1][2]) for farm, row in zip(farms, rows)]
+    assert outcomes == pytest.approx(expected)
+    assert len(set(outcomes)) > 1
+    assert max(active.model.calls) > 1  # rows really were predicted together
+    assert sum(active.model.calls) == 40
+    assert batcher.snapshot()['errors'] == 0
+
+
+def test_a_failing_row_fails_only_its_own_request(active):
+    farms = reference.sample_farms(12, seed=4)
+    rows = [(encode(active, farm), (farm["area"], farm["rainfall"], 50000.0)) for farm in farms]
+    rows[5] = (rows[5][0], (farms[5]["area"], np.nan, 50000.0))
+    batcher = coalescing_batcher()
+    outcomes = submit_concurrently(batcher, active, rows)
+
+    assert isinstance(outcomes[5], ValueError) and "NaN" in str(outcomes[5])
+    assert max(active.model.calls) > 1  # the bad row was batched with good ones
+    for i, farm in enumerate(farms):
+        if i != 5:
+            assert outcomes[i] == pytest.approx(reference.predict_log(
+                farm["district"], farm["season"], farm["crop"], farm["area"], farm["rainfall"], 50000.0))
+    assert batcher.snapshot()['errors'] == 1
+
+
+def test_inline_error_reaches_the_caller(active):
+    batcher = PredictionBatcher()
+    codes = encode(active, reference.sample_farms(1)[0])
+    with pytest.raises(ValueError, match="infinity"):
+        batcher.predict(active, codes, (1.0, np.inf, 1.0))
+    assert batcher.snapshot()['inline'] == 1
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+WORKSPACE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training_workspace')
+sys.path.insert(0, WORKSPACE)
+from process_csv import CROP_COLUMNS, match_entries, stream_match_entries  # noqa: E402
+
+CROP_ROWS = [
+    # State_Name, District_Name, Crop_Year, Season, Crop, Area, Production
+    ("Meghalaya", "EAST KHASI HILLS", 2001, "Kharif     ", "Rice", 120.0, 300.0),
+    ("Meghalaya", " RI BHOI", 2001, "Kharif", "Maize", 40.0, 55.5),
+    ("Assam", "KAMRUP", 2001, "Kharif", "Rice", 120.0, 300.0),  # other state
+    ("Meghalaya", "EAST KHASI HILLS", 2002, "Rabi", "Potato", -0.0, 0.0),  # -0.0 area
+    ("Meghalaya", "EAST KHASI HILLS", 2001, "Kharif     ", "Rice", 120.0, 300.0),  # repeated row
+    ("Meghalaya", "WEST GARO HILLS", 2003, "Whole Year", "Ginger", 15.0, 80.0),  # plain year in file2
+    ("MEGHALAYA", "WEST GARO HILLS", 2003, "Autumn", "Rice", 7.5, 9.25),  # kept by the filter; state differs
+    ("Meghalaya", "RI BHOI", 2001, "Kharif", "Maize", 40.0, 55.50001),  # near miss
+]
+FILE2_ROWS = [
+    # State, District, Crop, Year, Season, Area, Production
+    ("Meghalaya", "EAST KHASI HILLS", "Rice", "2001-02", "Kharif", 120.0, 300.0),
+    ("Meghalaya", "EAST KHASI HILLS", "Rice", "2001-02", " Kharif", 120.0, 300.0),  # duplicate key
+    ("Meghalaya", "RI BHOI", "Maize", "2001-02", "Kharif", 40.0, 55.5),
+    ("Meghalaya", "EAST KHASI HILLS", "Potato", "2002-03", "Rabi", 0.0, -0.0),
+    ("Assam", "KAMRUP", "Rice", "2001-02", "Kharif", 120.0, 300.0),
+    ("Meghalaya", "WEST GARO HILLS", "Rice", "2003", "Autumn", 7.5, 9.25),
+    ("Meghalaya", "WEST GARO HILLS", "Ginger", "2003", "Whole Year", 15.0, 80.0),
+    ("Meghalaya", "JAINTIA HILLS", "Rice", "2004-05", "Kharif", 1.0, 1.0),
+]
+
+
+def assert_same_rows(actual, expected):
+    # Row order of an inner merge with duplicate keys is up to pandas; compare the rows as a multiset
+    def canonical(df):
+        return df[CROP_COLUMNS].sort_values(CROP_COLUMNS, kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(canonical(actual), canonical(expected))
+
+
+@pytest.fixture
+def national_files(tmp_path):
+    crop_path, file2_path = tmp_path / 'crop_production.csv', tmp_path / 'file2.csv'
+    pd.DataFrame(CROP_ROWS, columns=CROP_COLUMNS).to_csv(crop_path, index=False)
+    pd.DataFrame(FILE2_ROWS, columns=['State', 'District', 'Crop', 'Year', 'Season', 'Area', 'Production']
+                 ).to_csv(file2_path, index=False)
+    return str(crop_path), str(file2_path)
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3, 1000])
+def test_stream_matches_in_memory_merge(national_files, chunksize):
+    crop_path, file2_path = national_files
+    expected = match_entries(pd.read_csv(crop_path), pd.read_csv(file2_path))[CROP_COLUMNS]
+    actual = stream_match_entries(crop_path, file2_path, chunksize=chunksize)
+
+    # Two file2 duplicates for each of the two repeated rows, then Ri Bhoi, the -0.0 row and Ginger
+    assert len(expected) == 7
+    assert_same_rows(actual, expected)
+
+
+def test_stream_can_match_several_states(national_files):
+    crop_path, file2_path = national_files
+    df1, df2 = pd.read_csv(crop_path), pd.read_csv(file2_path)
+    # match_entries only knows Meghalaya; relabel Assam to compare on it too
+    expected = match_entries(df1.replace('Assam', 'Meghalaya Assam'), df2.replace('Assam', 'Meghalaya Assam'))
+    actual = stream_match_entries(crop_path, file2_path, states=('Meghalaya', 'Assam'), chunksize=2)
+    assert len(actual) == len(expected) == 8
+    assert sorted(actual['State_Name']) == sorted(expected['State_Name'].str.replace('Meghalaya Assam', 'Assam'))
+
+
+def test_no_matches_gives_empty_frame(national_files):
+    crop_path, file2_path = national_files
+    actual = stream_match_entries(crop_path, file2_path, states=('Sikkim',))
+    assert actual.empty and list(actual.columns) == CROP_COLUMNS
+
+
+def test_stream_matches_merge_on_many_duplicate_keys(tmp_path):
+    # A small key space so keys repeat on both sides and across chunk boundaries
+    rng = np.random.default_rng(0)
+    n = 400
+    district = rng.choice(["EAST KHASI HILLS", " RI BHOI", "WEST GARO HILLS "], n)
+    year = rng.integers(2000, 2003, n)
+    crop = rng.choice(["Rice", "Maize"], n)
+    area = rng.choice([0.0, -0.0, 1.5, 2.0], n)
+    crop_path, file2_path = tmp_path / 'crop_production.csv', tmp_path / 'file2.csv'
+    pd.DataFrame({'State_Name': "Meghalaya", 'District_Name': district, 'Crop_Year': year, 'Season': "Kharif",
+                  'Crop': crop, 'Area': area, 'Production': 10.0}).to_csv(crop_path, index=False)
+    pick = rng.choice(n, 60)
+    pd.DataFrame({'State': "Meghalaya", 'District': district[pick], 'Crop': crop[pick],
+                  'Year': [f"{y}-{(y + 1) % 100:02d}" for y in year[pick]], 'Season': " Kharif",
+                  'Area': -area[pick], 'Production': 10.0}).to_csv(file2_path, index=False)
+
+    expected = match_entries(pd.read_csv(crop_path), pd.read_csv(file2_path))[CROP_COLUMNS]
+    actual = stream_match_entries(str(crop_path), str(file2_path), chunksize=7)
+    assert expected.duplicated().sum() > 100
+    assert_same_rows(actual, expected)
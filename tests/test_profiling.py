@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import profiling
+
+SECRET = 'test-secret'
+FARM = {"district": "EAST KHASI HILLS", "season": "Kharif", "crop": "Rice", "area": 2.5, "rainfall": 2400}
+
+
+@pytest.fixture
+def ring(tmp_path, monkeypatch):
+    ring = profiling.ProfileRing(str(tmp_path / 'profiles'), size=3)
+    monkeypatch.setattr(profiling, 'ring', ring)
+    monkeypatch.setattr(profiling, 'PROFILE_SECRET', SECRET)
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 0)
+    return ring
+
+
+def post(client, header=None):
+    headers = {profiling.HEADER: header} if header is not None else {}
+    response = client.post('/predict', json=FARM, headers=headers)
+    assert response.status_code == 200
+    return response
+
+
+def test_signed_header_profiles(client, ring):
+    response = post(client, profiling.sign('POST', '/predict', secret=SECRET))
+    name = response.headers['X-Profile-Id']
+    assert [e['name'] for e in ring.list()] == [name]
+    assert 'predict' in ring.summary(name)
+
+
+@pytest.mark.parametrize('header', [
+    '',
+    'not-a-signature',
+    f"{int(time.time())}.{'0' * 64}",
+    profiling.sign('POST', '/predict', secret='wrong-secret'),
+    profiling.sign('GET', '/predict', secret=SECRET),  # other method
+    profiling.sign('POST', '/recommend', secret=SECRET),  # other path
+    profiling.sign('POST', '/predict', timestamp=time.time() - 2 * profiling.PROFILE_SIGNATURE_TTL, secret=SECRET),
+    'abc.' + profiling.sign('POST', '/predict', secret=SECRET).split('.')[1],
+])
+def test_unsigned_or_badly_signed_header_does_not_profile(client, ring, header):
+    response = post(client, header)
+    assert 'X-Profile-Id' not in response.headers
+    assert ring.list() == []
+
+
+def test_no_secret_disables_signed_profiling(client, ring, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_SECRET', '')
+    response = post(client, profiling.sign('POST', '/predict', secret=''))
+    assert 'X-Profile-Id' not in response.headers
+
+
+def test_ring_is_trimmed_to_its_size(client, ring, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'admin')
+    names = [post(client, profiling.sign('POST', '/predict', secret=SECRET)).headers['X-Profile-Id']
+             for _ in range(7)]
+    assert len(set(names)) == 7
+    kept = [e['name'] for e in ring.list()]
+    assert kept == names[:-4:-1]  # the newest three, newest first
+    assert ring.path(names[0]) is None
+    admin = {'X-Admin-Token': 'admin'}
+    listed = client.get('/admin/profiles', headers=admin).get_json()
+    assert [e['name'] for e in listed['profiles']] == kept and listed['ring_size'] == 3
+    assert client.get(f'/admin/profiles/{names[0]}', headers=admin).status_code == 404
+    assert client.get(f'/admin/profiles/{names[-1]}', headers=admin).status_code == 200
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+WORKSPACE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training_workspace')
+sys.path.insert(0, WORKSPACE)
+from process_rainfall import RainfallStore, aggregate_file, parse_rainfall_data  # noqa: E402
+
+RAW = os.path.join(WORKSPACE, 'rainfall_raw.txt')
+HEADER = "Stations\tJan\tFeb\tMarch\tApril\tMay\tJune\tJuly\tAug\tSep\tOct\tNov\tDec\tTotal\tRainy Days"
+
+
+def station(name, scale):
+    monthly = [round(scale * (i + 1), 1) for i in range(12)]
+    return "\t".join([name, *map(str, monthly), str(round(sum(monthly), 1)), "0"])
+
+
+def bulletin(year, scale):
+    # A new year's bulletin: an existing district, the alias spelling of another, and a new one
+    return "\n".join([
+        f"--- Year {year} ---", "East Khasi Hills", HEADER, station("Shillong", scale), station("Sohra", 2 * scale), "",
+        "Ri Bhoi District", HEADER, station("Nongpoh", scale), "",
+        "Eastern West Khasi Hills", HEADER, station("Mairang", 3 * scale), ""
+    ])
+
+
+def concatenated(paths, tmp_path):
+    # The single file a full rebuild would parse
+    combined = tmp_path / 'combined.txt'
+    combined.write_text("\n".join(open(p).read() for p in paths))
+    return str(combined)
+
+
+def assert_tables_equal(store_tables, parsed_tables):
+    for stored, parsed in zip(store_tables, parsed_tables):
+        pd.testing.assert_frame_equal(stored.reset_index(drop=True), parsed.reset_index(drop=True),
+                                      check_dtype=False)
+
+
+def test_incremental_append_matches_full_rebuild(tmp_path):
+    store = RainfallStore(str(tmp_path / 'store.json'))
+    assert store.update([RAW]) == ['rainfall_raw.txt']
+    assert_tables_equal(store.tables(), parse_rainfall_data(RAW))
+    store.save()
+
+    paths = [RAW]
+    for year, scale in [(2024, 10.0), (2025, 12.5)]:
+        path = tmp_path / f'bulletin_{year}.txt'
+        path.write_text(bulletin(year, scale))
+        paths.append(str(path))
+        # A fresh process: reload the store from disk, parse only the new file
+        store = RainfallStore(str(tmp_path / 'store.json'))
+        assert store.update(paths) == [f'bulletin_{year}.txt']
+        store.save()
+        assert_tables_equal(store.tables(), parse_rainfall_data(concatenated(paths, tmp_path)))
+
+
+def test_changed_file_replaces_its_contribution(tmp_path):
+    path = tmp_path / 'bulletin_2024.txt'
+    path.write_text(bulletin(2024, 10.0))
+    store = RainfallStore(str(tmp_path / 'store.json'))
+    store.update([RAW, str(path)])
+    path.write_text(bulletin(2024, 20.0))
+    assert store.update([RAW, str(path)]) == ['bulletin_2024.txt']
+    assert_tables_equal(store.tables(), parse_rainfall_data(concatenated([RAW, str(path)], tmp_path)))
+
+
+@pytest.mark.parametrize('preamble', [
+    [HEADER, station("Orphan", 1.0)],  # no year or district yet
+    ["--- Year 2023 ---", HEADER, station("Orphan", 1.0)],  # year but no district
+])
+def test_station_rows_before_any_district_are_skipped(tmp_path, preamble):
+    path = tmp_path / 'bulletin.txt'
+    path.write_text("\n".join(preamble + [bulletin(2024, 10.0)]))
+    groups = aggregate_file(str(path))['groups']
+    assert sorted(groups) == ['EAST KHASI HILLS|2024', 'EASTERN WEST KHASI HILLS|2024', 'RI BHOI|2024']
+    assert groups['EAST KHASI HILLS|2024']['stations'] == 2
+
+    store = RainfallStore(str(tmp_path / 'store.json'))
+    store.update([str(path)])
+    assert_tables_equal(store.tables(), parse_rainfall_data(str(path)))
@@ -0,0 +1,122 @@
+import json
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+import reference
+from recommend_grid import RecommendationGrid, build_grid, save_grid, step_free_cells, validate_grid
+
+# A narrow, dense grid so the test builds in about a second; the default axes are rebuilt offline
+RAINFALL_AXIS = np.arange(2000, 2101, 5, dtype=np.float64)
+AREA_AXIS = np.geomspace(2.6, 3.4, 5)
+
+
+def as_json(value):
+    return json.loads(json.dumps(value, default=float))
+
+
+@pytest.fixture(scope='module')
+def grid(backend):
+    active = backend.registry.active
+    with open('agriculture_model_improved.pkl', 'rb') as f:
+        estimator = pickle.load(f)
+    vocab = active.feature_builder.vocabularies
+    base_cost = active.crop_table['base_cost']
+    log_production = build_grid(estimator, active.feature_builder, base_cost, RAINFALL_AXIS, AREA_AXIS)
+    flat = step_free_cells(estimator, active.feature_builder, base_cost, RAINFALL_AXIS, AREA_AXIS)
+    grid = RecommendationGrid(log_production, vocab['district'], vocab['season'], vocab['crop'],
+                              RAINFALL_AXIS, AREA_AXIS, active.fingerprint, *flat)
+    grid.validation = validate_grid(grid, active.model, active.feature_builder, base_cost, n_points=300,
+                                    candidates=lambda area, rng: request_candidates(backend, area, rng))
+    return grid
+
+
+def request_candidates(backend, area, rng):
+    budget, slope = rng.choice(list(backend.BUDGET_LIMITS)), rng.choice(list(backend.SLOPE_SUITABILITY))
+    return backend.select_candidates(backend.registry.active.crop_table, area, budget, slope)[0]
+
+
+def test_grid_passes_validation(grid):
+    assert grid.validation['passed']
+    assert grid.validation['answered'] > 0
+    assert grid.validation['max_log_error'] <= grid.error_bound
+
+
+def test_grid_matches_live_recommend(client, backend, grid, monkeypatch):
+    rng = np.random.default_rng(1)
+    farms = [{
+        "district": str(rng.choice(grid.districts)), "season": str(rng.choice(grid.seasons)),
+        "area": float(rng.uniform(AREA_AXIS[0], AREA_AXIS[-1])),
+        "rainfall": float(rng.uniform(RAINFALL_AXIS[0], RAINFALL_AXIS[-1])),
+        "budget": str(rng.choice(['Low', 'Medium', 'High'])), "slope": str(rng.choice(['Flat', 'Gentle', 'Steep']))
+    } for _ in range(150)]
+
+    monkeypatch.setattr(backend, 'recommend_grid', grid)
+    grid.reset_stats()
+    for farm in farms:
+        served = client.post('/recommend', json=farm).get_json()
+        live = as_json(reference.recommend(farm))
+        assert [c['crop'] for c in served['recommendations']] == [c['crop'] for c in live['recommendations']]
+        for got, expected in zip(served['recommendations'], live['recommendations']):
+            assert np.log1p(got['production']) == pytest.approx(np.log1p(expected['production']),
+                                                                abs=grid.error_bound)
+            assert got['cost'] == expected['cost']
+    answered = grid.stats['lookups'] - grid.stats['uncertain'] - grid.stats['close_ranks']
+    assert answered > 0
+
+
+def test_failed_validation_is_not_installed(backend, grid, tmp_path):
+    failed = RecommendationGrid(grid.log_production, grid.districts, grid.seasons, grid.crops, RAINFALL_AXIS,
+                                AREA_AXIS, grid.fingerprint, grid.rainfall_flat, grid.area_flat,
+                                validation={**grid.validation, 'passed': False})
+    save_grid(tmp_path / 'grid.npz', failed)
+    assert backend.load_recommend_grid(str(tmp_path / 'grid.npz')) is None
+
+
+def test_cells_with_a_split_fall_back_to_live(backend, grid):
+    # Marking every cell as step-free makes the grid answer everywhere, and then it is wrong
+    loose = RecommendationGrid(grid.log_production, grid.districts, grid.seasons, grid.crops, RAINFALL_AXIS,
+                               AREA_AXIS, grid.fingerprint, np.ones_like(grid.rainfall_flat),
+                               np.ones_like(grid.area_flat))
+    active = backend.registry.active
+    report = validate_grid(loose, active.model, active.feature_builder, active.crop_table['base_cost'], 300,
+                           candidates=lambda area, rng: request_candidates(backend, area, rng))
+    assert not report['passed']
+    assert grid.validation['max_log_error'] < report['max_log_error']
+
+
+def test_close_ranks_fall_back_to_live(grid):
+    saved = grid.log_production.copy(), grid.rainfall_flat.copy(), grid.area_flat.copy()
+    grid.rainfall_flat[:] = True
+    grid.area_flat[:] = True
+    # Same value for two crops: their order can't be trusted
+    grid.log_production[0, 0, :, :, 1] = grid.log_production[0, 0, :, :, 0]
+    try:
+        assert grid.lookup(grid.districts[0], grid.seasons[0], 3.0, 2050.0, np.array([0, 1])) is None
+        assert grid.lookup(grid.districts[0], grid.seasons[0], 3.0, 2050.0, np.array([0])) is not None
+    finally:
+        grid.log_production, grid.rainfall_flat, grid.area_flat = saved
+
+
+def test_stats_are_exact_under_concurrent_lookups(grid):
+    grid.reset_stats()
+    district, season = grid.districts[0], grid.seasons[0]
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(2000):
+            if grid.covers(district, season, 3.0, 2050.0):
+                grid.lookup(district, season, 3.0, 2050.0)
+            grid.covers(district, season, 3.0, 99999.0)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = grid.snapshot()
+    assert stats['lookups'] == stats['out_of_grid'] == 16000
+    assert stats['uncertain'] + stats['close_ranks'] <= 16000
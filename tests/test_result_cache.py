@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import reference
+from result_cache import ResultCache
+
+FARMS = reference.sample_farms(60)
+
+
+def as_json(value):
+    # Compare through the same float serialization the responses use
+    return json.loads(json.dumps(value, default=float))
+
+
+@pytest.fixture
+def fresh_caches(backend, monkeypatch):
+    for name in ('predict_cache', 'recommend_cache'):
+        monkeypatch.setattr(backend, name, ResultCache(name, version_fn=backend.active_model_version))
+    return backend
+
+
+def test_predict_matches_baseline_with_cache(client, fresh_caches):
+    for farm in FARMS:
+        expected = as_json(reference.predict(farm))
+        # First call fills the cache, second is served from it
+        assert client.post('/predict', json=farm).get_json() == expected
+        assert client.post('/predict', json=farm).get_json() == expected
+    assert fresh_caches.predict_cache.snapshot()['hits'] == len(FARMS)
+
+
+def test_recommend_matches_baseline_with_cache(client, fresh_caches, monkeypatch):
+    monkeypatch.setattr(fresh_caches, 'recommend_grid', None)  # live scoring only
+    for farm in FARMS:
+        expected = as_json(reference.recommend(farm))
+        assert client.post('/recommend', json=farm).get_json() == expected
+        assert client.post('/recommend', json=farm).get_json() == expected
+
+
+def test_buckets_only_change_the_key(client, backend, monkeypatch):
+    # With bucketing on, a nearby input may hit, but a miss is computed from the raw inputs
+    cache = ResultCache('predict', area_bucket=0.5, rainfall_bucket=10, version_fn=backend.active_model_version)
+    monkeypatch.setattr(backend, 'predict_cache', cache)
+    farm = FARMS[0]
+    assert client.post('/predict', json=farm).get_json() == as_json(reference.predict(farm))
+    assert cache.snapshot()['misses'] == 1
@@ -0,0 +1,44 @@
+import signal
+import threading
+
+import pytest
+
+import serve
+
+
+class FakeWorker:
+    def __init__(self):
+        self.exited = threading.Event()
+
+    def handle_exit(self, signum, frame):
+        self.exited.set()
+
+
+@pytest.fixture
+def sigterm_restored(backend):
+    previous = signal.getsignal(signal.SIGTERM)
+    yield
+    signal.signal(signal.SIGTERM, previous)
+    backend.draining.clear()
+
+
+def test_gunicorn_sigterm_fails_ready_before_worker_exits(backend, client, sigterm_restored, monkeypatch):
+    monkeypatch.setattr(serve, 'DRAIN_DELAY', 0.2)
+    options = serve.gunicorn_options(backend)
+    worker = FakeWorker()
+    signal.signal(signal.SIGTERM, worker.handle_exit)  # what gunicorn's init_signals installs
+    assert client.get('/ready').status_code == 200
+
+    options['post_worker_init'](worker)
+    signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['reason'] == 'draining'
+    assert not worker.exited.is_set()
+    assert worker.exited.wait(5)
+
+
+def test_gunicorn_worker_int_fails_ready(backend, client, sigterm_restored):
+    serve.gunicorn_options(backend)['worker_int'](FakeWorker())
+    assert client.get('/ready').status_code == 503
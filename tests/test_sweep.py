@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+SWEEP = {"district": "EAST KHASI HILLS", "season": "Kharif", "crop": "Rice",
+         "rainfall": [1500, 2400, 3100], "area": {"min": 1, "max": 10, "steps": 4}}
+
+
+def single_predictions(client, sweep, cost_per_hectare=None):
+    grid = []
+    for rainfall in sweep["rainfall"]:
+        row = []
+        for area in sweep["area"]:
+            farm = {key: sweep[key] for key in ("district", "season", "crop")}
+            farm.update(area=area, rainfall=rainfall)
+            if cost_per_hectare is not None:
+                farm["cost"] = area * cost_per_hectare
+            row.append(client.post('/predict', json=farm).get_json()["production"])
+        grid.append(row)
+    return grid
+
+
+@pytest.mark.parametrize('cost_per_hectare', [None, 40000])
+def test_sweep_matches_predict(client, cost_per_hectare):
+    body = {**SWEEP, "cost_per_hectare": cost_per_hectare}
+    response = client.post('/sweep', json=body)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["shape"] == [3, 4]
+    assert data["area"] == [1, 4, 7, 10]
+    assert data["production"] == [pytest.approx(row, abs=1e-3)
+                                  for row in single_predictions(client, data, cost_per_hectare)]
+
+
+def test_streamed_sweep_matches_the_plain_response(client):
+    plain = client.post('/sweep', json=SWEEP).get_json()
+    response = client.post('/sweep', json={**SWEEP, "stream": True, "block_rows": 2})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    header, blocks = lines[0], lines[1:]
+    assert header == {key: value for key, value in plain.items() if key != "production"}
+    assert [block["row"] for block in blocks] == [0, 2]
+    assert [row for block in blocks for row in block["production"]] == plain["production"]
+
+
+@pytest.mark.parametrize('stream', [False, True])
+@pytest.mark.parametrize('value', ["nan", "inf", "-inf", "1e999"])
+def test_non_finite_cost_per_hectare_is_rejected(client, stream, value):
+    response = client.post('/sweep', json={**SWEEP, "cost_per_hectare": value, "stream": stream})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "cost_per_hectare must be finite"}
+
+
+@pytest.mark.parametrize('axis, spec', [("rainfall", [1500, "nan"]), ("area", {"min": 1, "max": "inf"}),
+                                        ("area", [-1, 2])])
+def test_bad_axes_are_rejected(client, axis, spec):
+    response = client.post('/sweep', json={**SWEEP, axis: spec})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,77 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+WORKSPACE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training_workspace')
+sys.path.insert(0, WORKSPACE)
+from train_improved_model import fit_fast_model, save_artifacts  # noqa: E402
+
+from fast_model import FlatTreeEnsemble, RoutedEnsemble  # noqa: E402
+from model_bundle import load_bundle  # noqa: E402
+
+SMALL_GRID = {'learning_rate': [0.2], 'max_leaf_nodes': [15, 31], 'max_depth': [4, None]}
+
+
+@pytest.fixture(scope='module')
+def fast_model():
+    # Fast mode end to end on a small grid: 4 candidates x 2 folds over a process pool
+    df = pd.read_csv(os.path.join(WORKSPACE, 'final_training_data_with_cost.csv'))
+    model, encoders, report = fit_fast_model(df, folds=2, jobs=2, compare=False, grid=SMALL_GRID)
+    return model, encoders, report, df
+
+
+def test_fast_mode_smoke(fast_model):
+    model, encoders, report, df = fast_model
+    assert len(report['candidates']) == 4
+    assert report['best_params'] == report['candidates'][0]['params']
+    assert all(np.isfinite(c['cv_r2']) and c['n_iter'] >= 1 for c in report['candidates'])
+    assert report['models'][0]['r2'] > 0.5
+    assert set(encoders) == {'district', 'season', 'crop', 'scaler'}
+
+
+def hgb_rows(model, df, encoders):
+    X = np.column_stack([
+        encoders['district'].transform(df['District_Name']),
+        encoders['season'].transform(df['Season']),
+        encoders['crop'].transform(df['Crop']),
+        encoders['scaler'].transform(df[['Area', 'Rainfall', 'Cost']].to_numpy())
+    ])
+    rng = np.random.default_rng(0)
+    extra = X[rng.choice(len(X), 300)]
+    extra[:50, 0] = len(encoders['district'].classes_) + 3  # unseen categories
+    extra[50:100, 2] = 200
+    extra[100:150, 1] = np.nan  # missing categorical
+    extra[150:200, 4] = np.nan  # missing numeric
+    extra[200:250, 3:] = np.nan
+    extra[250:275, 5] = np.inf
+    extra[275:, 5] = -np.inf
+    return np.vstack([X, extra])
+
+
+def test_hist_gradient_boosting_flat_parity(fast_model):
+    model, encoders, _, df = fast_model
+    X = hgb_rows(model, df, encoders)
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    assert flat.missing_left is not None
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-12, atol=1e-12)
+
+
+def test_hist_gradient_boosting_bundle_round_trip(fast_model, tmp_path):
+    model, encoders, _, df = fast_model
+    rainfall = pd.read_csv('rainfall_monthly_averages.csv')
+    save_artifacts(model, encoders, rainfall, str(tmp_path), bulletins=())
+    bundle = load_bundle(str(tmp_path / 'model_bundle'))
+    assert bundle.verify() == []
+    assert isinstance(bundle.model, RoutedEnsemble)
+    with open(tmp_path / 'agriculture_model_improved.pkl', 'rb') as f:
+        assert pickle.load(f).n_iter_ == model.n_iter_
+
+    X = hgb_rows(model, df, encoders)
+    expected = model.predict(X)
+    np.testing.assert_allclose(bundle.model.predict(X[:96]), expected[:96], rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(bundle.model.flat.predict(X), expected, rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(bundle.model.predict(X), expected)  # large batch: the estimator itself
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+WORKSPACE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training_workspace')
+sys.path.insert(0, WORKSPACE)
+import train_improved_model  # noqa: E402
+from train_improved_model import update_improved_model  # noqa: E402
+
+HISTORY = os.path.join(WORKSPACE, 'final_training_data_with_cost.csv')
+
+
+@pytest.fixture
+def update_dirs(tmp_path, monkeypatch):
+    # A copy of the committed model to update, and 100 past rows posing as new ones
+    def make(seed=1):
+        base = tmp_path / 'base'
+        base.mkdir()
+        for name in ['agriculture_model_improved.pkl', 'label_encoders_improved.pkl']:
+            shutil.copy(name, base / name)
+        new_rows = tmp_path / 'new_rows.csv'
+        pd.read_csv(HISTORY).sample(100, random_state=seed).to_csv(new_rows, index=False)
+        output = tmp_path / 'out'
+        output.mkdir()
+        monkeypatch.chdir(WORKSPACE)  # default history and rainfall CSVs
+        return str(new_rows), str(base), output
+    return make
+
+
+def lineage(output):
+    with open(output / 'model_bundle' / 'manifest.json') as f:
+        return json.load(f)['lineage'][-1]
+
+
+def test_update_that_hurts_past_rows_is_not_saved(update_dirs):
+    new_rows, base, output = update_dirs()
+    assert update_improved_model(new_rows, base, str(output)) is None
+    assert os.listdir(output) == []
+
+
+def test_force_saves_and_records_both_historical_scores(update_dirs):
+    new_rows, base, output = update_dirs()
+    assert update_improved_model(new_rows, base, str(output), force=True) is not None
+    entry = lineage(output)
+    assert entry['forced'] is True
+    assert entry['historical_rows'] == train_improved_model.HOLDOUT_ROWS
+    assert train_improved_model.historical_worsening(entry) > train_improved_model.MAX_HISTORICAL_WORSENING
+    assert entry['historical_r2_after'] < entry['historical_r2_before']
+
+
+def test_update_with_replay_passes_the_gate(update_dirs):
+    new_rows, base, output = update_dirs(seed=2)
+    assert update_improved_model(new_rows, base, str(output), history_path=HISTORY) is not None
+    entry = lineage(output)
+    assert 'forced' not in entry
+    assert train_improved_model.historical_worsening(entry) <= train_improved_model.MAX_HISTORICAL_WORSENING
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+import fake_open_meteo
+import weather
+from weather import CircuitBreaker, ForecastCache
+
+LAT, LON = 25.57, 91.88
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    server = fake_open_meteo.start_server()
+    monkeypatch.setattr(weather, 'OPEN_METEO_URL', server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for_refresh(cache, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while cache.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not cache.in_flight
+
+
+def test_entries_expire_after_ttl(upstream):
+    cache = ForecastCache(weather.fetch_open_meteo, ttl=0.2, stale_ttl=0)
+    first = cache.get(LAT, LON)
+    assert first["daily"]["precipitation_sum"]
+    assert cache.get(LAT, LON) == first
+    assert upstream.request_count == 1
+
+    time.sleep(0.25)
+    assert cache.get(LAT, LON) == first  # refetched; the stub is deterministic
+    assert upstream.request_count == 2
+    stats = cache.snapshot()
+    assert (stats['hits'], stats['misses'], stats['stale_hits']) == (1, 2, 0)
+
+
+def test_stale_entry_is_served_while_it_refreshes(upstream):
+    cache = ForecastCache(weather.fetch_open_meteo, ttl=0.1, stale_ttl=60)
+    first = cache.get(LAT, LON)
+    fetched_at = cache.entries[cache.key(LAT, LON)][0]
+    time.sleep(0.15)
+
+    upstream.config['latency'] = 0.3
+    start = time.perf_counter()
+    assert cache.get(LAT, LON) == first
+    assert time.perf_counter() - start < 0.1  # did not wait for the upstream
+    assert cache.key(LAT, LON) in cache.in_flight
+    assert cache.get(LAT, LON) == first  # still stale, still served; no second refresh
+    assert cache.stats['stale_hits'] == 2
+
+    wait_for_refresh(cache)
+    assert upstream.request_count == 2
+    assert cache.entries[cache.key(LAT, LON)][0] > fetched_at
+    assert cache.get(LAT, LON) == first
+    assert cache.stats['hits'] == 1
+
+
+def test_concurrent_misses_share_one_upstream_fetch(upstream):
+    upstream.config['latency'] = 0.2
+    cache = ForecastCache(weather.fetch_open_meteo)
+    barrier = threading.Barrier(50)
+    results = [None] * 50
+
+    def worker(i):
+        barrier.wait()
+        # Different points in the same 0.1 degree cell
+        results[i] = cache.get(LAT + (i % 5) * 0.005, LON - (i % 3) * 0.005)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.request_count == 1
+    assert results[0] is not None and all(result == results[0] for result in results)
+    stats = cache.snapshot()
+    assert (stats['misses'], stats['coalesced']) == (1, 49)
+
+
+def test_breaker_opens_falls_back_and_recovers(upstream, client, backend, monkeypatch):
+    upstream.config['error_rate'] = 1.0
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=0.3)
+    cache = ForecastCache(weather.fetch_open_meteo, breaker=breaker)
+    monkeypatch.setattr(backend, 'forecast_cache', cache)
+
+    # Distinct cells, so every call is a miss that reaches the upstream
+    for i in range(3):
+        assert breaker.state == 'closed'
+        assert cache.get(LAT + i, LON) is None
+    assert upstream.request_count == 3
+    assert breaker.snapshot()['state'] == 'open' and breaker.trips == 1
+
+    # Open: /advisory degrades to climatology without calling the upstream
+    response = client.post('/advisory', json={"lat": LAT, "lon": LON, "crop": "Rice"})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["degraded"] and data["source"] == "climatology" and data["district"] == "EAST KHASI HILLS"
+    assert len(data["forecast"]) == 7
+    assert upstream.request_count == 3
+    assert cache.stats['short_circuited'] == 1
+
+    # Half open after the cooldown: one probe goes through; a failure opens the breaker again
+    time.sleep(0.35)
+    assert cache.get(LAT, LON) is None
+    assert upstream.request_count == 4
+    assert breaker.state == 'open' and breaker.trips == 2
+
+    # Upstream recovers: the next probe runs alone while the breaker is half open
+    upstream.config.update(error_rate=0.0, latency=0.2)
+    time.sleep(0.35)
+    probe = threading.Thread(target=cache.get, args=(LAT, LON))
+    probe.start()
+    time.sleep(0.05)
+    assert breaker.state == 'half_open'
+    assert cache.get(LAT + 5, LON) is None  # rejected without an upstream call
+    probe.join()
+    assert upstream.request_count == 5
+    assert breaker.snapshot()['state'] == 'closed' and breaker.failures == 0
+
+    # Closed again: live forecasts are served
+    response = client.post('/advisory', json={"lat": LAT, "lon": LON, "crop": "Rice"})
+    assert response.get_json()["degraded"] is False
+    assert upstream.request_count == 5  # the probe's forecast is cached
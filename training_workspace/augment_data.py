@@ -1,55 +1,21 @@
+import os
+import sys
 import pandas as pd
-import numpy as np
 
-def augment_data():
-    df = pd.read_csv('final_training_data.csv')
-    
-    # Approximate Cost of Cultivation per Hectare (in INR)
-    # These are estimates for demonstration purposes
-    cost_map = {
-        'Rice': 40000,
-        'Banana': 100000,
-        'Maize': 30000,
-        'Linseed': 20000,
-        'Cowpea(Lobia)': 25000,
-        'Peas & beans (Pulses)': 35000,
-        'Rapeseed &Mustard': 25000,
-        'Sugarcane': 80000,
-        'Tobacco': 50000,
-        'Wheat': 35000,
-        'Jute': 45000,
-        'Mesta': 20000,
-        'Potato': 60000,
-        'Turmeric': 70000,
-        'Ginger': 80000,
-        'Arecanut': 90000,
-        'Black pepper': 100000,
-        'Cashewnut': 50000,
-        'Tapioca': 40000
-    }
-    
-    # Function to get base cost
-    def get_cost(crop):
-        # Fuzzy match or default
-        for key in cost_map:
-            if key.lower() in str(crop).lower():
-                return cost_map[key]
-        return 30000 # Default
-    
-    # Calculate Cost
+# Serving-side modules (cost_model) live in the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cost_model import CostModel
+
+def add_cost(df):
+    # Calculate Cost with the same per-hectare cost model the app serves with
     # Cost = Area * Base_Cost * Variance (0.9 to 1.1)
-    # This simulates real-world variance
-    np.random.seed(42)
-    
-    costs = []
-    for index, row in df.iterrows():
-        base = get_cost(row['Crop'])
-        area = row['Area']
-        variance = np.random.uniform(0.9, 1.1)
-        total_cost = area * base * variance
-        costs.append(total_cost)
-        
-    df['Cost'] = costs
+    # This simulates real-world variance (seeded, so the dataset is reproducible)
+    cost_model = CostModel(df['Crop'].unique())
+    df['Cost'] = cost_model.with_variance(df['Crop'].to_numpy(), df['Area'].to_numpy())
+    return df
+
+def augment_data():
+    df = add_cost(pd.read_csv('final_training_data.csv'))
     
     print("Added Cost column.")
     print(df[['Crop', 'Area', 'Cost']].head())
@@ -0,0 +1,108 @@
+"""Typed columnar tables for pipeline intermediates.
+
+A table is a directory with one .npy file per column plus schema.json:
+
+    <table>/
+        schema.json     row count, column order, per-column kind/dtype/categories
+        <i>.npy         column i: codes for categoricals, values otherwise
+
+Column types are chosen on write:
+    strings         categorical: smallest int codes + a categories list
+    floats          float32 when that round-trips exactly, else float64
+    ints / bools    smallest integer dtype that holds the range / bool
+
+so reading a column back gives exactly the values that were written, and
+read_table(path, columns=[...]) only touches the requested columns' files.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = 'schema.json'
+
+
+def _smallest_int(values):
+    if len(values) == 0:
+        return np.int8
+    lo, hi = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+def _encode(series):
+    """(array, schema entry) for one column."""
+    values = series.to_numpy()
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object or pd.api.types.is_string_dtype(series):
+        categorical = pd.Categorical(series)
+        categories = [str(c) for c in categorical.categories]
+        codes = categorical.codes
+        return codes.astype(_smallest_int(codes)), {"kind": "categorical", "categories": categories}
+    if pd.api.types.is_bool_dtype(series):
+        return values.astype(bool), {"kind": "bool"}
+    if pd.api.types.is_integer_dtype(series):
+        return values.astype(_smallest_int(values)), {"kind": "int"}
+    if pd.api.types.is_float_dtype(series):
+        values = values.astype(np.float64)
+        narrow = values.astype(np.float32)
+        lossless = np.array_equal(narrow.astype(np.float64), values, equal_nan=True)
+        return (narrow if lossless else values), {"kind": "float"}
+    raise TypeError(f"Unsupported column type {series.dtype} for {series.name}")
+
+
+def write_table(path, df):
+    """Write df as a columnar table directory (replacing any previous one atomically)."""
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        array, entry = _encode(df[name])
+        np.save(os.path.join(tmp_path, f'{i}.npy'), np.ascontiguousarray(array))
+        columns.append({"name": str(name), "file": f'{i}.npy', "dtype": str(array.dtype), **entry})
+
+    with open(os.path.join(tmp_path, SCHEMA), 'w') as f:
+        json.dump({"rows": len(df), "columns": columns}, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA)) as f:
+        return json.load(f)
+
+
+def read_table(path, columns=None, categorical=True):
+    """Load a table; `columns` prunes to (and orders by) the given names.
+
+    Categorical columns come back as pandas categoricals, or as plain object
+    strings with categorical=False.
+    """
+    schema = read_schema(path)
+    by_name = {c['name']: c for c in schema['columns']}
+    names = columns if columns is not None else [c['name'] for c in schema['columns']]
+    missing = [n for n in names if n not in by_name]
+    if missing:
+        raise KeyError(f"{path} has no column(s) {', '.join(missing)}")
+
+    data = {}
+    for name in names:
+        entry = by_name[name]
+        array = np.load(os.path.join(path, entry['file']), allow_pickle=False)
+        if entry['kind'] == 'categorical':
+            values = pd.Categorical.from_codes(array.astype(np.int64), entry['categories'])
+            data[name] = values if categorical else np.asarray(values, dtype=object)
+        else:
+            data[name] = array
+    return pd.DataFrame(data, columns=names)
+
+
+def table_nbytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
@@ -1,10 +1,6 @@
 import pandas as pd
 
-def merge_datasets():
-    # Load datasets
-    crops = pd.read_csv('meghalaya_matched_entries.csv')
-    rainfall = pd.read_csv('rainfall_historical.csv')
-
+def merge_crops_rainfall(crops, rainfall):
     print("Crops shape:", crops.shape)
     print("Rainfall shape:", rainfall.shape)
 
@@ -39,7 +35,15 @@ def merge_datasets():
         print("Rainfall Years:", rainfall['Year'].unique())
         print("Crop Districts:", crops['District_Name'].unique())
         print("Rainfall Districts:", rainfall['District'].unique())
-    else:
+    return merged
+
+def merge_datasets():
+    # Load datasets
+    crops = pd.read_csv('meghalaya_matched_entries.csv')
+    rainfall = pd.read_csv('rainfall_historical.csv')
+
+    merged = merge_crops_rainfall(crops, rainfall)
+    if not merged.empty:
         merged.to_csv('final_training_data.csv', index=False)
         print("Saved to final_training_data.csv")
         print(merged.head())
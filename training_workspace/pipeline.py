@@ -0,0 +1,279 @@
+"""Incremental training pipeline.
+
+Runs the training scripts as one DAG of stages:
+
+    match_crops   crop_production.csv + file2.csv -> matched        (process_csv.py, streamed)
+    rainfall      rainfall_raw.txt -> rainfall_totals, rainfall_monthly   (process_rainfall.py)
+    merge         matched + rainfall_totals -> merged              (merge_data.py)
+    augment       merged -> training_data                          (augment_data.py)
+    train         training_data + rainfall_monthly (+ rainfall_raw.txt for the bundle's per-year cube)
+                  -> model pickles + bundle                    (train_improved_model.py)
+
+Every stage has a key: a hash of its source files, its code, and the
+content hashes of the upstream tables (and columns) it reads. A stage whose
+key matches its last run is skipped, so e.g. a rainfall-only update re-runs
+rainfall/merge/augment/train but not the crop matching; if a re-run stage
+produces identical output, its consumers are skipped too.
+
+Intermediates are typed columnar tables (columnar.py) under .pipeline/,
+keeping only the columns some downstream stage reads.
+
+    python pipeline.py                    # run what changed
+    python pipeline.py --dry-run          # show what would run
+    python pipeline.py --force rainfall   # re-run a stage (and whatever its output changes)
+    python pipeline.py --artifacts ..     # write the model next to app.py
+
+When the raw crop CSVs are not present, match_crops starts from the
+committed meghalaya_matched_entries.csv instead.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from columnar import read_table, table_nbytes, write_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '.pipeline')
+
+RAW_CROP_SOURCES = ['crop_production.csv', 'file2.csv']
+MATCHED_CSV = 'meghalaya_matched_entries.csv'
+
+TRAINING_COLUMNS = ['District_Name', 'Season', 'Crop', 'Area', 'Rainfall', 'Cost', 'Production']
+# What the train stage leaves in --artifacts; it re-runs if any of these goes missing
+ARTIFACT_FILES = ['agriculture_model_improved.pkl', 'label_encoders_improved.pkl',
+                  os.path.join('model_bundle', 'manifest.json')]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_hash(path):
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        digest.update(name.encode())
+        digest.update(file_hash(os.path.join(path, name)).encode())
+    return digest.hexdigest()
+
+
+# Stage bodies: plain DataFrames in, DataFrames out (the scripts' own functions do the work)
+
+def run_match_crops(sources, states=('Meghalaya',)):
+    if [os.path.basename(s) for s in sources] == [MATCHED_CSV]:
+        return {'matched': pd.read_csv(sources[0])}
+    from process_csv import stream_match_entries
+    return {'matched': stream_match_entries(sources[0], sources[1], states)}
+
+
+def run_rainfall(sources):
+    from process_rainfall import parse_rainfall_data
+    totals, monthly = parse_rainfall_data(sources[0])
+    return {'rainfall_totals': totals, 'rainfall_monthly': monthly}
+
+
+def run_merge(sources, matched, rainfall_totals):
+    from merge_data import merge_crops_rainfall
+    return {'merged': merge_crops_rainfall(matched, rainfall_totals)}
+
+
+def run_augment(sources, merged):
+    from augment_data import add_cost
+    return {'training_data': add_cost(merged)}
+
+
+def run_train(sources, training_data, rainfall_monthly, artifacts='.', fast=False):
+    from train_improved_model import fit_fast_model, fit_model, save_artifacts
+    # Same dtypes the CSV path trains on, so the model is identical
+    for column in ['Area', 'Rainfall', 'Cost', 'Production']:
+        training_data[column] = training_data[column].astype(np.float64)
+    if fast:
+        model, encoders, _ = fit_fast_model(training_data)
+    else:
+        model, encoders = fit_model(training_data)
+    os.makedirs(artifacts, exist_ok=True)
+    manifest = save_artifacts(model, encoders, rainfall_monthly, artifacts, bulletins=sources)
+    return {'_artifacts': artifact_record(artifacts, manifest['version'])}
+
+
+def artifact_record(artifacts, bundle_version):
+    return {"bundle_version": bundle_version, "output_dir": os.path.abspath(artifacts), "files": ARTIFACT_FILES}
+
+
+def artifacts_present(stats):
+    # Stages that write outside .pipeline/ record where; anything deleted there makes them stale
+    record = stats.get('artifacts')
+    if not record:
+        return True
+    return all(os.path.exists(os.path.join(record['output_dir'], f)) for f in record.get('files', ARTIFACT_FILES))
+
+
+class Stage:
+    def __init__(self, name, run, code, sources=(), inputs=None, outputs=(), params=None):
+        self.name = name
+        self.run = run
+        self.code = list(code)  # files whose contents define the stage's behaviour
+        self.sources = sources  # list of paths, or a callable returning one
+        self.inputs = inputs or {}  # upstream table -> columns read (None = all)
+        self.outputs = list(outputs)
+        self.params = params or {}
+
+    def source_paths(self):
+        sources = self.sources() if callable(self.sources) else self.sources
+        return [os.path.join(HERE, s) for s in sources]
+
+
+def crop_sources():
+    if all(os.path.exists(os.path.join(HERE, s)) for s in RAW_CROP_SOURCES):
+        return RAW_CROP_SOURCES
+    return [MATCHED_CSV]
+
+
+def build_stages(artifacts, states=('Meghalaya',), fast=False):
+    return [
+        Stage('match_crops', run_match_crops, ['process_csv.py'], sources=crop_sources,
+              outputs=['matched'], params={'states': list(states)}),
+        Stage('rainfall', run_rainfall, ['process_rainfall.py', '../rainfall_bulletins.py'],
+              sources=['rainfall_raw.txt'],
+              outputs=['rainfall_totals', 'rainfall_monthly']),
+        Stage('merge', run_merge, ['merge_data.py'],
+              inputs={'matched': ['District_Name', 'Crop_Year', 'Season', 'Crop', 'Area', 'Production'],
+                      'rainfall_totals': ['District', 'Year', 'Rainfall']},
+              outputs=['merged']),
+        Stage('augment', run_augment, ['augment_data.py', '../cost_model.py'],
+              inputs={'merged': ['District_Name', 'Season', 'Crop', 'Area', 'Rainfall', 'Production']},
+              outputs=['training_data']),
+        Stage('train', run_train, ['train_improved_model.py', '../model_bundle.py', '../fast_model.py',
+                                   '../features.py', '../rainfall_bulletins.py'],
+              sources=['rainfall_raw.txt'],
+              inputs={'training_data': TRAINING_COLUMNS, 'rainfall_monthly': None},
+              params={'artifacts': artifacts, 'fast': fast})
+    ]
+
+
+class Pipeline:
+    def __init__(self, stages, cache_dir=CACHE_DIR):
+        self.stages = stages
+        self.cache_dir = cache_dir
+
+    def table_path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def meta_path(self, stage):
+        return os.path.join(self.cache_dir, f'{stage.name}.json')
+
+    def load_meta(self, stage):
+        try:
+            with open(self.meta_path(stage)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def kept_columns(self, output):
+        # Union of the columns consumers read; None keeps everything
+        wanted = set()
+        for stage in self.stages:
+            if output in stage.inputs:
+                if stage.inputs[output] is None:
+                    return None
+                wanted.update(stage.inputs[output])
+        return wanted
+
+    def stage_key(self, stage, output_hashes):
+        digest = hashlib.sha256(stage.name.encode())
+        for path in stage.code:
+            digest.update(file_hash(os.path.join(HERE, path)).encode())
+        for path in stage.source_paths():
+            digest.update(os.path.basename(path).encode())
+            digest.update(file_hash(path).encode())
+        for name, columns in sorted(stage.inputs.items()):
+            digest.update(f"{name}:{columns}:{output_hashes[name]}".encode())
+        digest.update(json.dumps(stage.params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def run(self, force=(), dry_run=False):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        output_hashes = {}
+        report = []
+
+        for stage in self.stages:
+            key = self.stage_key(stage, output_hashes)
+            meta = self.load_meta(stage)
+            fresh = (meta is not None and meta['key'] == key and stage.name not in force and
+                     all(os.path.exists(self.table_path(out)) for out in stage.outputs) and
+                     artifacts_present(meta['stats']))
+            if fresh:
+                output_hashes.update(meta['outputs'])
+                report.append({"stage": stage.name, "status": "skipped", **meta['stats']})
+                continue
+            if dry_run:
+                # Downstream keys can't be known without running; assume they change
+                output_hashes.update({out: f'pending:{key}' for out in stage.outputs})
+                report.append({"stage": stage.name, "status": "would run"})
+                continue
+
+            inputs = {name: read_table(self.table_path(name), columns)
+                      for name, columns in stage.inputs.items()}
+            tracemalloc.start()
+            start = time.perf_counter()
+            results = stage.run(stage.source_paths(), **inputs, **stage.params)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            stats = {"seconds": round(seconds, 3), "peak_mb": round(peak / 1e6, 1), "rows": {}, "bytes": {}}
+            hashes = {}
+            for out in stage.outputs:
+                df = results[out]
+                kept = self.kept_columns(out)
+                if kept is not None:
+                    df = df[[c for c in df.columns if c in kept]]
+                write_table(self.table_path(out), df)
+                hashes[out] = table_hash(self.table_path(out))
+                stats['rows'][out] = len(df)
+                stats['bytes'][out] = table_nbytes(self.table_path(out))
+            if '_artifacts' in results:
+                stats['artifacts'] = results['_artifacts']
+
+            with open(self.meta_path(stage), 'w') as f:
+                json.dump({"key": key, "outputs": hashes, "stats": stats}, f, indent=2)
+            output_hashes.update(hashes)
+            changed = meta is None or meta.get('outputs') != hashes
+            report.append({"stage": stage.name, "status": "ran" if changed else "ran (output unchanged)",
+                           **stats})
+        return report
+
+
+def print_report(report):
+    print(f"\n{'stage':12s} {'status':24s} {'seconds':>8s} {'peak MB':>8s}  outputs")
+    for r in report:
+        outputs = ', '.join(f"{name} {rows} rows/{r['bytes'][name] / 1e3:.0f} kB" for name, rows in r.get('rows', {}).items())
+        seconds = f"{r['seconds']:.3f}" if 'seconds' in r else '-'
+        peak = f"{r['peak_mb']:.1f}" if 'peak_mb' in r else '-'
+        print(f"{r['stage']:12s} {r['status']:24s} {seconds:>8s} {peak:>8s}  {outputs}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the training pipeline incrementally")
+    parser.add_argument('--artifacts', default='.', help="Where the train stage writes the model (default: here)")
+    parser.add_argument('--states', nargs='+', default=['Meghalaya'],
+                        help="States match_crops keeps from the raw national files")
+    parser.add_argument('--fast', action='store_true', help="Train with train_improved_model.py's --fast mode")
+    parser.add_argument('--force', action='append', default=[], help="Re-run this stage even if unchanged")
+    parser.add_argument('--dry-run', action='store_true', help="Only show which stages would run")
+    args = parser.parse_args()
+
+    os.chdir(HERE)
+    started = time.perf_counter()
+    report = Pipeline(build_stages(args.artifacts, args.states, args.fast)).run(force=set(args.force), dry_run=args.dry_run)
+    print_report(report)
+    print(f"Total {time.perf_counter() - started:.2f}s")
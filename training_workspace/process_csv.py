@@ -1,11 +1,10 @@
-import pandas as pd
+import argparse
 import os
 
-def process_data():
-    # Load data
-    df1 = pd.read_csv('crop_production.csv')
-    df2 = pd.read_csv('file2.csv')
+import numpy as np
+import pandas as pd
 
+def match_entries(df1, df2):
     # Normalize column names for easier processing
     # df1: State_Name, District_Name, Crop_Year, Season, Crop, Area, Production
     # df2: State, District, Crop, Year, Season, Area, Area Units, Production, Production Units, Yield
@@ -60,13 +59,115 @@ def process_data():
     )
 
     print("Merged shape:", merged.shape)
+    return merged
+
+# Streaming ingest: both national files are read in chunks, filtered to the
+# wanted states while reading, and joined on one 64-bit hash of the seven
+# normalized key columns instead of a seven-column merge. Memory is bounded by
+# the chunk size plus the (small) filtered rows of the requested states.
+CHUNK_ROWS = int(os.environ.get('INGEST_CHUNK_ROWS', 200_000))
+
+CROP_COLUMNS = ['State_Name', 'District_Name', 'Crop_Year', 'Season', 'Crop', 'Area', 'Production']
+CROP_DTYPES = {'State_Name': str, 'District_Name': str, 'Season': str, 'Crop': str,
+               'Area': 'float64', 'Production': 'float64'}
+FILE2_COLUMNS = ['State', 'District', 'Crop', 'Year', 'Season', 'Area', 'Production']
+FILE2_DTYPES = {'State': str, 'District': str, 'Crop': str, 'Year': str, 'Season': str,
+                'Area': 'float64', 'Production': 'float64'}
+
+
+def state_mask(series, states):
+    # Same test as match_entries (case-insensitive substring), for any of the states
+    mask = pd.Series(False, index=series.index)
+    for state in states:
+        mask |= series.str.contains(state, case=False, na=False, regex=False)
+    return mask
+
+
+def iter_state_rows(path, columns, dtypes, state_column, states, chunksize=CHUNK_ROWS):
+    """Yield only the rows of the given states, CHUNK_ROWS at a time, reading just `columns`."""
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        chunk = chunk[state_mask(chunk[state_column], states)]
+        if len(chunk):
+            yield chunk
+
+
+def key_hashes(state, district, year, season, crop, area, production):
+    """One uint64 per row over the normalized composite key."""
+    keys = pd.DataFrame({
+        'state': state.str.strip().to_numpy(), 'district': district.str.strip().to_numpy(),
+        'year': year.to_numpy(dtype='int64'), 'season': season.str.strip().to_numpy(),
+        'crop': crop.str.strip().to_numpy(),
+        # + 0.0 folds -0.0 into 0.0, which the merge treats as equal
+        'area': area.to_numpy() + 0.0, 'production': production.to_numpy() + 0.0,
+    })
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def stream_match_entries(crop_path, file2_path, states=('Meghalaya',), chunksize=CHUNK_ROWS):
+    """match_entries() for the national files without loading either one.
+
+    Returns the crop_production.csv columns (normalized the same way) of every
+    row that has an exact match in file2.csv, in file order, repeated once per
+    matching file2 row like the inner merge.
+    """
+    # Build side: file2 rows of the wanted states -> count per key hash
+    counts = {}
+    file2_rows = 0
+    for chunk in iter_state_rows(file2_path, FILE2_COLUMNS, FILE2_DTYPES, 'State', states, chunksize):
+        year = chunk['Year'].str.split('-').str[0].astype(int)
+        hashes = key_hashes(chunk['State'], chunk['District'], year, chunk['Season'], chunk['Crop'],
+                            chunk['Area'], chunk['Production'])
+        for h, n in zip(*np.unique(hashes, return_counts=True)):
+            counts[h] = counts.get(h, 0) + int(n)
+        file2_rows += len(chunk)
+    print(f"{', '.join(states)} rows in {file2_path}: {file2_rows} ({len(counts)} distinct keys)")
+    if not counts:
+        return pd.DataFrame(columns=CROP_COLUMNS)
+    keys = np.array(sorted(counts), dtype=np.uint64)
+    key_counts = np.array([counts[k] for k in keys], dtype=np.int64)
+
+    # Probe side: stream crop_production rows, keep those whose key hash matched
+    matched = []
+    crop_rows = 0
+    for chunk in iter_state_rows(crop_path, CROP_COLUMNS, CROP_DTYPES, 'State_Name', states, chunksize):
+        chunk = chunk.assign(Crop_Year=chunk['Crop_Year'].astype(int))
+        for col in ['State_Name', 'District_Name', 'Season', 'Crop']:
+            chunk[col] = chunk[col].str.strip()
+        hashes = key_hashes(chunk['State_Name'], chunk['District_Name'], chunk['Crop_Year'],
+                            chunk['Season'], chunk['Crop'], chunk['Area'], chunk['Production'])
+        slot = np.minimum(np.searchsorted(keys, hashes), len(keys) - 1)
+        repeats = np.where(keys[slot] == hashes, key_counts[slot], 0)
+        if repeats.any():
+            matched.append(chunk.iloc[np.repeat(np.arange(len(chunk)), repeats)])
+        crop_rows += len(chunk)
+    print(f"{', '.join(states)} rows in {crop_path}: {crop_rows}")
+
+    merged = pd.concat(matched, ignore_index=True) if matched else pd.DataFrame(columns=CROP_COLUMNS)
+    print("Matched shape:", merged.shape)
+    return merged
+
+
+def process_data(stream=False, states=('Meghalaya',), output='meghalaya_matched_entries.csv'):
+    if stream:
+        merged = stream_match_entries('crop_production.csv', 'file2.csv', states)
+    else:
+        # Load data
+        df1 = pd.read_csv('crop_production.csv')
+        df2 = pd.read_csv('file2.csv')
+
+        merged = match_entries(df1, df2)
 
     # Save output
     if not merged.empty:
-        merged.to_csv('meghalaya_matched_entries.csv', index=False)
-        print("Successfully saved to meghalaya_matched_entries.csv")
+        merged.to_csv(output, index=False)
+        print(f"Successfully saved to {output}")
     else:
         print("No matching entries found.")
 
 if __name__ == "__main__":
-    process_data()
+    parser = argparse.ArgumentParser(description="Match Meghalaya entries between crop_production.csv and file2.csv")
+    parser.add_argument('--stream', action='store_true', help="Chunked, bounded-memory ingest")
+    parser.add_argument('--states', nargs='+', default=['Meghalaya'], help="States to keep (with --stream)")
+    parser.add_argument('--output', default='meghalaya_matched_entries.csv')
+    args = parser.parse_args()
+    process_data(args.stream, args.states, args.output)
@@ -1,86 +1,160 @@
-import re
+"""Parse the district rainfall bulletins (rainfall_raw.txt and friends).
+
+iter_records() (shared with serving, in ../rainfall_bulletins.py) streams
+one record per station row from a bulletin file. For incremental
+updates, per-(district, year) sums and station counts are kept in an
+aggregate store (rainfall_store.json) keyed by source file, so adding a
+new year's bulletin only parses that file:
+
+    python process_rainfall.py                        # rainfall_raw.txt
+    python process_rainfall.py bulletin_2024.txt      # add/refresh one file
+    python process_rainfall.py 20*.txt --jobs 4       # parse many files in parallel
+    python process_rainfall.py --rebuild              # drop the store and reparse
+
+Files whose contents haven't changed since they were stored are skipped;
+a changed file replaces its earlier contribution. rainfall_historical.csv
+and rainfall_monthly_averages.csv are then written from the store.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
+# The bulletin parser is shared with serving and lives in the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rainfall_bulletins import DISTRICT_ALIASES, iter_records, normalize_district
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+STORE_PATH = 'rainfall_store.json'
+
+
 def parse_rainfall_data(file_path):
-    data = []
-    current_year = None
-    current_district = None
-
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        # Check for Year
-        year_match = re.search(r'--- Year (\d{4}) ---', line)
-        if year_match:
-            current_year = int(year_match.group(1))
-            continue
-
-        # Check for District
-        if "Stations" not in line and not line[0].isdigit() and "\t" not in line:
-            current_district = line.strip()
-            continue
-
-        # Check for Data Rows
-        if "\t" in line and "Stations" not in line:
-            parts = line.split('\t')
-            
-            # We expect: Station(0), Jan(1), Feb(2), ..., Dec(12), Total(13), RainyDays(14)
-            if len(parts) >= 13:
-                station_name = parts[0]
-                try:
-                    # Extract monthly data
-                    monthly_data = {}
-                    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-                    
-                    for i, month in enumerate(months):
-                        # Index 1 to 12
-                        val = parts[i+1]
-                        monthly_data[month] = float(val) if val else 0.0
-                    
-                    total_rainfall = float(parts[13]) if len(parts) > 13 and parts[13] else sum(monthly_data.values())
-
-                    entry = {
-                        'Year': current_year,
-                        'District': current_district,
-                        'Station': station_name,
-                        'Rainfall': total_rainfall
-                    }
-                    # Add monthly data to entry
-                    entry.update(monthly_data)
-                    
-                    data.append(entry)
-                except ValueError:
-                    continue
-
-    df = pd.DataFrame(data)
-    
+    df = pd.DataFrame(
+        [(year, district, station, total, *monthly)
+         for year, district, station, total, monthly in iter_records(file_path)],
+        columns=['Year', 'District', 'Station', 'Rainfall'] + MONTHS
+    )
+
     # Normalize District Names
     df['District'] = df['District'].str.upper().str.strip()
-    df['District'] = df['District'].replace('RI BHOI DISTRICT', 'RI BHOI')
+    df['District'] = df['District'].replace(DISTRICT_ALIASES)
 
     # Group by District and Year for Total Rainfall (for training)
     df_total = df.groupby(['District', 'Year'])['Rainfall'].mean().reset_index()
-    
+
     # Group by District for Monthly Averages (for forecasting)
     # We average across all available years for each month
-    monthly_cols = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    df_monthly = df.groupby(['District'])[monthly_cols].mean().reset_index()
-    
+    df_monthly = df.groupby(['District'])[MONTHS].mean().reset_index()
+
     return df_total, df_monthly
 
+
+# --- Incremental aggregate store ---
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def aggregate_file(path):
+    """Per-(district, year) station count and sums for one bulletin file."""
+    groups = {}
+    for year, district, _, total, monthly in iter_records(path):
+        key = f"{normalize_district(district)}|{year}"
+        entry = groups.get(key)
+        if entry is None:
+            entry = groups[key] = {"stations": 0, "rainfall": 0.0, "months": [0.0] * 12}
+        entry['stations'] += 1
+        entry['rainfall'] += total
+        entry['months'] = [a + b for a, b in zip(entry['months'], monthly)]
+    return {"sha256": file_digest(path), "groups": groups}
+
+
+class RainfallStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.files = {}  # source file name -> {"sha256", "groups"}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f)['files']
+
+    def update(self, paths, jobs=1):
+        """Parse the new or changed files (in parallel with jobs > 1); returns the names parsed."""
+        stale = [p for p in paths
+                 if self.files.get(os.path.basename(p), {}).get('sha256') != file_digest(p)]
+        if jobs > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(aggregate_file, stale))
+        else:
+            results = [aggregate_file(p) for p in stale]
+        for path, result in zip(stale, results):
+            self.files[os.path.basename(path)] = result
+        return [os.path.basename(p) for p in stale]
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def combined(self):
+        # (district, year) -> [stations, rainfall sum, month sums] across all files
+        combined = {}
+        for name in sorted(self.files):
+            for key, entry in self.files[name]['groups'].items():
+                district, year = key.rsplit('|', 1)
+                acc = combined.setdefault((district, int(year)), [0, 0.0, [0.0] * 12])
+                acc[0] += entry['stations']
+                acc[1] += entry['rainfall']
+                acc[2] = [a + b for a, b in zip(acc[2], entry['months'])]
+        return combined
+
+    def tables(self):
+        """(df_total, df_monthly) with the same layout as parse_rainfall_data."""
+        combined = self.combined()
+        df_total = pd.DataFrame(
+            [(district, year, rainfall / n) for (district, year), (n, rainfall, _) in sorted(combined.items())],
+            columns=['District', 'Year', 'Rainfall']
+        )
+
+        by_district = {}
+        for (district, _), (n, _, months) in combined.items():
+            acc = by_district.setdefault(district, [0, [0.0] * 12])
+            acc[0] += n
+            acc[1] = [a + b for a, b in zip(acc[1], months)]
+        df_monthly = pd.DataFrame(
+            [[district] + [total / n for total in months] for district, (n, months) in sorted(by_district.items())],
+            columns=['District'] + MONTHS
+        )
+        return df_total, df_monthly
+
+
 if __name__ == "__main__":
-    df_total, df_monthly = parse_rainfall_data('rainfall_raw.txt')
-    
+    parser = argparse.ArgumentParser(description="Update rainfall CSVs from district bulletins")
+    parser.add_argument('files', nargs='*', default=['rainfall_raw.txt'])
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--rebuild', action='store_true', help="Discard the store and reparse the given files")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.store):
+        os.remove(args.store)
+    store = RainfallStore(args.store)
+    parsed = store.update(args.files, jobs=args.jobs)
+    store.save()
+    print(f"Parsed {len(parsed)} file(s): {', '.join(parsed) or 'none changed'}")
+
+    df_total, df_monthly = store.tables()
+
     print("Total Rainfall Data (Head):")
     print(df_total.head())
     df_total.to_csv('rainfall_historical.csv', index=False)
     print("Saved to rainfall_historical.csv")
-    
+
     print("\nMonthly Averages (Head):")
     print(df_monthly.head())
     df_monthly.to_csv('rainfall_monthly_averages.csv', index=False)
@@ -1,15 +1,25 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import pickle
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import KFold, ParameterGrid, train_test_split
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 
-def train_improved_model():
-    # Load data
-    df = pd.read_csv('final_training_data_with_cost.csv')
-    
+# Serving-side modules (model_bundle, fast_model, features) live in the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fast_model import FlatTreeEnsemble
+from model_bundle import BUNDLE_PATH, MANIFEST, write_bundle
+
+def encode_training_data(df):
     # Features and Target
     # We need to encode categorical variables
     le_district = LabelEncoder()
@@ -30,7 +40,25 @@ def train_improved_model():
     # Log Transform Target
     # Use log1p to handle zeros if any (though production shouldn't be zero usually)
     y = np.log1p(df['Production'])
-    
+
+    encoders = {
+        'district': le_district,
+        'season': le_season,
+        'crop': le_crop,
+        'scaler': scaler # Save scaler too
+    }
+    return X, y, encoders
+
+def evaluate(model, X_test, y_test):
+    # Metrics on the original (not log) scale: (mse, r2, mae)
+    y_pred = np.expm1(model.predict(X_test))
+    y_test_actual = np.expm1(y_test)
+    return (mean_squared_error(y_test_actual, y_pred), r2_score(y_test_actual, y_pred),
+            mean_absolute_error(y_test_actual, y_pred))
+
+def fit_model(df):
+    X, y, encoders = encode_training_data(df)
+
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
@@ -40,38 +68,398 @@ def train_improved_model():
     model.fit(X_train, y_train)
     
     # Evaluate
-    # Predict log values
-    y_pred_log = model.predict(X_test)
-    
-    # Inverse transform to get actual values
-    y_pred = np.expm1(y_pred_log)
-    y_test_actual = np.expm1(y_test)
-    
-    mse = mean_squared_error(y_test_actual, y_pred)
-    r2 = r2_score(y_test_actual, y_pred)
-    mae = mean_absolute_error(y_test_actual, y_pred)
+    mse, r2, mae = evaluate(model, X_test, y_test)
     
     print(f"Improved Model Performance:")
     print(f"Mean Squared Error: {mse}")
     print(f"R2 Score: {r2:.4f}")
     print(f"Mean Absolute Error: {mae:.2f}")
     
+    return model, encoders
+
+# --- Fast mode: histogram boosting with native categoricals, early stopping, parallel CV search ---
+
+# Serving cost of the flat engine grows with tree depth, so depth is searched too
+FAST_PARAM_GRID = {
+    'learning_rate': [0.1, 0.2],
+    'max_leaf_nodes': [15, 31],
+    'max_depth': [4, 6, None],
+    'min_samples_leaf': [5, 20],
+    'l2_regularization': [0.0, 1.0],
+}
+
+def make_hist_model(**params):
+    # District, season and crop codes are split as categories, not as ordered numbers.
+    # Early stopping holds out 10% of the fit data and stops after 20 rounds without improvement.
+    return HistGradientBoostingRegressor(
+        categorical_features=[0, 1, 2], max_iter=1000, early_stopping=True,
+        validation_fraction=0.1, n_iter_no_change=20, random_state=42, **params
+    )
+
+_cv_data = None
+
+def _init_cv_worker(X, y):
+    global _cv_data
+    _cv_data = (X, y)
+    # One fit per core; keep each fit's OpenMP pool single-threaded so they don't oversubscribe
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+def _score_fold(task):
+    params, train_idx, val_idx = task
+    X, y = _cv_data
+    start = time.perf_counter()
+    model = make_hist_model(**params).fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    _, r2, mae = evaluate(model, X[val_idx], y[val_idx])
+    return r2, mae, fit_seconds, model.n_iter_
+
+def search_hist_model(X, y, folds=5, jobs=None, grid=FAST_PARAM_GRID):
+    """k-fold CV over the grid, one (params, fold) fit per task across a process pool."""
+    candidates = list(ParameterGrid(grid))
+    splits = list(KFold(folds, shuffle=True, random_state=42).split(X))
+    tasks = [(params, train_idx, val_idx) for params in candidates for train_idx, val_idx in splits]
+
+    jobs = jobs or os.cpu_count() or 1
+    print(f"Cross-validating {len(candidates)} candidates x {folds} folds on {jobs} process(es)...")
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_cv_worker, initargs=(X, y)) as pool:
+        scores = list(pool.map(_score_fold, tasks, chunksize=max(1, len(tasks) // (4 * jobs))))
+
+    results = []
+    for i, params in enumerate(candidates):
+        fold_scores = np.array(scores[i * folds:(i + 1) * folds], dtype=np.float64)
+        results.append({
+            'params': params,
+            'cv_r2': float(fold_scores[:, 0].mean()),
+            'cv_r2_std': float(fold_scores[:, 0].std()),
+            'cv_mae': float(fold_scores[:, 1].mean()),
+            'fit_seconds': float(fold_scores[:, 2].mean()),
+            'n_iter': float(fold_scores[:, 3].mean()),
+        })
+    results.sort(key=lambda r: -r['cv_r2'])
+    return results
+
+def _median_seconds(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def profile_model(name, model, fit_seconds, X_test, y_test, batch_rows=1000):
+    """Accuracy, size and predict latency (sklearn and the flat engine serving uses)."""
+    _, r2, mae = evaluate(model, X_test, y_test)
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    X_test = np.asarray(X_test, dtype=np.float64)
+    row = X_test[:1]
+    batch = X_test[np.arange(batch_rows) % len(X_test)]
+    return {
+        'model': name,
+        'fit_seconds': round(fit_seconds, 3),
+        'r2': round(r2, 4),
+        'mae': round(mae, 2),
+        'pickle_kb': round(len(pickle.dumps(model)) / 1024, 1),
+        'trees': int(len(flat.roots)),
+        'nodes': int(len(flat.feature)),
+        'row_us_sklearn': round(_median_seconds(lambda: model.predict(row), 200) * 1e6, 1),
+        'row_us_flat': round(_median_seconds(lambda: flat.predict(row), 200) * 1e6, 1),
+        f'batch{batch_rows}_ms_sklearn': round(_median_seconds(lambda: model.predict(batch), 20) * 1e3, 2),
+        f'batch{batch_rows}_ms_flat': round(_median_seconds(lambda: flat.predict(batch), 20) * 1e3, 2),
+    }
+
+def fit_fast_model(df, folds=5, jobs=None, compare=True, grid=FAST_PARAM_GRID):
+    """Histogram-boosting model picked by CV over `grid`; returns (model, encoders, report)."""
+    X, y, encoders = encode_training_data(df)
+    X = X.to_numpy(dtype=np.float64)
+    y = y.to_numpy()
+
+    # Same held-out 20% as fit_model, so the numbers compare directly
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    start = time.perf_counter()
+    results = search_hist_model(X_train, y_train, folds, jobs, grid)
+    search_seconds = time.perf_counter() - start
+    print(f"Search took {search_seconds:.1f}s. Top candidates (CV R2 on the original scale):")
+    for r in results[:5]:
+        print(f"  {r['cv_r2']:.4f} +/- {r['cv_r2_std']:.4f}  MAE {r['cv_mae']:.1f}  "
+              f"{r['n_iter']:.0f} iters  {r['fit_seconds']:.2f}s  {r['params']}")
+
+    best = results[0]['params']
+    start = time.perf_counter()
+    model = make_hist_model(**best).fit(X_train, y_train)
+    profiles = [profile_model('hist_gradient_boosting', model, time.perf_counter() - start, X_test, y_test)]
+
+    if compare:
+        start = time.perf_counter()
+        baseline = GradientBoostingRegressor(n_estimators=200, learning_rate=0.1, max_depth=5, random_state=42)
+        baseline.fit(X_train, y_train)
+        profiles.append(profile_model('gradient_boosting (default)', baseline, time.perf_counter() - start,
+                                      X_test, y_test))
+
+    # One line per model, metrics as columns
+    columns = list(profiles[0])[1:]
+    widths = [max(len(c), *(len(str(p[c])) for p in profiles)) + 2 for c in columns]
+    print("\n" + f"{'model':28s}" + "".join(f"{c:>{w}s}" for c, w in zip(columns, widths)))
+    for p in profiles:
+        print(f"{p['model']:28s}" + "".join(f"{str(p[c]):>{w}s}" for c, w in zip(columns, widths)))
+
+    report = {'best_params': best, 'search_seconds': round(search_seconds, 2), 'folds': folds,
+              'candidates': results, 'models': profiles}
+    return model, encoders, report
+
+# Bulletins the bundle's per-year climatology cube is built from
+RAINFALL_BULLETINS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rainfall_raw.txt')]
+
+def save_artifacts(model, encoders, rainfall_monthly, output_dir='.', lineage=None, bulletins=RAINFALL_BULLETINS):
     # Save Model, Encoders, and Scaler
     # We need to create a wrapper class or handle the scaling/log transform in app.py
     # For now, let's just save the raw model and update app.py to handle the transforms
     
-    with open('agriculture_model_improved.pkl', 'wb') as f:
+    with open(os.path.join(output_dir, 'agriculture_model_improved.pkl'), 'wb') as f:
         pickle.dump(model, f)
         
-    with open('label_encoders_improved.pkl', 'wb') as f:
-        pickle.dump({
-            'district': le_district,
-            'season': le_season,
-            'crop': le_crop,
-            'scaler': scaler # Save scaler too
-        }, f)
+    with open(os.path.join(output_dir, 'label_encoders_improved.pkl'), 'wb') as f:
+        pickle.dump(encoders, f)
         
     print("Improved model and encoders saved.")
 
+    # Also emit the single memory-mappable bundle (trees, vocabularies, scaler, climatology)
+    # that app.py loads in preference to the pickles
+    bundle_path = os.path.join(output_dir, BUNDLE_PATH)
+    manifest = write_bundle(bundle_path, model, encoders, rainfall_monthly, lineage=lineage, bulletins=bulletins,
+                            estimator_path=os.path.join(output_dir, 'agriculture_model_improved.pkl'))
+    print(f"Model bundle {manifest['version']} saved to {bundle_path}/")
+    return manifest
+
+def read_rainfall_monthly():
+    rainfall_path = 'rainfall_monthly_averages.csv'
+    if not os.path.exists(rainfall_path):
+        rainfall_path = os.path.join('..', rainfall_path)
+    return pd.read_csv(rainfall_path)
+
+# --- Incremental update: append-only vocabularies, frozen scaler, warm-started extra stages ---
+
+ENCODED_COLUMNS = [('district', 'District_Name'), ('season', 'Season'), ('crop', 'Crop')]
+# Past rows held out of every update and scored before and after it
+HOLDOUT_ROWS = 200
+# Largest relative rise in held-out log-MSE an update may cause and still be saved (without --force)
+MAX_HISTORICAL_WORSENING = 0.10
+
+def extend_encoders(encoders, df):
+    """Append unseen labels to the label encoders (existing codes never change).
+
+    Returns {encoder: [added labels]}.
+    """
+    added = {}
+    for key, column in ENCODED_COLUMNS:
+        classes = list(encoders[key].classes_)
+        new = sorted(set(df[column]) - set(classes))
+        if new:
+            encoders[key].classes_ = np.array(classes + new, dtype=object)
+            added[key] = new
+    return added
+
+def transform_training_data(df, encoders):
+    # Encode with existing encoders and the training-time scaler (never refit for updates)
+    numerical_features = ['Area', 'Rainfall', 'Cost']
+    X = pd.DataFrame({
+        'District_Encoded': encoders['district'].transform(df['District_Name']),
+        'Season_Encoded': encoders['season'].transform(df['Season']),
+        'Crop_Encoded': encoders['crop'].transform(df['Crop']),
+    })
+    X[numerical_features] = encoders['scaler'].transform(df[numerical_features])
+    return X, np.log1p(df['Production'].to_numpy())
+
+def update_model(df_new, base_dir='.', add_stages=50, time_budget=60.0, step=10, df_replay=None,
+                 df_holdout=None):
+    """Warm-start extra boosting stages fitted on the new rows.
+
+    Cost is proportional to the new rows, not the training history: each
+    step scores the rows through the existing stages and fits `step` more
+    trees to their residuals, until `add_stages` are added or `time_budget`
+    seconds have passed. `df_replay` (a fixed-size sample of past rows) is
+    fitted alongside so the new stages don't undo what the model knew;
+    `df_holdout` (past rows not fitted on) is scored before and after, so
+    the lineage shows whether they did. Returns (model, encoders, lineage).
+    """
+    with open(os.path.join(base_dir, 'agriculture_model_improved.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(base_dir, 'label_encoders_improved.pkl'), 'rb') as f:
+        encoders = pickle.load(f)
+    if not isinstance(model, GradientBoostingRegressor):
+        # HistGradientBoosting re-bins on every fit, which changes how its earlier trees see the data
+        raise ValueError(f"Incremental updates need a GradientBoostingRegressor, not {type(model).__name__}; "
+                         "retrain instead")
+    parent = {}
+    manifest_path = os.path.join(base_dir, BUNDLE_PATH, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            parent = json.load(f)
+
+    added = extend_encoders(encoders, df_new)
+    for key, labels in added.items():
+        print(f"New {key} labels (appended): {', '.join(labels)}")
+    n_replay = 0 if df_replay is None else len(df_replay)
+    if n_replay:
+        df_fit = pd.concat([df_new, df_replay], ignore_index=True)
+    else:
+        df_fit = df_new
+    X, y = transform_training_data(df_fit, encoders)
+
+    def new_rows_mse():
+        n = len(df_new)
+        return float(np.mean((model.predict(X[:n]) - y[:n]) ** 2))
+
+    n_holdout = 0 if df_holdout is None else len(df_holdout)
+    if n_holdout:
+        X_holdout, y_holdout = transform_training_data(df_holdout, encoders)
+
+    def historical_scores():
+        predicted = model.predict(X_holdout)
+        return float(np.mean((predicted - y_holdout) ** 2)), float(r2_score(y_holdout, predicted))
+
+    stages_before = len(model.estimators_)
+    mse_before = new_rows_mse()
+    if n_holdout:
+        historical_before = historical_scores()
+    print(f"Warm-starting from {stages_before} stages on {len(df_new)} new + {n_replay} replayed rows "
+          f"(up to {add_stages} stages or {time_budget:g}s)...")
+
+    model.set_params(warm_start=True)
+    start = time.perf_counter()
+    target = stages_before + add_stages
+    while len(model.estimators_) < target and time.perf_counter() - start < time_budget:
+        model.set_params(n_estimators=min(len(model.estimators_) + step, target))
+        model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+    model.set_params(warm_start=False)
+
+    lineage_entry = {
+        'mode': 'warm_start',
+        'parent_version': parent.get('version'),
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'new_rows': int(len(df_new)),
+        'replayed_rows': int(n_replay),
+        'new_rows_sha256': hashlib.sha256(pd.util.hash_pandas_object(df_new, index=False).to_numpy().tobytes()).hexdigest(),
+        'stages_before': int(stages_before),
+        'stages_after': int(len(model.estimators_)),
+        'added_labels': added,
+        'fit_seconds': round(fit_seconds, 3),
+        'new_rows_mse_log_before': round(mse_before, 6),
+        'new_rows_mse_log_after': round(new_rows_mse(), 6),
+        'historical_rows': int(n_holdout),
+    }
+    print(f"Added {lineage_entry['stages_after'] - stages_before} stages in {fit_seconds:.2f}s; "
+          f"MSE (log) on new rows {mse_before:.4f} -> {lineage_entry['new_rows_mse_log_after']:.4f}")
+    if n_holdout:
+        historical_after = historical_scores()
+        lineage_entry.update({
+            'historical_mse_log_before': round(historical_before[0], 6),
+            'historical_mse_log_after': round(historical_after[0], 6),
+            'historical_r2_before': round(historical_before[1], 6),
+            'historical_r2_after': round(historical_after[1], 6),
+        })
+        print(f"MSE (log) on {n_holdout} held-out past rows {historical_before[0]:.4f} -> {historical_after[0]:.4f} "
+              f"(R2 {historical_before[1]:.4f} -> {historical_after[1]:.4f})")
+    # Oldest first; a full retrain starts a new chain
+    return model, encoders, parent.get('lineage', []) + [lineage_entry]
+
+def historical_worsening(lineage_entry):
+    """Relative rise in held-out log-MSE from an update, or None if it had no held-out rows."""
+    if not lineage_entry.get('historical_rows'):
+        return None
+    before = lineage_entry['historical_mse_log_before']
+    return (lineage_entry['historical_mse_log_after'] - before) / before
+
+def update_improved_model(new_rows_path, base_dir='.', output_dir='.', add_stages=50, time_budget=60.0,
+                          history_path=None, replay_rows=None, force=False,
+                          max_worsening=MAX_HISTORICAL_WORSENING):
+    df_new = pd.read_csv(new_rows_path)
+    if 'Cost' not in df_new.columns:
+        from augment_data import add_cost
+        df_new = add_cost(df_new)
+    required = ['District_Name', 'Season', 'Crop', 'Area', 'Rainfall', 'Cost', 'Production']
+    missing = [c for c in required if c not in df_new.columns]
+    if missing:
+        print(f"Error: {new_rows_path} is missing column(s): {', '.join(missing)}")
+        return None
+    df_new = df_new.dropna(subset=required).reset_index(drop=True)
+    if df_new.empty:
+        print("No usable new rows.")
+        return None
+
+    # Past rows: --history, else the training data. A fixed-size slice is held out for the
+    # before/after check; the replay sample (--history only) comes from the rest.
+    df_replay = df_holdout = None
+    history_csv = history_path or 'final_training_data_with_cost.csv'
+    if os.path.exists(history_csv):
+        history = pd.read_csv(history_csv).dropna(subset=required)[required]
+        df_holdout = history.sample(min(HOLDOUT_ROWS, len(history) // 4), random_state=0)
+        history = history.drop(df_holdout.index)
+        df_holdout = df_holdout.reset_index(drop=True)
+        if history_path:
+            # Fixed-size sample (default: as many rows as are new), so cost stays independent of history size
+            n = min(len(history), len(df_new) if replay_rows is None else replay_rows)
+            df_replay = history.sample(n, random_state=42).reset_index(drop=True)
+
+    try:
+        model, encoders, lineage = update_model(df_new[required], base_dir, add_stages, time_budget,
+                                                df_replay=df_replay, df_holdout=df_holdout)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+
+    worsening = historical_worsening(lineage[-1])
+    if worsening is None:
+        problem = f"no past rows ({history_csv}) to check the update against"
+    elif worsening > max_worsening:
+        problem = (f"held-out past rows got {worsening:.0%} worse (log-MSE), "
+                   f"more than the {max_worsening:.0%} allowed; replay history (--history) or add fewer stages")
+    else:
+        problem = None
+    if problem:
+        if not force:
+            print(f"Error: {problem}. Not saved; pass --force to save anyway.")
+            return None
+        print(f"Warning: {problem}. Saving anyway (--force).")
+        lineage[-1]['forced'] = True
+    return save_artifacts(model, encoders, read_rainfall_monthly(), output_dir, lineage=lineage)
+
+def train_improved_model(fast=False, folds=5, jobs=None, report_path=None):
+    # Load data
+    df = pd.read_csv('final_training_data_with_cost.csv')
+    if fast:
+        model, encoders, report = fit_fast_model(df, folds, jobs)
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report saved to {report_path}")
+    else:
+        model, encoders = fit_model(df)
+
+    save_artifacts(model, encoders, read_rainfall_monthly())
+
 if __name__ == "__main__":
-    train_improved_model()
+    parser = argparse.ArgumentParser(description="Train the production model")
+    parser.add_argument('--fast', action='store_true',
+                        help="Histogram boosting with native categoricals, early stopping and a CV search")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=None, help="CV processes (default: all cores)")
+    parser.add_argument('--report', default=None, help="Write the --fast comparison as JSON here")
+    parser.add_argument('--update', metavar='NEW_ROWS_CSV', default=None,
+                        help="Warm-start the existing model on these rows instead of retraining")
+    parser.add_argument('--base', default='.', help="Directory of the model to update (with --update)")
+    parser.add_argument('--output', default='.', help="Where --update writes the new version")
+    parser.add_argument('--add-stages', type=int, default=50)
+    parser.add_argument('--time-budget', type=float, default=60.0, help="Seconds (with --update)")
+    parser.add_argument('--history', default=None, help="Past training rows to replay a sample of (with --update)")
+    parser.add_argument('--replay-rows', type=int, default=None, help="Replay sample size (default: number of new rows)")
+    parser.add_argument('--force', action='store_true',
+                        help="Save an update even if it makes held-out past rows worse (with --update)")
+    args = parser.parse_args()
+    if args.update:
+        update_improved_model(args.update, args.base, args.output, args.add_stages, args.time_budget,
+                              args.history, args.replay_rows, args.force)
+    else:
+        train_improved_model(args.fast, args.folds, args.jobs, args.report)
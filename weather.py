@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import UPSTREAM_SECONDS
+
+# Open-Meteo API (Free, no key). Override the base URL to point at a local stub.
+OPEN_METEO_URL = os.environ.get('OPEN_METEO_URL', 'https://api.open-meteo.com/v1/forecast')
+DAILY_FIELDS = 'temperature_2m_max,precipitation_sum,wind_speed_10m_max'
+
+WEATHER_TIMEOUT = float(os.environ.get('WEATHER_TIMEOUT', 5))
+WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', 1024))
+WEATHER_CACHE_TTL = float(os.environ.get('WEATHER_CACHE_TTL', 3 * 3600))
+WEATHER_STALE_TTL = float(os.environ.get('WEATHER_STALE_TTL', 3 * 3600))
+WEATHER_GRID_DEG = float(os.environ.get('WEATHER_GRID_DEG', 0.1))
+
+# Circuit breaker: open after this many consecutive upstream failures, retry after the cooldown
+BREAKER_FAILURES = int(os.environ.get('WEATHER_BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = float(os.environ.get('WEATHER_BREAKER_COOLDOWN', 30))
+
+
+def make_session(pool_size=32):
+    # Keep-alive connections to the upstream are reused across requests
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = make_session()
+
+
+def fetch_open_meteo(lat, lon, timeout=WEATHER_TIMEOUT):
+    params = {
+        'latitude': lat,
+        'longitude': lon,
+        'daily': DAILY_FIELDS,
+        'timezone': 'auto'
+    }
+    response = session.get(OPEN_METEO_URL, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed: calls go through. open: calls are rejected until `cooldown`
+    seconds have passed. half_open: one trial call is let through; success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.trips += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'failure_threshold': self.failure_threshold,
+                'cooldown': self.cooldown
+            }
+
+
+class ForecastCache:
+    """Bounded LRU cache of forecasts keyed on lat/lon snapped to a grid.
+
+    Entries are fresh for `ttl` seconds. For a further `stale_ttl` seconds a
+    stale entry is still served while one background refresh runs. Concurrent
+    misses for the same cell share a single upstream fetch.
+
+    Fetches run off the request thread and are guarded by a circuit breaker,
+    so a caller waits at most `timeout` seconds and gets None when the
+    upstream is slow, failing, or the breaker is open.
+    """
+
+    def __init__(self, fetch, max_entries=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL,
+                 stale_ttl=WEATHER_STALE_TTL, grid=WEATHER_GRID_DEG, breaker=None):
+        self.fetch = fetch
+        self.breaker = breaker or CircuitBreaker()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.grid = grid
+        self.entries = OrderedDict()  # key -> (fetched_at, data)
+        self.in_flight = {}  # key -> threading.Event
+        self.lock = threading.Lock()
+        self.stats = {
+            'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+            'refreshes': 0, 'errors': 0, 'evictions': 0,
+            'short_circuited': 0, 'deadline_exceeded': 0
+        }
+
+    def key(self, lat, lon):
+        if self.grid <= 0:
+            return (round(float(lat), 4), round(float(lon), 4))
+        return (round(round(float(lat) / self.grid) * self.grid, 4),
+                round(round(float(lon) / self.grid) * self.grid, 4))
+
+    def get(self, lat, lon, timeout=None):
+        key = self.key(lat, lon)
+        now = time.monotonic()
+        timeout = WEATHER_TIMEOUT if timeout is None else max(timeout, 0.0)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    self.entries.move_to_end(key)
+                    self.stats['stale_hits'] += 1
+                    self._start_refresh(key)
+                    return entry[1]
+
+            event = self.in_flight.get(key)
+            if event is not None:
+                self.stats['coalesced'] += 1
+            else:
+                self.stats['misses'] += 1
+                event = self._start_refresh(key)
+                if event is None:
+                    self.stats['short_circuited'] += 1
+                    return None
+
+        # Wait for the (possibly shared) fetch, but never past the caller's budget
+        if not event.wait(timeout):
+            with self.lock:
+                self.stats['deadline_exceeded'] += 1
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl + self.stale_ttl:
+            return None
+        return entry[1]
+
+    def _start_refresh(self, key):
+        # Caller holds self.lock. Returns the in-flight event, or None if the breaker is open.
+        if key in self.in_flight:
+            return self.in_flight[key]
+        if not self.breaker.allow():
+            return None
+        event = self.in_flight[key] = threading.Event()
+        threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+        return event
+
+    def _refresh(self, key):
+        data = None
+        start = time.perf_counter()
+        try:
+            data = self.fetch(*key)
+        except Exception as e:
+            print(f"Error fetching weather: {e}")
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start,
+                                 ('open_meteo', 'ok' if data is not None else 'error'))
+
+        if data is not None:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+        with self.lock:
+            if data is not None:
+                self.entries[key] = (time.monotonic(), data)
+                self.entries.move_to_end(key)
+                self.stats['refreshes'] += 1
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+            else:
+                self.stats['errors'] += 1
+            self.in_flight.pop(key).set()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self.entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        stats['stale_ttl'] = self.stale_ttl
+        stats['grid'] = self.grid
+        stats['breaker'] = self.breaker.snapshot()
+        return stats
+
+
+forecast_cache = ForecastCache(fetch_open_meteo)